@@ -7,7 +7,5 @@ python manage.py migrate --noinput
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
-echo "Starting Gunicorn..."
-exec gunicorn media_reporting.wsgi:application \
-    --bind 0.0.0.0:8900 \
-    --workers 3
\ No newline at end of file
+echo "Starting Gunicorn (${SERVER_MODE:-wsgi})..."
+exec gunicorn --config gunicorn.conf.py
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Gunicorn settings used by entrypoint.sh.
+
+Prometheus metrics run in multiprocess mode: every worker writes its
+samples to files under PROMETHEUS_MULTIPROC_DIR, which /metrics merges.
+The directory is emptied when the master starts, and a worker's live
+gauges are dropped when it exits.
+"""
+import os
+import shutil
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8900")
+workers = int(os.getenv("GUNICORN_WORKERS", "3"))
+# More than one thread runs sync workers as gthread workers; each thread
+# needs a database connection, which DATABASE_POOL=True lets them share
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+
+# SERVER_MODE=asgi serves the ASGI application from uvicorn workers, so the
+# async views can overlap requests within a worker
+if os.getenv("SERVER_MODE", "wsgi") == "asgi":
+    wsgi_app = "media_reporting.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "media_reporting.wsgi:application"
+
+# Import the app (and the URLconf, see when_ready) once in the master before
+# forking: workers start without importing anything and share those pages
+# copy-on-write. Code changes then need a restart rather than a HUP.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus")
+
+
+def on_starting(server):
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def when_ready(server):
+    # Django loads the URLconf, and with it the views, on the first request;
+    # load it before the workers are forked too
+    if server.cfg.preload_app:
+        from django.urls import get_resolver
+
+        get_resolver().url_patterns
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -43,12 +43,14 @@ INSTALLED_APPS = [
 # Middleware
 # ======================================================
 MIDDLEWARE = [
+    "reports.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "reports.middleware.StaticFilesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "reports.middleware.ReadYourWritesMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "axes.middleware.AxesMiddleware",
@@ -59,6 +61,7 @@ MIDDLEWARE = [
 # ======================================================
 ROOT_URLCONF = "media_reporting.urls"
 WSGI_APPLICATION = "media_reporting.wsgi.application"
+ASGI_APPLICATION = "media_reporting.asgi.application"
 
 # ======================================================
 # Templates
@@ -81,13 +84,101 @@ TEMPLATES = [
 # ======================================================
 # Database
 # ======================================================
+# "wsgi" (gunicorn sync workers) or "asgi" (gunicorn with uvicorn workers),
+# read by gunicorn.conf.py as well
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+
+# Pool Postgres connections per worker process, shared by its threads
+# (reports/pooled_postgresql). Connections go back to the pool at the end of
+# each request, so they are not kept per thread (CONN_MAX_AGE = 0).
+DATABASE_POOL = os.getenv("DATABASE_POOL", "False") == "True"
+DATABASE_POOL_OPTIONS = {
+    "min_size": int(os.getenv("DATABASE_POOL_MIN_SIZE", "2")),
+    "max_size": int(os.getenv("DATABASE_POOL_MAX_SIZE", "10")),
+    # Seconds a request waits for a free connection before failing
+    "timeout": float(os.getenv("DATABASE_POOL_TIMEOUT", "10")),
+    # Seconds before a connection is replaced, and before an idle one above min_size is closed
+    "max_lifetime": float(os.getenv("DATABASE_POOL_MAX_LIFETIME", "1800")),
+    "max_idle": float(os.getenv("DATABASE_POOL_MAX_IDLE", "300")),
+}
+
+# Under ASGI every request runs its ORM calls in a thread of its own, so a
+# persistent connection would be left behind by each request: connect per
+# request there, or borrow from the pool (DATABASE_POOL=True).
+CONN_MAX_AGE = 0 if SERVER_MODE == "asgi" or DATABASE_POOL else 600
+
 DATABASES = {
     "default": dj_database_url.config(
         default=os.getenv("DATABASE_URL"),
-        conn_max_age=600,
+        conn_max_age=CONN_MAX_AGE,
     )
 }
 
+# Read replica for the staff analytics views (reports/replicas.py). Without
+# REPLICA_DATABASE_URL the alias still exists, as a second connection to
+# the primary, but nothing is routed to it.
+DATABASES["replica"] = dj_database_url.config(
+    env="REPLICA_DATABASE_URL",
+    default=os.getenv("DATABASE_URL"),
+    conn_max_age=CONN_MAX_AGE,
+)
+DATABASE_ROUTERS = ["reports.replicas.ReplicaRouter"]
+
+if DATABASE_POOL:
+    for database in DATABASES.values():
+        if database.get("ENGINE") == "django.db.backends.postgresql":
+            database["ENGINE"] = "reports.pooled_postgresql"
+            database.setdefault("OPTIONS", {})["pool"] = dict(DATABASE_POOL_OPTIONS)
+            # Pooled connections are checked before each borrow
+            database["CONN_HEALTH_CHECKS"] = True
+REPORTS_REPLICA_DATABASE = "replica" if os.getenv("REPLICA_DATABASE_URL") else None
+# Replica lag (seconds) beyond which reads go back to the primary, and how
+# often each worker measures it
+REPORTS_REPLICA_MAX_LAG = float(os.getenv("REPORTS_REPLICA_MAX_LAG", "10"))
+REPORTS_REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPORTS_REPLICA_LAG_CHECK_INTERVAL", "2"))
+
+# ======================================================
+# Cache (shared by all workers on the host)
+# ======================================================
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", str(BASE_DIR / ".cache")),
+    }
+}
+
+# ======================================================
+# Reports
+# ======================================================
+# Fold repeat submissions for the same user, date and shift into one Report
+# row at write time (reports/merging.py) instead of keeping one row each.
+REPORTS_MERGE_ON_WRITE = os.getenv("REPORTS_MERGE_ON_WRITE", "False") == "True"
+
+# Compressed dumps of archived report months (reports/partitions.py)
+REPORTS_ARCHIVE_DIR = os.getenv("REPORTS_ARCHIVE_DIR", str(BASE_DIR / "archives"))
+
+# Most archived months one request from the overview may load back
+REPORTS_REHYDRATE_MAX_MONTHS = int(os.getenv("REPORTS_REHYDRATE_MAX_MONTHS", "3"))
+
+# Seconds after which a queued export job no worker picked up, or a running
+# one that stopped making progress, is failed instead of reused
+# (reports/export_jobs.py)
+REPORTS_EXPORT_JOB_TIMEOUT = int(os.getenv("REPORTS_EXPORT_JOB_TIMEOUT", "3600"))
+
+# An xlsx download is only sent once the whole workbook is written, so
+# larger ones are refused with a page offering an export job (reports/views.py)
+REPORTS_XLSX_DOWNLOAD_MAX_ROWS = int(os.getenv("REPORTS_XLSX_DOWNLOAD_MAX_ROWS", "100000"))
+
+# The same for uploaded import jobs (reports/import_jobs.py)
+REPORTS_IMPORT_JOB_TIMEOUT = int(os.getenv("REPORTS_IMPORT_JOB_TIMEOUT", "3600"))
+
+# ======================================================
+# Metrics
+# ======================================================
+# /metrics is open to staff sessions, or to a scraper sending this bearer token.
+# Multiprocess collection is enabled by PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py).
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 # ======================================================
 # Internationalization
 # ======================================================
@@ -1,18 +1,41 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 from django.contrib.auth import views as auth_views
 from django.shortcuts import redirect
 
+from reports import api
+
 from reports.views import (
     submit_report,
     admin_reports_overview,
+    admin_reports_overview_rows,
     user_report_detail,
+    user_report_detail_rows,
+    import_reports_upload,
+    metrics,
     export_reports_excel,
+    export_job_create,
+    rehydrate_archived_reports,
+    export_job_status,
+    export_job_download,
     user_report_preview,
+    submission_calendar,
     user_dashboard,
     admin_change_password,
+    admin_reports_overview_async,
+    user_report_detail_async,
+    user_dashboard_async,
 )
 
+# The read-heavy pages have async variants for SERVER_MODE=asgi. Under WSGI
+# they would be run through async_to_sync on every request, which costs
+# more than their concurrent queries save, so WSGI keeps the sync views.
+if settings.SERVER_MODE == "asgi":
+    admin_reports_overview = admin_reports_overview_async
+    user_report_detail = user_report_detail_async
+    user_dashboard = user_dashboard_async
+
 urlpatterns = [
 
     # 🔧 Django Admin (Obscured for security)
@@ -41,6 +64,13 @@ urlpatterns = [
 
     # 📊 Admin Report Overview (Date Filter + Export)
     path("admin-reports/", admin_reports_overview, name="admin_reports_overview"),
+    path("admin-reports/rows/", admin_reports_overview_rows, name="admin_reports_overview_rows"),
+
+    # 🗄 Admin: Load archived report months back
+    path("admin-reports/archives/load/", rehydrate_archived_reports, name="rehydrate_archived_reports"),
+
+    # 📥 Admin: Bulk import of historical reports
+    path("admin-reports/import/", import_reports_upload, name="import_reports_upload"),
 
     # 👤 Admin: View all reports of one specific user
     path(
@@ -48,6 +78,11 @@ urlpatterns = [
         user_report_detail,
         name="user_report_detail"
     ),
+    path(
+        "admin-reports/user/<str:username>/rows/",
+        user_report_detail_rows,
+        name="user_report_detail_rows"
+    ),
 
     # 📤 Export to Excel
     path(
@@ -56,6 +91,22 @@ urlpatterns = [
         name="export_reports_excel"
     ),
 
+    # ⏳ Background exports (queue, poll, download)
+    path("export/jobs/", export_job_create, name="export_job_create"),
+    path("export/jobs/<int:job_id>/", export_job_status, name="export_job_status"),
+    path(
+        "export/jobs/<int:job_id>/download/",
+        export_job_download,
+        name="export_job_download"
+    ),
+
+    # 📅 Submission calendar, one month at a time
+    path(
+        "calendar/<int:year>/<int:month>/",
+        submission_calendar,
+        name="submission_calendar"
+    ),
+
     # 👤 User: Preview their own report for any date
     path(
         "my-report/<str:date>/",
@@ -69,4 +120,13 @@ urlpatterns = [
         admin_change_password,
         name="staff_password_reset"
     ),
+
+    # 📈 Prometheus metrics (staff session or bearer token)
+    path("metrics", metrics, name="metrics"),
+
+    # 🛰 Read-only JSON API for dashboards (ETag / conditional GET)
+    path("api/v1/overview/", api.overview, name="api_overview"),
+    path("api/v1/users/<str:username>/summary/", api.user_summary, name="api_user_summary"),
+    path("api/v1/reports/<str:date>/", api.report_preview, name="api_report_preview"),
+    path("api/v1/notices/", api.notices, name="api_notices"),
 ]
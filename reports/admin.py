@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Report, AdminNotice, DynamicField, DynamicFieldResponse
+from .models import User, Report, AdminNotice, DynamicField, DynamicFieldResponse, ExportJob, ImportJob
 
 
 # ------------------------------
@@ -61,6 +61,26 @@ class DynamicFieldResponseAdmin(admin.ModelAdmin):
     search_fields = ('report__user__username', 'field__label', 'value')
 
 
+# ------------------------------
+# ✅ ExportJob Admin
+# ------------------------------
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'requested_by', 'status', 'rows_written', 'rows_total', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('fingerprint', 'data_version', 'rows_total', 'rows_written', 'started_at', 'finished_at')
+
+
+# ------------------------------
+# ✅ ImportJob Admin
+# ------------------------------
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'filename', 'requested_by', 'status', 'dry_run', 'created', 'rows', 'rejected_count', 'created_at')
+    list_filter = ('status', 'dry_run')
+    readonly_fields = ('rows', 'created', 'rejected', 'rejected_count', 'user_ids', 'started_at', 'finished_at')
+
+
 # ------------------------------
 # ✅ Register User
 # ------------------------------
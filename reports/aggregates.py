@@ -0,0 +1,56 @@
+"""
+Precomputed report and task totals per team, per user and per user-day.
+
+On Postgres these relations are materialized views with unique indexes, so
+REFRESH MATERIALIZED VIEW CONCURRENTLY can rebuild them without blocking
+readers. SQLite has no materialized views; there they are plain tables whose
+rows are replaced in one transaction by the same refresh call.
+
+Either way the totals are only as fresh as the last refresh_aggregates()
+call: run the refresh_report_aggregates command on a schedule, or with
+--watch to refresh after each burst of writes. The "aggregates" version
+token is bumped on every refresh so API ETags follow the data.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .versions import bump_version
+
+# Dependency order does not matter: every view reads the base tables only
+AGGREGATE_QUERIES = {
+    "reports_dailyaggregate": """
+        SELECT CAST(r.user_id AS TEXT) || ':' || CAST(r.effective_date AS TEXT) AS key,
+               r.user_id, u.team, r.effective_date AS day,
+               COUNT(*) AS report_count, SUM(r.task_total) AS task_total
+        FROM reports_report r
+        JOIN reports_user u ON u.id = r.user_id
+        GROUP BY r.user_id, u.team, r.effective_date
+    """,
+    "reports_useraggregate": """
+        SELECT r.user_id, u.team, COUNT(*) AS report_count, SUM(r.task_total) AS task_total
+        FROM reports_report r
+        JOIN reports_user u ON u.id = r.user_id
+        GROUP BY r.user_id, u.team
+    """,
+    "reports_teamaggregate": """
+        SELECT u.team, COUNT(*) AS report_count, SUM(r.task_total) AS task_total
+        FROM reports_report r
+        JOIN reports_user u ON u.id = r.user_id
+        GROUP BY u.team
+    """,
+}
+
+
+def refresh_aggregates(using=DEFAULT_DB_ALIAS):
+    """
+    Recompute every aggregate from the Report table in one transaction, so
+    the team, user and daily totals always agree with each other.
+    """
+    connection = connections[using]
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        for table, query in AGGREGATE_QUERIES.items():
+            if connection.vendor == "postgresql":
+                cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {table}")
+            else:
+                cursor.execute(f"DELETE FROM {table}")
+                cursor.execute(f"INSERT INTO {table} {query}")
+        bump_version("aggregates")
@@ -0,0 +1,187 @@
+"""
+Vectorized combining of raw reports into daily rollup values.
+
+rollups.combine_reports() merges the reports of one (user, date, shift) key
+in Python, which is all a single refresh needs. Rebuilding or checking the
+rollups of the whole history runs that merge for every key; this module
+does it for a batch of users at once:
+
+* reports are read as values_list tuples, and their task JSON is split into
+  (report, key, value) rows by the database (json_each / jsonb_each), so
+  no task dict is decoded in Python,
+* rollup keys and task keys are integer-coded, and plain integer task
+  values are summed with one pandas groupby per batch,
+* any other value (text, floats, booleans, numbers stored as text) goes
+  through rollups.merge_task_value in report order, so the result is
+  exactly what combine_reports() gives.
+
+pandas is imported on first use. rollups.iter_combined() only comes here
+for sets of at least VECTORIZED_MIN_REPORTS reports, which in practice
+means the rebuild and drift commands and the import worker. Web workers
+reach it only through staff actions that rebuild a whole history.
+"""
+import json
+
+from django.db import connection
+from django.db.models import Count
+
+from .models import DynamicFieldResponse
+from .rollups import merge_task_value
+
+REPORT_FIELDS = ("pk", "user_id", "effective_date", "shift", "report_type", "custom_date", "date", "created_at", "notes")
+
+SQLITE_TASKS = "SELECT r.id, j.key, j.type, j.value FROM ({inner}) AS r, json_each(r.tasks) AS j"
+POSTGRES_TASKS = "SELECT r.id, j.key, jsonb_typeof(j.value), j.value::text FROM ({inner}) AS r, jsonb_each(r.tasks) AS j"
+SQLITE_SCALARS = {"null": lambda v: None, "true": lambda v: True, "false": lambda v: False, "real": float, "text": str}
+
+
+def _decode(postgres, kind, raw):
+    if postgres:
+        return json.loads(raw)
+    return SQLITE_SCALARS[kind](raw) if kind in SQLITE_SCALARS else json.loads(raw)
+
+
+def _task_values(reports):
+    """
+    DataFrame of every static task value of ``reports``: ``report_id``,
+    ``key``, ``value`` as decoding the task JSON would give it, and
+    ``is_int`` marking plain integers.
+    """
+    import pandas as pd
+
+    inner, params = reports.order_by().values("pk", "tasks").query.sql_with_params()
+    postgres = connection.vendor == "postgresql"
+    with connection.cursor() as cursor:
+        cursor.execute((POSTGRES_TASKS if postgres else SQLITE_TASKS).format(inner=inner), params)
+        frame = pd.DataFrame.from_records(cursor.fetchall(), columns=["report_id", "key", "kind", "value"])
+
+    if postgres:
+        frame["is_int"] = (frame["kind"] == "number") & frame["value"].str.fullmatch(r"-?\d+").fillna(False)
+        frame.loc[frame["is_int"], "value"] = frame.loc[frame["is_int"], "value"].map(int)
+    else:
+        frame["is_int"] = frame["kind"] == "integer"
+    # Only the values that are not plain integers are decoded one by one
+    other = ~frame["is_int"].to_numpy(dtype=bool)
+    frame["value"] = frame["value"].astype(object)
+    frame.loc[other, "value"] = pd.Series(
+        [_decode(postgres, kind, raw) for kind, raw in zip(frame["kind"][other], frame["value"][other])],
+        index=frame.index[other], dtype=object,
+    )
+    return frame.drop(columns="kind")
+
+
+def combine_batch(reports, chunk_size=2000):
+    """
+    Combine every rollup key of ``reports``, which should hold a bounded
+    number of rows. Yields ``((user_id, date, shift), values)`` in key order.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rows = list(
+        reports.order_by("user_id", "effective_date", "shift", "pk")
+        .values_list(*REPORT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    if not rows:
+        return
+    frame = pd.DataFrame.from_records(rows, columns=REPORT_FIELDS)
+
+    # Rows are sorted by key, so a key's group code increments where any
+    # part of the key changes
+    user_codes = frame["user_id"].to_numpy()
+    day_codes, _ = pd.factorize(frame["effective_date"])
+    shift_codes, _ = pd.factorize(frame["shift"])
+    changed = np.ones(len(frame), dtype=bool)
+    changed[1:] = (
+        (user_codes[1:] != user_codes[:-1]) | (day_codes[1:] != day_codes[:-1]) | (shift_codes[1:] != shift_codes[:-1])
+    )
+    group_of_row = np.cumsum(changed) - 1
+    firsts = np.flatnonzero(changed)
+    position = pd.Index(frame["pk"])
+
+    tasks = [{} for _ in firsts]
+    values = _task_values(reports)
+    if len(values):
+        values["row"] = position.get_indexer(values["report_id"])
+        values = values.sort_values("row", kind="stable")
+        key_codes, key_names = pd.factorize(values["key"])
+        cells = group_of_row[values["row"].to_numpy()] * len(key_names) + key_codes
+        is_int = values["is_int"].to_numpy(dtype=bool)
+        is_blank = values["value"].isna().to_numpy() & ~is_int
+        irregular = ~is_int & ~is_blank
+
+        by_cell = pd.DataFrame({
+            "cell": cells,
+            "sum": np.where(is_int, values["value"].where(is_int, 0), 0).astype(np.int64),
+            "ints": is_int,
+            "irregular": irregular,
+        }).groupby("cell", sort=False).agg(sum=("sum", "sum"), ints=("ints", "any"), irregular=("irregular", "any"))
+
+        # Cells holding only integers and blanks: the sum, or blank if no integer
+        plain = by_cell[~by_cell["irregular"]]
+        groups, keys = np.divmod(plain.index.to_numpy(), len(key_names))
+        names = key_names.to_numpy(dtype=object)
+        totals = np.where(plain["ints"], plain["sum"].to_numpy(dtype=object), None)
+        for group, key, total in zip(groups.tolist(), names[keys].tolist(), totals.tolist()):
+            tasks[group][key] = total
+
+        # Anything else is folded one value at a time, in report order
+        mixed = np.isin(cells, by_cell.index[by_cell["irregular"]].to_numpy())
+        groups, keys = np.divmod(cells[mixed], len(key_names))
+        for group, key, value in zip(groups.tolist(), names[keys].tolist(), values["value"].to_numpy()[mixed].tolist()):
+            merge_task_value(tasks[group], key, value)
+
+    # Dynamic fields: the latest answer wins
+    dynamic = [{} for _ in firsts]
+    answers = list(
+        DynamicFieldResponse.objects
+        .filter(report__in=reports.order_by().values("pk"))
+        .order_by("report_id", "pk")
+        .values_list("report_id", "field_id", "value")
+        .iterator(chunk_size=chunk_size)
+    )
+    if answers:
+        report_ids, field_ids, answer_values = zip(*answers)
+        groups = group_of_row[position.get_indexer(report_ids)]
+        for group, field_id, value in zip(groups.tolist(), field_ids, answer_values):
+            dynamic[group][str(field_id)] = value
+
+    notes = [[] for _ in firsts]
+    noted = frame["notes"].to_numpy(dtype=object).astype(bool)
+    for group, note in zip(group_of_row[noted].tolist(), frame["notes"][noted].tolist()):
+        notes[group].append(note)
+
+    counts = np.diff(np.append(firsts, len(frame))).tolist()
+    for group, first in enumerate(firsts.tolist()):
+        pk, user_id, day, shift, report_type, custom_date, submitted, created_at, _ = rows[first]
+        yield (user_id, day, shift), {
+            "report_type": report_type,
+            "tasks": tasks[group],
+            "dynamic_values": dynamic[group],
+            "notes": notes[group],
+            "report_count": counts[group],
+            # Report.is_late_submission
+            "is_late_submission": bool(custom_date) and custom_date < submitted,
+            "created_at": created_at,
+        }
+
+
+def combine_history(reports, batch_size=100_000, chunk_size=2000):
+    """
+    Yield ``((user_id, date, shift), values)`` for every rollup key of the
+    ``reports`` queryset in key order, ``values`` being exactly what
+    combine_reports() gives for that key. Whole users are combined together,
+    about ``batch_size`` reports at a time.
+    """
+    per_user = reports.order_by("user_id").values_list("user_id").annotate(count=Count("pk"))
+    first = last = None
+    size = 0
+    for user_id, count in per_user:
+        first = user_id if first is None else first
+        last, size = user_id, size + count
+        if size >= batch_size:
+            yield from combine_batch(reports.filter(user_id__gte=first, user_id__lte=last), chunk_size)
+            first, size = None, 0
+    if first is not None:
+        yield from combine_batch(reports.filter(user_id__gte=first, user_id__lte=last), chunk_size)
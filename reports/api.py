@@ -0,0 +1,215 @@
+"""
+Read-only JSON API (v1) for dashboards and charts.
+
+Every resource carries a strong ETag built from version tokens (see
+versions.py) instead of from its body. A conditional GET whose ETag still
+matches is answered with 304 after a cache read, before any aggregation
+runs. Responses are private and must be revalidated on every use.
+"""
+import hashlib
+from functools import wraps
+
+from django.db.models import F, Sum
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_GET
+
+from .models import DailyAggregate, Report, TeamAggregate, User, UserAggregate
+from .notices import FEED_SIZE, latest_notices, older_notices
+from .schema import field_labels, schema_version
+from .task_counts import user_task_summaries
+from .versions import get_version
+
+API_VERSION = "v1"
+
+OVERVIEW_FILTERS = ("team", "user", "date")
+
+NOTICE_MAX_LIMIT = 100
+
+
+def _error(status, detail):
+    return JsonResponse({"detail": detail}, status=status)
+
+
+def _json(payload):
+    response = JsonResponse(payload)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _etag(*parts):
+    return hashlib.sha1(":".join((API_VERSION,) + tuple(map(str, parts))).encode()).hexdigest()
+
+
+# ----------------------------------------------------
+# 🔐 ACCESS
+# ----------------------------------------------------
+def api_login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error(401, "Authentication required.")
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def api_staff_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error(401, "Authentication required.")
+        if not (request.user.is_active and request.user.is_staff):
+            return _error(403, "Staff only.")
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def api_target_user(view):
+    """
+    Resolve the user a resource is about into ``request.api_user``: the
+    ``username`` URL argument or ``?user=``, defaulting to the caller.
+    Only staff may look at someone else.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        username = kwargs.get("username") or request.GET.get("user") or request.user.username
+        if username != request.user.username and not request.user.is_staff:
+            return _error(403, "You can only read your own data.")
+        request.api_user = User.objects.filter(username=username).first()
+        if request.api_user is None:
+            return _error(404, "Unknown user.")
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+# ----------------------------------------------------
+# 🧭 OVERVIEW AGGREGATES
+# ----------------------------------------------------
+def _overview_etag(request):
+    filters = [request.GET.get(name, "") for name in OVERVIEW_FILTERS]
+    return _etag("overview", get_version("aggregates"), *filters)
+
+
+@require_GET
+@api_staff_required
+@condition(etag_func=_overview_etag)
+def overview(request):
+    """
+    Report totals per user and per team, with the overview page's filters.
+    Read from the precomputed aggregates, so they trail writes until the
+    next refresh_report_aggregates run.
+    """
+    team, username, day = (request.GET.get(name) for name in OVERVIEW_FILTERS)
+
+    # Whole-history totals come straight from the per-user view; a date
+    # filter needs the per-day one
+    rows = DailyAggregate.objects.filter(day=day) if day else UserAggregate.objects.all()
+    if team:
+        rows = rows.filter(team=team)
+    if username:
+        rows = rows.filter(user__username=username)
+
+    if day or team or username:
+        teams = rows.values("team").annotate(total=Sum("report_count")).order_by("team")
+    else:
+        teams = TeamAggregate.objects.values("team", total=F("report_count")).order_by("team")
+    users = rows.values("user__username").annotate(total=Sum("report_count")).order_by("user__username")
+
+    return _json({
+        "by_user": [{"username": r["user__username"], "total": r["total"]} for r in users],
+        "by_team": [{"team": r["team"], "total": r["total"]} for r in teams],
+    })
+
+
+# ----------------------------------------------------
+# 👤 PER-USER SUMMARIES
+# ----------------------------------------------------
+def _user_version(user):
+    return get_version("rollups:rebuild"), get_version(f"user:{user.pk}")
+
+
+def _summary_etag(request, username):
+    return _etag("summary", request.api_user.pk, *_user_version(request.api_user))
+
+
+@require_GET
+@api_login_required
+@api_target_user
+@condition(etag_func=_summary_etag)
+def user_summary(request, username):
+    """
+    Chart totals for one user: per task, day, month and year.
+    """
+    return _json(user_task_summaries(request.api_user))
+
+
+# ----------------------------------------------------
+# 👁 REPORT PREVIEW
+# ----------------------------------------------------
+def _preview_etag(request, date):
+    user = request.api_user
+    return _etag("preview", user.pk, date, schema_version(), *_user_version(user))
+
+
+@require_GET
+@api_login_required
+@api_target_user
+@condition(etag_func=_preview_etag)
+def report_preview(request, date):
+    """
+    The first report filed for ``date``, with its static and dynamic fields.
+    """
+    report = (
+        Report.objects
+        .filter(user=request.api_user, custom_date=date)
+        .prefetch_related("dynamic_responses")
+        .first()
+    )
+    if report is None:
+        return _error(404, f"No report found for {date}.")
+
+    static_fields, dynamic_fields = report.preview_fields(field_labels())
+    return _json({
+        "date": report.custom_date.isoformat(),
+        "report_type": report.report_type,
+        "shift": report.get_shift_display(),
+        "is_late_submission": report.is_late_submission,
+        "static_fields": static_fields,
+        "dynamic_fields": dynamic_fields,
+        "notes": report.notes or "",
+    })
+
+
+# ----------------------------------------------------
+# 📢 NOTICES
+# ----------------------------------------------------
+def _notice_limit(request):
+    try:
+        return max(1, min(int(request.GET.get("limit", FEED_SIZE)), NOTICE_MAX_LIMIT))
+    except ValueError:
+        return FEED_SIZE
+
+
+def _notices_etag(request):
+    return _etag("notices", get_version("notices"), _notice_limit(request), request.GET.get("after", ""))
+
+
+@require_GET
+@api_login_required
+@condition(etag_func=_notices_etag)
+def notices(request):
+    """
+    Admin notices, newest first. The first page comes from the cached feed,
+    topped up from the database when ``limit`` is larger than the feed;
+    ``?after=<next>`` pages through older notices.
+    """
+    limit = _notice_limit(request)
+    if request.GET.get("after"):
+        try:
+            rows, next_cursor = older_notices(request.GET["after"], limit)
+        except ValueError:
+            return _error(400, "Invalid cursor.")
+    else:
+        rows, next_cursor = latest_notices(limit)
+
+    return _json({"notices": [n.as_dict() for n in rows], "next": next_cursor})
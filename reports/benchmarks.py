@@ -0,0 +1,985 @@
+"""
+Benchmark suites for ``python manage.py run_benchmarks``.
+
+Each suite is a function registered with ``@suite`` that returns a list of
+result dicts (one per scenario and data size). Measurements record wall
+time, the number of database queries and, unless disabled, the peak Python
+heap reported by tracemalloc.
+
+Load tests that need committed data or real servers (``run_load_test``,
+``run_server_benchmark``) live here too, outside the suite registry.
+"""
+import datetime
+import http.client
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import F
+
+SUITES = {}
+
+
+def suite(name):
+    def register(func):
+        SUITES[name] = func
+        return func
+    return register
+
+
+# tracemalloc slows allocation-heavy code down considerably; run_benchmarks
+# turns it off with --no-memory when only wall time matters.
+TRACE_MEMORY = True
+
+
+class Measurement:
+    """
+    Context manager timing a block and counting the queries it runs, and
+    tracking its peak traced memory.
+    """
+
+    def _count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.peak_mb = None
+        self.queries = 0
+        self._wrapper = connection.execute_wrapper(self._count_query)
+        self._wrapper.__enter__()
+        if TRACE_MEMORY:
+            tracemalloc.start()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._started
+        if TRACE_MEMORY:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.peak_mb = peak / (1024 * 1024)
+        self._wrapper.__exit__(*exc)
+        return False
+
+    def result(self, **fields):
+        peak_mb = round(self.peak_mb, 2) if self.peak_mb is not None else None
+        return {**fields, "seconds": round(self.seconds, 4), "queries": self.queries, "peak_mb": peak_mb}
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """
+    Run the block in a transaction that is always rolled back, so seeded
+    benchmark data never outlives the suite.
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+# ------------------------------
+# ✅ Seed data
+# ------------------------------
+SEED_NOTES = [
+    "Covered the morning press conference",
+    "Waiting on client assets",
+    "Re-edited after feedback from desk",
+    "Shot B rolls for tomorrow's story",
+    "Half day, left early for appointment",
+]
+
+SEED_FIELDS = [
+    ("camera", "Camera Used", "text"),
+    ("hours", "Hours Logged", "number"),
+]
+
+
+def seed_benchmark_data(users, days, prefix="bench", end=None, seed=0):
+    """
+    Create ``users`` members spread across every team, each with ``days``
+    days of reports up to ``end``: weekly offs skipped, some leave days,
+    late submissions, notes, repeat submissions for the same shift and a
+    response for every dynamic field of the team. Task counts, daily rollups
+    and report aggregates are built for the new data. Returns the created
+    users.
+    """
+    from django.contrib.auth.hashers import make_password
+
+    from .aggregates import refresh_aggregates
+    from .models import Report, User, DynamicField, DynamicFieldResponse
+    from .rollups import rebuild_rollups
+    from .schema import TEAM_FIELDS, task_key
+    from .task_counts import backfill_task_counts
+
+    rng = random.Random(seed)
+    end = end or datetime.date.today()
+    teams = [team for team, _ in User.TEAM_CHOICES]
+    shifts = [key for key, _ in Report.SHIFT_CHOICES]
+    password = make_password(prefix)
+
+    members = User.objects.bulk_create([
+        User(
+            username=f"{prefix}_{teams[i % len(teams)]}_{i}",
+            team=teams[i % len(teams)],
+            weekly_off=i % 7,
+            password=password,
+        )
+        for i in range(users)
+    ])
+
+    fields = {}
+    for team in teams:
+        for name, label, field_type in SEED_FIELDS:
+            field, _ = DynamicField.objects.get_or_create(
+                team=team, name=f"{prefix}_{name}", defaults={"label": label, "field_type": field_type},
+            )
+            fields.setdefault(team, []).append(field)
+
+    reports, late = [], []
+    for member in members:
+        shift = rng.choice(shifts)
+        labels = TEAM_FIELDS.get(member.team, [])
+        for offset in range(days):
+            day = end - datetime.timedelta(days=offset)
+            if day.weekday() == member.weekly_off:
+                continue
+            leave = rng.random() < 0.04
+            for _ in range(2 if rng.random() < 0.1 else 1):
+                tasks = {} if leave else {task_key(label): rng.randint(0, 6) for label in labels}
+                report = Report(
+                    user=member,
+                    custom_date=day,
+                    shift=shift,
+                    report_type="leave" if leave else "regular",
+                    tasks=tasks,
+                    task_total=Report.sum_tasks(tasks),
+                    notes=rng.choice(SEED_NOTES) if rng.random() < 0.2 else "",
+                )
+                reports.append(report)
+                if rng.random() < 0.08:
+                    late.append(report)
+
+    Report.objects.bulk_create(reports, batch_size=5000)
+
+    # date is auto_now_add; move it to the reported day (a day later for late ones)
+    Report.objects.filter(user__in=members).update(date=F("custom_date"))
+    for report in late:
+        report.date = report.custom_date + datetime.timedelta(days=1)
+    Report.objects.bulk_update(late, ["date"], batch_size=500)
+
+    DynamicFieldResponse.objects.bulk_create(
+        [
+            DynamicFieldResponse(
+                report=report,
+                field=field,
+                value=str(rng.randint(1, 8)) if field.field_type == "number" else rng.choice(["A7 III", "FX3", "Phone"]),
+            )
+            for report in reports if report.report_type == "regular"
+            for field in fields[report.user.team]
+        ],
+        batch_size=5000,
+    )
+
+    backfill_task_counts(chunk_size=5000)
+    for member in members:
+        rebuild_rollups(user_id=member.pk, chunk_size=5000)
+    refresh_aggregates()
+    return members
+
+
+@contextmanager
+def synthetic_reports(count, users=50, rollups=False):
+    """
+    Seed ``count`` reports (and their task counts) inside a transaction that
+    is rolled back when the block exits, leaving the database untouched.
+    Yields the seeded users; ``rollups`` also builds their daily rollups.
+    """
+    from .models import Report, User
+    from .rollups import rebuild_rollups
+    from .schema import TEAM_FIELDS, task_key
+    from .task_counts import backfill_task_counts
+
+    rng = random.Random(count)
+    teams = list(TEAM_FIELDS)
+    with rolled_back():
+        members = User.objects.bulk_create([
+            User(username=f"bench-{count}-{i}", team=teams[i % len(teams)], password="!")
+            for i in range(users)
+        ])
+        start = datetime.date(2020, 1, 1)
+        batch = []
+        for i in range(count):
+            member = members[i % users]
+            tasks = {task_key(label): rng.randint(0, 6) for label in TEAM_FIELDS[member.team]}
+            batch.append(Report(
+                user=member,
+                custom_date=start + datetime.timedelta(days=i // users),
+                tasks=tasks,
+                task_total=Report.sum_tasks(tasks),
+            ))
+            if len(batch) == 5000:
+                Report.objects.bulk_create(batch)
+                batch = []
+        Report.objects.bulk_create(batch)
+        backfill_task_counts(chunk_size=5000)
+        if rollups:
+            rebuild_rollups(chunk_size=5000)
+        yield members
+
+
+# ------------------------------
+# ✅ Export
+# ------------------------------
+EXPORT_TASK_KEYS = ["logo_video", "reel_video", "vo_video", "presenter_video", "special_interview", "video_shoot"]
+
+
+def synthetic_export_rows(count, columns):
+    rng = random.Random(count)
+    start = datetime.date(2020, 1, 1)
+    for i in range(count):
+        yield [
+            f"user{i % 300}",
+            "video_editor",
+            start + datetime.timedelta(days=i // 300),
+            "9:00 AM – 5:30 PM",
+            "Shot B rolls | Edited promo" if i % 7 == 0 else "",
+        ] + [rng.randint(0, 12) for _ in columns]
+
+
+@suite("export")
+def export_suite(sizes, legacy=False, **options):
+    """
+    Time every export format's writer on the same synthetic rows, optionally
+    next to the old DataFrame-based XLSX writer for comparison. Results
+    include the file size and rows per second.
+    """
+    from .exports import EXPORT_FORMATS
+
+    columns = dict.fromkeys(EXPORT_TASK_KEYS, "integer")
+    results = []
+    for size in sizes:
+        for name, export_format in EXPORT_FORMATS.items():
+            with tempfile.TemporaryFile() as spool:
+                with Measurement() as m:
+                    export_format.write(synthetic_export_rows(size, columns), columns, spool)
+                result = m.result(suite="export", scenario=name, rows=size)
+                result["bytes"] = spool.tell()
+            result["rows_per_second"] = round(size / result["seconds"]) if result["seconds"] else None
+            results.append(result)
+
+        if legacy:
+            import pandas as pd
+
+            with tempfile.TemporaryFile() as spool, Measurement() as m:
+                header = ["username", "team", "custom_date", "shift", "notes"] + EXPORT_TASK_KEYS
+                rows = [dict(zip(header, row)) for row in synthetic_export_rows(size, EXPORT_TASK_KEYS)]
+                pd.DataFrame(rows).to_excel(spool, index=False)
+            results.append(m.result(suite="export", scenario="xlsx_dataframe", rows=size))
+
+    return results
+
+
+# ------------------------------
+# ✅ Task totals
+# ------------------------------
+def python_task_totals():
+    """The JSON-walking loops the views used before TaskCount existed."""
+    from .models import Report
+
+    by_task, by_team, by_month = defaultdict(int), defaultdict(int), defaultdict(int)
+    rows = Report.objects.values_list("user__team", "effective_date", "tasks").iterator(chunk_size=2000)
+    for team, day, tasks in rows:
+        for k, v in (tasks or {}).items():
+            try:
+                by_task[(team, k)] += int(v)
+                by_team[team] += int(v)
+                by_month[day.strftime("%b %Y")] += int(v)
+            except (TypeError, ValueError):
+                continue
+    return by_task, by_team, by_month
+
+
+def sql_task_totals():
+    from .models import TaskCount
+
+    return (
+        list(TaskCount.objects.by_task()),
+        list(TaskCount.objects.by_team()),
+        list(TaskCount.objects.by_period("month")),
+    )
+
+
+@suite("task_totals")
+def task_totals_suite(sizes, legacy=False, **options):
+    """
+    Per-task, per-team and per-month totals from the TaskCount fact table,
+    optionally next to the Python loops over Report.tasks.
+    """
+    results = []
+    for size in sizes:
+        with synthetic_reports(size):
+            with Measurement() as m:
+                sql_task_totals()
+            results.append(m.result(suite="task_totals", scenario="sql_group_by", rows=size))
+
+            if legacy:
+                with Measurement() as m:
+                    python_task_totals()
+                results.append(m.result(suite="task_totals", scenario="python_loop", rows=size))
+    return results
+
+
+# ------------------------------
+# ✅ Rollup rebuild
+# ------------------------------
+def python_combined():
+    """The per-key combine_reports() loop iter_combined uses for small sets."""
+    from .models import Report
+    from .rollups import combine_per_key
+
+    return combine_per_key(Report.objects.all())
+
+
+@suite("rollup_rebuild")
+def rollup_rebuild_suite(sizes, legacy=False, **options):
+    """
+    Combine every rollup key of the history (what rebuild_rollups and
+    check_daily_rollups do) with the vectorized engine, optionally next to
+    the per-key Python loop.
+    """
+    from .aggregation import combine_history
+    from .models import Report
+
+    results = []
+    for size in sizes:
+        with synthetic_reports(size):
+            with Measurement() as m:
+                keys = sum(1 for _ in combine_history(Report.objects.all()))
+            results.append(m.result(suite="rollup_rebuild", scenario="vectorized", rows=size, keys=keys))
+
+            if legacy:
+                with Measurement() as m:
+                    keys = sum(1 for _ in python_combined())
+                results.append(m.result(suite="rollup_rebuild", scenario="python_loop", rows=size, keys=keys))
+    return results
+
+
+# ------------------------------
+# ✅ User detail page
+# ------------------------------
+def python_user_summaries(user):
+    """The per-row strftime loops user_report_detail used before TaskCount."""
+    from .models import Report
+
+    task_totals, daily, monthly, yearly = defaultdict(int), defaultdict(int), defaultdict(int), defaultdict(int)
+    for r in Report.objects.filter(user=user).order_by("custom_date"):
+        for k, v in (r.tasks or {}).items():
+            try:
+                task_totals[k] += int(v)
+                daily[r.custom_date] += int(v)
+                monthly[r.custom_date.strftime("%b %Y")] += int(v)
+                yearly[r.custom_date.year] += int(v)
+            except (TypeError, ValueError):
+                continue
+    return task_totals, daily, monthly, yearly
+
+
+@suite("user_detail")
+def user_detail_suite(sizes, legacy=False, **options):
+    """
+    Summaries and full render of user_report_detail for one user whose
+    history is ``size`` daily reports (1826 is five years).
+    """
+    from django.test import RequestFactory
+
+    from .task_counts import user_task_summaries
+    from .views import user_report_detail
+
+    results = []
+    for size in sizes:
+        with synthetic_reports(size, users=1, rollups=True) as (member,):
+            with Measurement() as m:
+                user_task_summaries(member)
+            results.append(m.result(suite="user_detail", scenario="sql_summaries", rows=size))
+
+            request = RequestFactory().get("/")
+            request.user = member
+            member.is_staff = True  # in memory only, to pass staff_member_required
+            with Measurement() as m:
+                user_report_detail(request, member.username)
+            results.append(m.result(suite="user_detail", scenario="page", rows=size))
+
+            if legacy:
+                with Measurement() as m:
+                    python_user_summaries(member)
+                results.append(m.result(suite="user_detail", scenario="python_summaries", rows=size))
+    return results
+
+
+# ------------------------------
+# ✅ Views
+# ------------------------------
+# Fast pages are timed a few times and the quickest run kept, to damp noise
+VIEW_REPEATS = 3
+
+@suite("views")
+def views_suite(sizes, legacy=False, **options):
+    """
+    Time every page through the full middleware stack, against seeded data
+    of roughly ``size`` reports spread over 50 users. Data is rolled back
+    afterwards.
+    """
+    from django.test import Client, override_settings
+    from django.urls import reverse
+
+    from .schema import TEAM_FIELDS, task_key
+
+    results = []
+    test_settings = override_settings(
+        ALLOWED_HOSTS=["testserver"],
+        SECURE_SSL_REDIRECT=False,
+        STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage",
+    )
+    for size in sizes:
+        with rolled_back(), test_settings:
+            members = seed_benchmark_data(users=50, days=max(size // 50, 1), prefix=f"bench{size}", seed=size)
+            editor = next(m for m in members if m.team == "video_editor")
+            staff = members[0]
+            staff.is_staff = True
+            staff.save(update_fields=["is_staff"])
+
+            submission = {"custom_date": datetime.date.today().isoformat(), "shift": "9_5_30", "report_type": "regular"}
+            submission.update({task_key(label): 1 for label in TEAM_FIELDS[editor.team]})
+
+            scenarios = [
+                ("user_dashboard", editor, "get", reverse("user_dashboard"), None),
+                ("submit_report_get", editor, "get", reverse("submit_report"), None),
+                ("submit_report_post", editor, "post", reverse("submit_report"), submission),
+                ("admin_overview", staff, "get", reverse("admin_reports_overview"), None),
+                ("user_detail", staff, "get", reverse("user_report_detail", args=[editor.username]), None),
+                ("export_excel", staff, "get", reverse("export_reports_excel"), None),
+                *[
+                    (f"export_{name}", staff, "get", reverse("export_reports_excel"), {"format": name})
+                    for name in ("csv", "jsonl", "parquet")
+                ],
+            ]
+            for scenario, user, method, url, data in scenarios:
+                client = Client()
+                client.force_login(user)
+                getattr(client, method)(url, data)  # warm caches and the schema registry
+                runs = []
+                for _ in range(VIEW_REPEATS):
+                    with Measurement() as m:
+                        response = getattr(client, method)(url, data)
+                        if response.streaming:
+                            b"".join(response.streaming_content)
+                    runs.append(m)
+                best = min(runs, key=lambda run: run.seconds)
+                results.append(best.result(suite="views", scenario=scenario, rows=size, status=response.status_code))
+    return results
+
+
+# ------------------------------
+# ✅ Concurrent submissions
+# ------------------------------
+def _percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+def legacy_submit(form):
+    """
+    The submission path before it was made atomic: the report is saved in
+    autocommit mode and each dynamic answer is a separate INSERT, with the
+    rollup refreshed after every one of them.
+    """
+    report = form.save(commit=False)
+    report.save()
+    for response in form.dynamic_responses(report):
+        response.save()
+    return report
+
+
+def _submit_reports(user, submission, days, submit, latencies, queries, failures):
+    from .forms import ReportForm
+
+    def count(execute, sql, params, many, context):
+        queries.append(1)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        for day in days:
+            started = time.perf_counter()
+            try:
+                form = ReportForm({**submission, "custom_date": day.isoformat()}, user=user)
+                if not form.is_valid():
+                    raise ValueError(form.errors.as_text())
+                submit(form)
+            except Exception as e:
+                failures.append(f"{type(e).__name__}: {e}")
+            else:
+                latencies.append(time.perf_counter() - started)
+
+
+def submission_load_test(requests, concurrency, fields=4, legacy=False, prefix="loadtest"):
+    """
+    Submit ``requests`` reports through ReportForm from ``concurrency``
+    threads at once, each thread filing one report a day for its own user,
+    as at the end of a shift. Every report answers ``fields`` dynamic
+    fields. Returns one result dict per path ("atomic", plus "legacy" when
+    asked) with latency percentiles in milliseconds.
+
+    Threads need committed data, so the users, fields and reports are
+    created for real and deleted afterwards: run this against a benchmark
+    database. With ``concurrency=1`` everything runs in the calling thread.
+    """
+    from .models import DynamicField, User
+    from .rollups import deferred_rollups
+    from .schema import TEAM_FIELDS, task_key
+
+    team = "video_editor"
+    paths = [("atomic", lambda form: form.save())]
+    if legacy:
+        paths.append(("legacy", legacy_submit))
+
+    definitions = [
+        DynamicField.objects.create(team=team, name=f"{prefix}_f{i}", label=f"Load Field {i}", field_type="text")
+        for i in range(fields)
+    ]
+    submission = {"shift": "9_5_30", "report_type": "regular"}
+    submission.update({task_key(label): 1 for label in TEAM_FIELDS[team]})
+    submission.update({d.name: "x" for d in definitions})
+
+    per_thread = max(requests // concurrency, 1)
+    start = datetime.date.today() - datetime.timedelta(days=per_thread)
+    days = [start + datetime.timedelta(days=i) for i in range(per_thread)]
+
+    results = []
+    try:
+        for path, submit in paths:
+            members = [
+                User.objects.create_user(f"{prefix}_{path}_{i}", password=None, team=team)
+                for i in range(concurrency)
+            ]
+            latencies, queries, failures = [], [], []
+            jobs = [(member, submission, days, submit, latencies, queries, failures) for member in members]
+
+            started = time.perf_counter()
+            if concurrency == 1:
+                _submit_reports(*jobs[0])
+            else:
+                def run(job):
+                    try:
+                        _submit_reports(*job)
+                    finally:
+                        connection.close()
+
+                threads = [threading.Thread(target=run, args=(job,)) for job in jobs]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            elapsed = time.perf_counter() - started
+
+            ordered = sorted(latencies)
+            ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+            submitted = len(ordered) + len(failures)
+            results.append({
+                "suite": "submit_load",
+                "scenario": path,
+                "requests": submitted,
+                "concurrency": concurrency,
+                "fields": fields,
+                "p50_ms": ms(_percentile(ordered, 50)),
+                "p95_ms": ms(_percentile(ordered, 95)),
+                "p99_ms": ms(_percentile(ordered, 99)),
+                "max_ms": ms(ordered[-1] if ordered else None),
+                "per_second": round(len(ordered) / elapsed, 1) if elapsed else None,
+                "queries_per_request": round(len(queries) / submitted, 1) if submitted else None,
+                "failures": len(failures),
+                "first_failure": failures[0] if failures else None,
+            })
+    finally:
+        with transaction.atomic(), deferred_rollups():
+            User.objects.filter(username__startswith=f"{prefix}_").delete()
+            DynamicField.objects.filter(pk__in=[d.pk for d in definitions]).delete()
+    return results
+
+
+# ------------------------------
+# ✅ Server modes (WSGI and ASGI)
+# ------------------------------
+SERVER_PAGES = {
+    "dashboard": ("user_dashboard", False),
+    "overview": ("admin_reports_overview", True),
+    "user_detail": ("user_report_detail", True),
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def gunicorn_server(mode, workers, preload=False, env=None):
+    """
+    Run gunicorn.conf.py with SERVER_MODE=``mode`` on a free local port,
+    against the current settings and database, with ``env`` added to the
+    environment. Yields the port and the master process.
+    """
+    from django.conf import settings
+
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp, open(f"{tmp}/server.log", "w+") as log:
+        env = {
+            **os.environ,
+            "SERVER_MODE": mode,
+            "GUNICORN_BIND": f"127.0.0.1:{port}",
+            "GUNICORN_WORKERS": str(workers),
+            "GUNICORN_PRELOAD": "1" if preload else "0",
+            "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE),
+            "PROMETHEUS_MULTIPROC_DIR": f"{tmp}/metrics",
+            **(env or {}),
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py"],
+            cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                    break
+                except OSError:
+                    if server.poll() is not None or time.monotonic() > deadline:
+                        log.seek(0)
+                        raise RuntimeError(f"{mode} server did not start:\n{log.read()[-2000:]}")
+                    time.sleep(0.05)
+            yield port, server
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+
+
+def _http_load(port, path, cookie, requests, concurrency):
+    """
+    GET ``path`` ``requests`` times from ``concurrency`` keep-alive
+    connections. Returns the sorted latencies, the non-200 count and the
+    wall time.
+    """
+    latencies, errors = [], []
+
+    def run(count):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                conn.request("GET", path, headers={"Cookie": cookie})
+                response = conn.getresponse()
+                response.read()
+                latencies.append(time.perf_counter() - started)
+                if response.status != 200:
+                    errors.append(response.status)
+        finally:
+            conn.close()
+
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    threads = [threading.Thread(target=run, args=(share,)) for share in shares if share]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), len(errors), time.perf_counter() - started
+
+
+def server_load_test(user, pages, modes=("wsgi", "asgi"), workers=2, requests=500, concurrency=16):
+    """
+    Serve the app with gunicorn in each of ``modes`` (sync workers or
+    uvicorn workers, see gunicorn.conf.py) and load ``pages`` (keys of
+    SERVER_PAGES) as ``user`` over HTTP. Returns one result dict per mode
+    and page with latency percentiles in milliseconds and requests per
+    second. Staff pages need a staff ``user``.
+    """
+    from django.conf import settings
+    from django.test import Client
+    from django.urls import reverse
+
+    client = Client()
+    client.force_login(user)
+    cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+    paths = {
+        page: reverse(SERVER_PAGES[page][0], args=[user.username] if page == "user_detail" else [])
+        for page in pages
+    }
+
+    ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+    results = []
+    for mode in modes:
+        with gunicorn_server(mode, workers) as (port, _):
+            for page, path in paths.items():
+                _http_load(port, path, cookie, concurrency * 2, concurrency)  # warm every worker
+                latencies, errors, elapsed = _http_load(port, path, cookie, requests, concurrency)
+                results.append({
+                    "suite": "server",
+                    "scenario": f"{mode}:{page}",
+                    "requests": len(latencies),
+                    "concurrency": concurrency,
+                    "workers": workers,
+                    "p50_ms": ms(_percentile(latencies, 50)),
+                    "p95_ms": ms(_percentile(latencies, 95)),
+                    "p99_ms": ms(_percentile(latencies, 99)),
+                    "max_ms": ms(latencies[-1] if latencies else None),
+                    "per_second": round(len(latencies) / elapsed, 1) if elapsed else None,
+                    "errors": errors,
+                })
+    return results
+
+
+# ------------------------------
+# ✅ Connection pool load test
+# ------------------------------
+SERVER_BACKENDS = """
+    SELECT pid FROM pg_stat_activity
+    WHERE datname = current_database() AND pid <> pg_backend_pid() AND backend_type = 'client backend'
+"""
+
+
+class _ConnectionSampler(threading.Thread):
+    """
+    Poll pg_stat_activity for the server's connections to the current
+    database: the most open at once, the average, and how many different
+    backends were started.
+    """
+
+    def __init__(self, interval=0.02):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.counts = []
+        self.pids = set()
+        self._done = threading.Event()
+
+    def run(self):
+        try:
+            while not self._done.is_set():
+                with connection.cursor() as cursor:
+                    cursor.execute(SERVER_BACKENDS)
+                    pids = [pid for pid, in cursor.fetchall()]
+                self.counts.append(len(pids))
+                self.pids.update(pids)
+                self._done.wait(self.interval)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        return {
+            "connections_peak": max(self.counts, default=0),
+            "connections_mean": round(sum(self.counts) / len(self.counts), 1) if self.counts else 0,
+            "connections_started": len(self.pids),
+        }
+
+
+def pool_load_test(user, page="overview", modes=("wsgi", "asgi"), workers=2, threads=4, requests=500, concurrency=16, pool_size=4):
+    """
+    Serve the app with gunicorn in each of ``modes``, once connecting
+    directly and once with DATABASE_POOL=True (at most ``pool_size``
+    connections per worker), and load ``page`` (a key of SERVER_PAGES) as
+    ``user``. Sync workers run ``threads`` threads. Returns one result dict
+    per mode and setup with latency percentiles and the number of Postgres
+    connections the server held (sampled from pg_stat_activity).
+    """
+    from django.conf import settings
+    from django.test import Client
+    from django.urls import reverse
+
+    if connection.vendor != "postgresql":
+        raise RuntimeError("The pool load test counts connections in pg_stat_activity, so it needs Postgres.")
+
+    client = Client()
+    client.force_login(user)
+    cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+    path = reverse(SERVER_PAGES[page][0], args=[user.username] if page == "user_detail" else [])
+    connection.close()  # the sampler's connections are the only ones of this process
+
+    ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+    results = []
+    for mode in modes:
+        for pooled in (False, True):
+            env = {
+                "GUNICORN_THREADS": str(threads),
+                "DATABASE_POOL": str(pooled),
+                "DATABASE_POOL_MIN_SIZE": "1",
+                "DATABASE_POOL_MAX_SIZE": str(pool_size),
+            }
+            with gunicorn_server(mode, workers, env=env) as (port, _):
+                _http_load(port, path, cookie, concurrency * 2, concurrency)  # warm every worker
+                sampler = _ConnectionSampler()
+                sampler.start()
+                latencies, errors, elapsed = _http_load(port, path, cookie, requests, concurrency)
+                counts = sampler.stop()
+            results.append({
+                "suite": "pool",
+                "scenario": f"{mode}:{'pooled' if pooled else 'direct'}",
+                "requests": len(latencies),
+                "concurrency": concurrency,
+                "workers": workers,
+                "threads": threads if mode == "wsgi" else None,
+                "pool_size": pool_size if pooled else None,
+                "p50_ms": ms(_percentile(latencies, 50)),
+                "p95_ms": ms(_percentile(latencies, 95)),
+                "p99_ms": ms(_percentile(latencies, 99)),
+                "per_second": round(len(latencies) / elapsed, 1) if elapsed else None,
+                "errors": errors,
+                **counts,
+            })
+    return results
+
+
+# ------------------------------
+# ✅ Worker startup (import time, preload_app)
+# ------------------------------
+# What a worker imports before it can answer its first request
+APP_IMPORT = "import media_reporting.wsgi; from django.urls import get_resolver; get_resolver().url_patterns"
+
+
+def import_times(statement=APP_IMPORT):
+    """
+    Run ``statement`` in a fresh interpreter with ``-X importtime`` against
+    the current settings. Returns ``{module: (self_ms, cumulative_ms)}``
+    and the total import time in milliseconds.
+    """
+    from django.conf import settings
+
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    modules, total = {}, 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        own, cumulative = int(own) / 1000, int(cumulative) / 1000
+        modules[name.strip()] = (own, cumulative)
+        if not name.startswith("  "):
+            total += cumulative
+    return modules, total
+
+
+def _get(port, path, timeout):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def _wait_for_answer(port, path, timeout=60):
+    # Connections queued on a worker that is being killed get reset
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if _get(port, path, timeout=timeout) == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"{path} did not answer within {timeout}s")
+
+
+def _worker_pids(master_pid, count, timeout=60):
+    # The master spawns workers one after another, with a short pause between
+    deadline = time.monotonic() + timeout
+    while True:
+        with open(f"/proc/{master_pid}/task/{master_pid}/children") as fh:
+            pids = [int(pid) for pid in fh.read().split()]
+        if len(pids) >= count or time.monotonic() > deadline:
+            return pids
+        time.sleep(0.05)
+
+
+def _memory_mb(pid):
+    """Resident and proportional set size of ``pid`` (Linux only)."""
+    sizes = {}
+    with open(f"/proc/{pid}/smaps_rollup") as fh:
+        for line in fh:
+            key, _, value = line.partition(":")
+            if key in ("Rss", "Pss"):
+                sizes[key] = int(value.split()[0]) / 1024
+    return sizes["Rss"], sizes["Pss"]
+
+
+def worker_startup(modes=("wsgi",), workers=2, path="/login/", warmup=50):
+    """
+    Start gunicorn with and without preload_app in each of ``modes`` and
+    measure:
+
+    * first_response_ms: from launching gunicorn to the first answer to
+      ``path``,
+    * respawn_ms: from killing every worker to the first answer again, the
+      cost of a worker restart (crash, timeout or max_requests),
+    * worker RSS and PSS after ``warmup`` requests. PSS splits pages shared
+      copy-on-write with the master between the processes sharing them, so
+      it shows what a worker really adds.
+
+    Reads /proc, so it only runs on Linux.
+    """
+    results = []
+    for mode in modes:
+        for preload in (False, True):
+            started = time.monotonic()
+            with gunicorn_server(mode, workers, preload=preload) as (port, server):
+                _wait_for_answer(port, path)
+                first_response = time.monotonic() - started
+                pids = _worker_pids(server.pid, workers)
+                _http_load(port, path, "", warmup, workers)
+                memory = [_memory_mb(pid) for pid in pids]
+
+                started = time.monotonic()
+                for pid in pids:
+                    os.kill(pid, 9)
+                _wait_for_answer(port, path)
+                respawn = time.monotonic() - started
+
+            results.append({
+                "suite": "startup",
+                "scenario": f"{mode}:{'preload' if preload else 'no-preload'}",
+                "workers": len(pids),
+                "first_response_ms": round(first_response * 1000, 1),
+                "respawn_ms": round(respawn * 1000, 1),
+                "worker_rss_mb": round(sum(rss for rss, _ in memory) / len(memory), 1),
+                "worker_pss_mb": round(sum(pss for _, pss in memory) / len(memory), 1),
+            })
+    return results
@@ -0,0 +1,34 @@
+"""
+Login checks for async views.
+
+Django 5.0's login_required and staff_member_required only wrap sync views.
+These resolve the user with ``request.auser()`` and put it back on
+``request.user``, so templates and context processors rendered afterwards
+do not look it up again.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import REDIRECT_FIELD_NAME
+from django.contrib.auth.views import redirect_to_login
+
+
+def async_user_passes_test(test_func, login_url=None, redirect_field_name=REDIRECT_FIELD_NAME):
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            request.user = await request.auser()
+            if test_func(request.user):
+                return await view_func(request, *args, **kwargs)
+            return redirect_to_login(request.get_full_path(), login_url or settings.LOGIN_URL, redirect_field_name)
+        return wrapper
+    return decorator
+
+
+def async_login_required(view_func):
+    return async_user_passes_test(lambda user: user.is_authenticated)(view_func)
+
+
+def async_staff_member_required(view_func):
+    # Same test and login page as django.contrib.admin's staff_member_required
+    return async_user_passes_test(lambda user: user.is_active and user.is_staff, login_url="admin:login")(view_func)
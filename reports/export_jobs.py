@@ -0,0 +1,132 @@
+"""
+Background export jobs.
+
+Staff queue an ExportJob from the overview page; ``run_export_worker``
+picks pending jobs up and builds the workbook in a local process pool,
+storing the finished file under MEDIA_ROOT/exports/. Jobs asking for the
+same filters against the same data version reuse the finished file.
+
+A job still pending REPORTS_EXPORT_JOB_TIMEOUT seconds after it was
+queued, or running without progress for that long (no worker running, a
+worker killed mid-job), is failed, so later requests queue a new one
+instead of waiting on it. A running job records a heartbeat with every
+chunk it writes, so a long export is never failed while it progresses, and
+a job failed meanwhile is never set back to done.
+"""
+import datetime
+import hashlib
+import json
+import logging
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Q
+from django.utils import timezone
+
+from .exports import filtered_rollups, write_export
+from .models import ExportJob
+from .rollups import data_version
+
+logger = logging.getLogger("reports.exports")
+
+EXPORT_FILTER_KEYS = ("start_date", "end_date", "team", "user")
+
+
+def clean_filters(params):
+    return {key: params[key] for key in EXPORT_FILTER_KEYS if params.get(key)}
+
+
+def job_fingerprint(filters, version):
+    payload = json.dumps({"filters": filters, "version": version}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def fail_jobs(job_ids, error):
+    """
+    Mark the unfinished jobs among ``job_ids`` as failed with ``error``.
+    """
+    return ExportJob.objects.filter(pk__in=job_ids, status__in=["pending", "running"]).update(
+        status="failed", error=error, finished_at=timezone.now(),
+    )
+
+
+def fail_stale_jobs(exclude=()):
+    """
+    Fail the jobs pending, or running without a heartbeat, for longer than
+    REPORTS_EXPORT_JOB_TIMEOUT, except those in ``exclude`` (the ones the
+    calling worker is still building). Returns their number.
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.REPORTS_EXPORT_JOB_TIMEOUT)
+    stale = ExportJob.objects.filter(
+        Q(status="pending", created_at__lt=cutoff) | Q(status="running", heartbeat_at__lt=cutoff)
+    ).exclude(pk__in=list(exclude))
+    return fail_jobs(list(stale.values_list("pk", flat=True)), "Timed out: no export worker finished the job.")
+
+
+def request_export(user, params):
+    """
+    Queue an export for ``params``. Returns ``(job, reused)``: an existing
+    job is returned when one with the same filters and data version is
+    finished or still in progress (see fail_stale_jobs).
+    """
+    filters = clean_filters(params)
+    version = data_version()
+    fingerprint = job_fingerprint(filters, version)
+
+    fail_stale_jobs()
+
+    for job in ExportJob.objects.filter(fingerprint=fingerprint, status__in=["pending", "running", "done"]):
+        if job.status != "done" or (job.file and job.file.storage.exists(job.file.name)):
+            return job, True
+
+    job = ExportJob.objects.create(
+        requested_by=user,
+        filters=filters,
+        data_version=version,
+        fingerprint=fingerprint,
+    )
+    return job, False
+
+
+def claim_pending_jobs(limit):
+    """
+    Mark up to ``limit`` pending jobs as running and return their ids. The
+    conditional UPDATE makes this safe when several workers poll at once.
+    """
+    claimed = []
+    for job_id in ExportJob.objects.filter(status="pending").order_by("created_at").values_list("pk", flat=True)[:limit]:
+        now = timezone.now()
+        if ExportJob.objects.filter(pk=job_id, status="pending").update(status="running", started_at=now, heartbeat_at=now):
+            claimed.append(job_id)
+    return claimed
+
+
+def run_export_job(job_id, chunk_size=2000):
+    """
+    Build the workbook for one claimed job. Runs inside a worker process.
+    """
+    job = ExportJob.objects.get(pk=job_id)
+    # Every write is conditional: a job failed as stale meanwhile stays failed
+    jobs = ExportJob.objects.filter(pk=job_id, status="running")
+
+    try:
+        jobs.update(rows_total=filtered_rollups(job.filters).count(), rows_written=0, heartbeat_at=timezone.now())
+
+        with tempfile.TemporaryFile() as spool:
+            written = write_export(
+                job.filters,
+                spool,
+                chunk_size=chunk_size,
+                on_progress=lambda written: jobs.update(rows_written=written, heartbeat_at=timezone.now()),
+            )
+            spool.seek(0)
+            job.file.save(f"reports-{job.fingerprint[:16]}.xlsx", File(spool), save=False)
+
+        # rows_written doubles as the job's row metric (metrics.ExportJobCollector)
+        if not jobs.update(status="done", file=job.file.name, rows_written=written, finished_at=timezone.now()):
+            logger.warning("Export job %s was failed while it ran; its file is discarded", job_id)
+            job.file.delete(save=False)
+    except Exception as exc:
+        logger.exception("Export job %s failed", job_id)
+        jobs.update(status="failed", error=str(exc), finished_at=timezone.now())
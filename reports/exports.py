@@ -0,0 +1,481 @@
+"""
+Streaming report exports.
+
+Rows are read from ReportDailyRollup through a chunked server-side cursor
+and handed to the writer of the requested format (EXPORT_FORMATS), so
+memory use stays flat no matter how many rows the export covers:
+
+* csv and jsonl are encoded chunk by chunk while the response streams,
+* xlsx goes through an openpyxl write-only workbook and parquet through
+  a pyarrow writer, in row groups; both are spooled to a temporary file.
+
+openpyxl (which pulls in numpy) and pyarrow are imported when the first
+export of their format is written, not with this module: views import it,
+and every worker would otherwise pay for them before serving its first page.
+
+A delta export (``since``) only covers the rollups written after a change
+watermark and the keys deleted since then (see changes.py), with a
+trailing ``deleted`` column, and hands back the watermark to pass next time.
+
+Under SERVER_MODE=asgi, downloads are streamed through an async iterator
+(asgi_streaming): Django reads a sync iterator to the end before sending
+any of it to an ASGI server.
+"""
+import csv
+import itertools
+import json
+import tempfile
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.models import Exists, Max, OuterRef
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from .metrics import EXPORT_ROWS
+from .changes import change_watermark, encode_since
+from .models import Report, ReportDailyRollup, RollupTombstone
+from .schema import field_labels
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+BASE_COLUMNS = ["username", "team", "custom_date", "shift", "notes"]
+
+ROW_FIELDS = (
+    "user__username", "user__team", "custom_date", "shift", "notes", "tasks", "dynamic_values",
+)
+
+SHIFT_LABELS = dict(Report.SHIFT_CHOICES)
+
+
+def filtered_rollups(params):
+    """
+    Apply the export filters (date range, team, user) from a GET-style
+    mapping to the rollup table.
+    """
+    rollups = ReportDailyRollup.objects.all()
+
+    start_date = params.get("start_date")
+    end_date = params.get("end_date")
+    if start_date and end_date:
+        rollups = rollups.filter(custom_date__range=[start_date, end_date])
+    if params.get("team"):
+        rollups = rollups.filter(user__team=params["team"])
+    if params.get("user"):
+        rollups = rollups.filter(user__username=params["user"])
+
+    return rollups
+
+
+def filtered_tombstones(params):
+    """
+    The same filters as filtered_rollups, applied to deleted rollup keys.
+    """
+    tombstones = RollupTombstone.objects.all()
+
+    start_date = params.get("start_date")
+    end_date = params.get("end_date")
+    if start_date and end_date:
+        tombstones = tombstones.filter(custom_date__range=[start_date, end_date])
+    if params.get("team"):
+        tombstones = tombstones.filter(team=params["team"])
+    if params.get("user"):
+        tombstones = tombstones.filter(username=params["user"])
+
+    return tombstones
+
+
+# JSON value types as reported by SQLite's json_each and by the query below
+# on Postgres, and the column kind each one allows
+JSON_KINDS = {
+    "integer": "integer", "real": "number", "true": "boolean", "false": "boolean",
+    "text": "text", "array": "text", "object": "text",
+}
+
+
+def _distinct_json_keys(rollups, column):
+    """
+    Distinct top-level keys of a JSON column across the filtered rollups,
+    each with the set of JSON value types found under it, computed entirely
+    in the database.
+    """
+    inner_sql, params = rollups.order_by().values(column).query.sql_with_params()
+    # On the database the queryset reads from, the replica under @use_replica
+    connection = connections[rollups.db]
+    if connection.vendor == "postgresql":
+        sql = f"""
+            SELECT DISTINCT j.key, CASE jsonb_typeof(j.value)
+                WHEN 'number' THEN CASE WHEN j.value::numeric = trunc(j.value::numeric) THEN 'integer' ELSE 'real' END
+                WHEN 'boolean' THEN j.value::text
+                WHEN 'string' THEN 'text'
+                ELSE jsonb_typeof(j.value)
+            END
+            FROM ({inner_sql}) AS r, jsonb_each(r.{column}) AS j
+        """
+    else:
+        sql = f"SELECT DISTINCT j.key, j.type FROM ({inner_sql}) AS r, json_each(r.{column}) AS j"
+
+    keys = {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for key, value_type in cursor.fetchall():
+            keys.setdefault(key, set()).add(value_type)
+    return keys
+
+
+def _column_kind(value_types):
+    kinds = {JSON_KINDS.get(t, "text") for t in value_types if t != "null"}
+    if kinds == {"integer"}:
+        return "integer"
+    if kinds and kinds <= {"integer", "number"}:
+        return "number"
+    if kinds == {"boolean"}:
+        return "boolean"
+    return "text"
+
+
+def task_columns(rollups, labels):
+    """
+    The task columns an export needs: static task keys first, then dynamic
+    field labels, without loading any rows into Python. Returns a dict of
+    column name to the kind of value it holds ("integer", "number",
+    "boolean" or "text"), which typed formats use for their schema.
+    """
+    value_types = {key: types for key, types in sorted(_distinct_json_keys(rollups, "tasks").items())}
+    dynamic = _distinct_json_keys(rollups, "dynamic_values")
+    for field_id in sorted(dynamic, key=int):
+        label = labels.get(int(field_id))
+        if label is not None:
+            value_types.setdefault(label, set()).update(dynamic[field_id])
+    return {column: _column_kind(types) for column, types in value_types.items()}
+
+
+def _cell(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def iter_export_rows(rollups, columns, labels, chunk_size=2000):
+    """
+    Yield one flat list per rollup row, in the order given by ``columns``.
+    """
+    rows = (
+        rollups
+        .order_by("custom_date", "user_id", "shift")
+        .values_list(*ROW_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for username, team, custom_date, shift, notes, tasks, dynamic_values in rows:
+        merged = dict(tasks or {})
+        for field_id, value in (dynamic_values or {}).items():
+            label = labels.get(int(field_id))
+            if label is not None:
+                merged[label] = value
+
+        yield [
+            username,
+            team,
+            custom_date,
+            SHIFT_LABELS.get(shift, shift),
+            " | ".join(notes or []),
+        ] + [_cell(merged.get(column)) for column in columns]
+
+
+def iter_deleted_rows(params, since, until, width, chunk_size=2000):
+    """
+    Yield one row per rollup key deleted in the change window ``(since,
+    until]``, with empty task columns. Keys written again within the window
+    are left out: their new rollup row is part of the same export.
+    """
+    rewritten = ReportDailyRollup.objects.filter(
+        user_id=OuterRef("user_id"), custom_date=OuterRef("custom_date"), shift=OuterRef("shift"),
+        change_seq__lte=until,
+    )
+    keys = (
+        filtered_tombstones(params)
+        .filter(change_seq__gt=since, change_seq__lte=until)
+        .exclude(Exists(rewritten))
+        .values("user_id", "custom_date", "shift")
+        .annotate(last_username=Max("username"), last_team=Max("team"))
+        .order_by("custom_date", "user_id", "shift")
+        .values_list("last_username", "last_team", "custom_date", "shift")
+        .iterator(chunk_size=chunk_size)
+    )
+    for username, team, custom_date, shift in keys:
+        yield [username, team, custom_date, SHIFT_LABELS.get(shift, shift), None] + [None] * width
+
+
+def write_xlsx(rows, columns, fileobj):
+    """
+    Write the header and rows through openpyxl's write-only mode, which
+    flushes each row to disk instead of building the sheet in memory.
+    Returns the number of data rows written.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    sheet.append(BASE_COLUMNS + list(columns))
+    written = 0
+    for row in rows:
+        sheet.append(row)
+        written += 1
+    workbook.save(fileobj)
+    return written
+
+
+def _chunked(pieces, size=64 * 1024):
+    """
+    Join encoded rows into chunks of about ``size`` characters, so a
+    streamed response is not written to the socket row by row.
+    """
+    buffer, length = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield "".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+class _Echo:
+    """File-like object whose write() returns the line csv.writer formatted."""
+
+    def write(self, value):
+        return value
+
+
+def encode_csv(rows, columns):
+    writer = csv.writer(_Echo())
+    header = writer.writerow(BASE_COLUMNS + list(columns))
+    return _chunked(itertools.chain([header], (writer.writerow(row) for row in rows)))
+
+
+def encode_jsonl(rows, columns):
+    """
+    One JSON object per line, keyed by column name. Blank task cells are
+    left out rather than written as null.
+    """
+    header = BASE_COLUMNS + list(columns)
+
+    def lines():
+        for row in rows:
+            record = {name: value for name, value in zip(header, row) if value is not None}
+            record["custom_date"] = record["custom_date"].isoformat()
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+
+    return _chunked(lines())
+
+
+class _Counted:
+    """Iterates over ``rows`` and counts them."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+
+def _write_encoded(encode):
+    def write(rows, columns, fileobj):
+        rows = _Counted(rows)
+        for chunk in encode(rows, columns):
+            fileobj.write(chunk.encode())
+        return rows.count
+    return write
+
+
+def _parquet_value(kind, value):
+    if value is None:
+        return None
+    if kind == "text":
+        return value if isinstance(value, str) else json.dumps(value)
+    if kind == "boolean":
+        return value if isinstance(value, bool) else None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    if kind == "integer":
+        return value if isinstance(value, int) else None
+    return float(value)
+
+
+def write_parquet(rows, columns, fileobj, row_group_size=10_000):
+    """
+    Write a Parquet file typed by the column kinds from task_columns, one
+    row group per ``row_group_size`` rows. Values that do not fit an
+    integer, number or boolean column are written as null; text columns
+    take the JSON form of anything that is not a string. Returns the
+    number of data rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"integer": pa.int64(), "number": pa.float64(), "boolean": pa.bool_(), "text": pa.string()}
+    schema = pa.schema(
+        [("username", pa.string()), ("team", pa.string()), ("custom_date", pa.date32()),
+         ("shift", pa.string()), ("notes", pa.string())]
+        + [(name, types[kind]) for name, kind in columns.items()]
+    )
+    kinds = [None] * len(BASE_COLUMNS) + list(columns.values())
+
+    def batch(chunk):
+        arrays = []
+        for values, kind, field in zip(zip(*chunk), kinds, schema):
+            if kind is not None:
+                values = [_parquet_value(kind, value) for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    written = 0
+    with pq.ParquetWriter(fileobj, schema) as writer:
+        for chunk in _batches(rows, row_group_size):
+            writer.write_batch(batch(chunk))
+            written += len(chunk)
+    return written
+
+
+def _batches(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    extension: str
+    content_type: str
+    # write(rows, columns, fileobj) -> rows written
+    write: Callable
+    # encode(rows, columns) -> text chunks, for formats that can be streamed
+    encode: Optional[Callable] = None
+
+
+EXPORT_FORMATS = {
+    "xlsx": ExportFormat("xlsx", XLSX_CONTENT_TYPE, write_xlsx),
+    "csv": ExportFormat("csv", "text/csv; charset=utf-8", _write_encoded(encode_csv), encode_csv),
+    "jsonl": ExportFormat("jsonl", "application/x-ndjson; charset=utf-8", _write_encoded(encode_jsonl), encode_jsonl),
+    "parquet": ExportFormat("parquet", "application/vnd.apache.parquet", write_parquet),
+}
+
+
+def _report_progress(rows, callback, every):
+    written = 0
+    for row in rows:
+        yield row
+        written += 1
+        if written % every == 0:
+            callback(written)
+    callback(written)
+
+
+def export_rows(params, chunk_size=2000, window=None):
+    """
+    The shared pipeline of every format: ``(rows, columns)`` for the
+    filtered export, where ``rows`` is a lazy iterator. With a change
+    ``window`` of ``(since, until)`` only the rows written or deleted in it
+    are returned, followed by a ``deleted`` flag.
+    """
+    rollups = filtered_rollups(params)
+    labels = field_labels()
+    if window is None:
+        columns = task_columns(rollups, labels)
+        return iter_export_rows(rollups, columns, labels, chunk_size), columns
+
+    since, until = window
+    rollups = rollups.filter(change_seq__gt=since, change_seq__lte=until)
+    columns = task_columns(rollups, labels)
+    rows = itertools.chain(
+        (row + [False] for row in iter_export_rows(rollups, columns, labels, chunk_size)),
+        (row + [True] for row in iter_deleted_rows(params, since, until, len(columns), chunk_size)),
+    )
+    return rows, {**columns, "deleted": "boolean"}
+
+
+def write_export(params, fileobj, chunk_size=2000, on_progress=None, export_format="xlsx", window=None):
+    """
+    Write the filtered export into ``fileobj``. ``on_progress`` is called
+    with the number of rows written after every chunk. Returns the number
+    of rows written.
+    """
+    rows, columns = export_rows(params, chunk_size, window)
+    if on_progress is not None:
+        rows = _report_progress(rows, on_progress, chunk_size)
+    return EXPORT_FORMATS[export_format].write(rows, columns, fileobj)
+
+
+_END = object()
+
+
+async def _iterate_in_thread(iterable):
+    # One chunk per step, in the request's thread as the view's ORM calls
+    iterator = iter(iterable)
+    step = sync_to_async(next)
+    while True:
+        chunk = await step(iterator, _END)
+        if chunk is _END:
+            return
+        yield chunk
+
+
+def asgi_streaming(response):
+    """
+    Make a streamed ``response`` iterate asynchronously when serving ASGI,
+    so it is sent chunk by chunk instead of being buffered in memory whole.
+    """
+    if settings.SERVER_MODE == "asgi" and response.streaming and not response.is_async:
+        response.streaming_content = _iterate_in_thread(response.streaming_content)
+    return response
+
+
+def export_response(params, export_format="xlsx", filename="reports", chunk_size=2000, since=None):
+    """
+    Download response for the filtered export. Formats with an encoder are
+    streamed while rows are read; the others are written to a spool file
+    first. When ``since`` is a change sequence number, only the changes
+    after it are exported and the X-Next-Since header carries the token
+    for the next call.
+    """
+    fmt = EXPORT_FORMATS[export_format]
+    filename = f"{filename}.{fmt.extension}"
+    window = None
+    if since is not None:
+        # A token ahead of the database (e.g. after a restore) exports
+        # nothing rather than moving the client backwards
+        window = (since, max(since, change_watermark()))
+
+    if fmt.encode is not None:
+        rows, columns = export_rows(params, chunk_size, window)
+        rows = _Counted(rows)
+
+        def stream():
+            yield from fmt.encode(rows, columns)
+            EXPORT_ROWS.labels("download").inc(rows.count)
+
+        response = StreamingHttpResponse(stream(), content_type=fmt.content_type)
+        response["Content-Disposition"] = content_disposition_header(True, filename)
+    else:
+        spool = tempfile.TemporaryFile()
+        EXPORT_ROWS.labels("download").inc(
+            write_export(params, spool, chunk_size, export_format=export_format, window=window)
+        )
+        spool.seek(0)
+        response = FileResponse(spool, as_attachment=True, filename=filename, content_type=fmt.content_type)
+
+    if window is not None:
+        response["X-Next-Since"] = encode_since(window[1])
+    return asgi_streaming(response)
@@ -1,6 +1,12 @@
 from django import forms
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
-from .models import Report, User
+from .merging import save_merged
+from .models import DynamicFieldResponse, Report, User
+from .rollups import deferred_rollups
+from .schema import TEAM_FIELDS, task_key, team_fields
+
 
 class ReportForm(forms.ModelForm):
     custom_date = forms.DateField(
@@ -60,6 +66,9 @@ class ReportForm(forms.ModelForm):
         self.user = kwargs.pop("user", None)
         super().__init__(*args, **kwargs)
 
+        # Admin-defined extra fields, resolved from the cached schema registry
+        self.dynamic_fields = team_fields(self.user.team) if self.user else ()
+
         # ----------------- Add Bootstrap to default fields ---------------------
         for field in self.fields.values():
             if not field.widget.attrs.get("class"):
@@ -72,49 +81,11 @@ class ReportForm(forms.ModelForm):
 
         team = self.user.team
 
-        # --------------------- TEAM STATIC FIELDS ------------------------------
-        TEAM_FIELDS = {
-            "video_producer": [
-                "Presenter Video", "Live Video", "Logo Video", "Special Work Video",
-                "Reel Video", "VO Video", "Interview Video", "Anchor/Presenter Video"
-            ],
-            "video_editor": [
-                "Logo Video", "Reel Video", "Two/Three Frame Video", "VO Video",
-                "Presenter Video", "Khabarbaat Video", "Special Interview",
-                "Video Shoot", "इतर"
-            ],
-            "graphic_designer": [
-                "Thumbnail (IG/YT)", "Reel/Live Thumbnail", "WhatsApp Creative",
-                "News of the Day", "News/Vdo Comment Link", "Infographics", "Slider",
-                "Statement", "Special Day", "Swipe Up", "Pointer Creative",
-                "Special Video Graphics", "Comment Creative"
-            ],
-            "content_writer": [
-                "News", "Bulletin", "Gallery", "Web Story", "Creative",
-                "Slider", "X Post", "App Post"
-            ],
-            "social_media": [
-                "Video Post", "Creative Post", "Live Video", "Slider Post",
-                "Swipe Up", "News In Comment", "Paid Promotion Post"
-            ],
-            "reporter": [
-                "Attended Press Conference", "Breaking News",
-                "Special Story", "Interview"
-            ],
-            "cameraman": [
-                "Attended Press Conference", "Special Story",
-                "Interview", "Event", "B Rolls", "Live"
-            ],
-            "marketing": [
-                "Client Visit Details", "Next Day Plan", "Client Follow-up Details"
-            ],
-        }
-
         static_fields = TEAM_FIELDS.get(team, [])
 
         # ------------------ Create dynamic numeric fields -----------------------
         for label in static_fields:
-            field_name = label.lower().replace(" ", "_").replace("/", "_").replace("-", "_")
+            field_name = task_key(label)
 
             self.fields[field_name] = forms.IntegerField(
                 min_value=0,
@@ -148,10 +119,27 @@ class ReportForm(forms.ModelForm):
             report.custom_date = timezone.now().date()
 
         if commit:
-            report.save()
+            # One transaction for the report and its answers, with the
+            # rollup refreshed once after both are written
+            with transaction.atomic(), deferred_rollups():
+                if settings.REPORTS_MERGE_ON_WRITE:
+                    save_merged(report, self.dynamic_responses(report))
+                else:
+                    report.save()
+                    DynamicFieldResponse.objects.bulk_create(self.dynamic_responses(report))
 
         return report
 
+    def dynamic_responses(self, report):
+        """
+        Unsaved DynamicFieldResponses for the non-empty dynamic field answers.
+        """
+        return [
+            DynamicFieldResponse(report=report, field_id=field.id, value=value)
+            for field in self.dynamic_fields
+            if (value := self.data.get(field.name))
+        ]
+
 
 # ---------------- Admin Filter Form -------------------
 class ReportFilterForm(forms.Form):
@@ -0,0 +1,96 @@
+"""
+Background report imports.
+
+An upload on the import page is stored under MEDIA_ROOT/imports/ as an
+ImportJob; ``run_import_worker`` imports pending jobs one at a time, so a
+large file never runs into the web server's request timeout. Each chunk
+records its users on the job in the chunk's own transaction: when a worker
+dies mid-import, the job is failed once it is REPORTS_IMPORT_JOB_TIMEOUT
+seconds old and the derived data of the rows it did commit is rebuilt.
+"""
+import datetime
+import logging
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .imports import CHUNK_SIZE, import_reports, rebuild_derived_data
+from .models import ImportJob
+
+logger = logging.getLogger("reports.imports")
+
+# Rejected rows kept on a job for the import page; the command lists them all
+REJECTED_KEPT = 100
+
+
+def queue_import(user, upload, dry_run=False):
+    """
+    Store ``upload`` and queue it for import. Returns the ImportJob.
+    """
+    job = ImportJob(requested_by=user, filename=upload.name, dry_run=dry_run)
+    job.file.save(upload.name, upload, save=False)
+    job.save()
+    return job
+
+
+def claim_pending_imports(limit):
+    """
+    Mark up to ``limit`` pending jobs as running and return their ids. The
+    conditional UPDATE makes this safe when several workers poll at once.
+    """
+    claimed = []
+    for job_id in ImportJob.objects.filter(status="pending").order_by("created_at").values_list("pk", flat=True)[:limit]:
+        if ImportJob.objects.filter(pk=job_id, status="pending").update(status="running", started_at=timezone.now()):
+            claimed.append(job_id)
+    return claimed
+
+
+def _progress(result):
+    return {
+        "rows": result.rows,
+        "created": result.created,
+        "rejected": [list(e) for e in sorted(result.errors)[:REJECTED_KEPT]],
+        "rejected_count": len(result.errors),
+    }
+
+
+def run_import_job(job_id, chunk_size=CHUNK_SIZE):
+    """
+    Import the file of one claimed job.
+    """
+    job = ImportJob.objects.get(pk=job_id)
+    jobs = ImportJob.objects.filter(pk=job_id)
+
+    try:
+        with job.file.open("rb") as fh:
+            result = import_reports(
+                fh,
+                job.filename,
+                dry_run=job.dry_run,
+                chunk_size=chunk_size,
+                on_chunk=lambda result, user_ids: jobs.update(user_ids=user_ids, **_progress(result)),
+            )
+        jobs.update(status="done", finished_at=timezone.now(), **_progress(result))
+    except Exception as exc:
+        logger.exception("Import job %s failed", job_id)
+        jobs.update(status="failed", error=str(exc), finished_at=timezone.now())
+
+
+def recover_stale_imports(chunk_size=CHUNK_SIZE):
+    """
+    Fail the jobs pending or running for longer than
+    REPORTS_IMPORT_JOB_TIMEOUT, after rebuilding the derived data of the
+    users their committed chunks wrote. Returns their number.
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.REPORTS_IMPORT_JOB_TIMEOUT)
+    stale = ImportJob.objects.filter(Q(status="pending", created_at__lt=cutoff) | Q(status="running", started_at__lt=cutoff))
+    failed = 0
+    for job in stale:
+        rebuild_derived_data(job.user_ids, chunk_size)
+        failed += ImportJob.objects.filter(pk=job.pk, status=job.status).update(
+            status="failed",
+            error=f"Timed out: the import stopped after {job.created} rows were written.",
+            finished_at=timezone.now(),
+        )
+    return failed
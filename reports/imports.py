@@ -0,0 +1,392 @@
+"""
+Bulk import of historical reports from CSV or XLSX.
+
+One row is one report. The file needs ``username`` and ``date`` columns and
+may have ``shift``, ``report_type`` and ``notes``. Every other column is a
+task: a static task of some team (by key or label) or a dynamic field (by
+name or label). Each row is validated against its user's team, so a sheet
+can mix teams; tasks that do not belong to the row's team must be blank.
+
+Files are parsed as a stream. Valid rows are written in chunks, one
+transaction per chunk: the reports, their dynamic responses and their task
+counts go in as plain tuples through COPY on Postgres (executemany
+elsewhere), skipping per-object model overhead. Signals are bypassed too,
+so daily rollups, calendar bitmaps and aggregates are rebuilt once at the
+end for the users that were touched. Invalid rows are skipped and reported
+by line number, and so are rows for a (user, date, shift) that already had
+a report before the import: uploading the same file twice would otherwise
+double its counts.
+
+Uploads from the web are imported by ``run_import_worker`` (see
+import_jobs.py), never inside the request.
+"""
+import csv
+import datetime
+import io
+import os
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+
+from .aggregates import refresh_aggregates
+from .bulk import RowInserter, allocate_ids
+from .models import DynamicFieldResponse, Report, TaskCount, User
+from .rollups import rebuild_rollups
+from .schema import TEAM_FIELDS, task_key, team_fields
+from .task_counts import numeric_tasks, task_type_ids
+
+CHUNK_SIZE = 2000
+
+BASE_COLUMNS = ("username", "date", "shift", "report_type", "notes")
+
+SHIFTS = {
+    **{label.lower(): key for key, label in Report.SHIFT_CHOICES},
+    **{key: key for key, _ in Report.SHIFT_CHOICES},
+}
+REPORT_TYPES = {
+    **{label.lower(): key for key, label in Report.REPORT_TYPES},
+    **{key: key for key, _ in Report.REPORT_TYPES},
+}
+BOOLEAN_VALUES = {"1": True, "true": True, "yes": True, "on": True, "0": False, "false": False, "no": False, "off": False}
+
+
+class ImportFormatError(ValueError):
+    """The file as a whole cannot be imported (unreadable, bad header)."""
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    errors: list = field(default_factory=list)
+    dry_run: bool = False
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+
+# ----------------------------------------------------
+# 📄 PARSING
+# ----------------------------------------------------
+def _normalize(header):
+    return str(header or "").strip().lower()
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _whole_number(value):
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(value)
+        return int(value)
+    return int(value if isinstance(value, int) else str(value).strip())
+
+
+def _csv_rows(fileobj):
+    if not isinstance(fileobj, io.TextIOBase):
+        fileobj = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    yield from csv.reader(fileobj)
+
+
+def _xlsx_rows(fileobj):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_rows(fileobj, filename):
+    """
+    Return ``(header, rows)`` for a CSV or XLSX file. ``header`` holds the
+    normalized column names and ``rows`` yields ``(line, values)`` for every
+    non-blank data row, where ``line`` is the 1-based row number in the file.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".csv":
+        rows = _csv_rows(fileobj)
+    elif extension == ".xlsx":
+        rows = _xlsx_rows(fileobj)
+    else:
+        raise ImportFormatError(f"Unsupported file type '{extension or filename}'; upload a .csv or .xlsx file.")
+
+    try:
+        header = [_normalize(h) for h in next(rows, ())]
+    except (UnicodeDecodeError, csv.Error, OSError, KeyError) as e:
+        raise ImportFormatError(f"Could not read {filename}: {e}")
+
+    def data_rows():
+        for line, values in enumerate(rows, start=2):
+            if any(not _blank(v) for v in values):
+                yield line, values
+
+    return header, data_rows()
+
+
+# ----------------------------------------------------
+# ✅ VALIDATION
+# ----------------------------------------------------
+def _static_columns():
+    """
+    Normalized header -> task key, for the static tasks of every team.
+    """
+    columns = {}
+    for labels in TEAM_FIELDS.values():
+        for label in labels:
+            columns[_normalize(label)] = task_key(label)
+            columns[task_key(label)] = task_key(label)
+    return columns
+
+
+class RowValidator:
+    """
+    Turns raw rows into unsaved Reports plus their dynamic answers, using
+    the header of the file being imported.
+    """
+
+    def __init__(self, header):
+        self.header = header
+        self.static = _static_columns()
+        self.users = {u: (pk, team) for pk, u, team in User.objects.values_list("pk", "username", "team")}
+
+        # Per-team lookups, resolved once rather than for every row
+        self.team_keys = {}
+        self.dynamic = {}
+        self.required = {}
+        for team, _ in User.TEAM_CHOICES:
+            self.team_keys[team] = sorted({task_key(label) for label in TEAM_FIELDS.get(team, [])})
+            fields = self.dynamic.setdefault(team, {})
+            for definition in team_fields(team):
+                fields[_normalize(definition.name)] = definition
+                fields[_normalize(definition.label)] = definition
+            self.required[team] = {d.id: d.label for d in team_fields(team) if d.required}
+        known_dynamic = {name for fields in self.dynamic.values() for name in fields}
+
+        missing = [c for c in ("username", "date") if c not in header]
+        if missing:
+            raise ImportFormatError(f"Missing required column(s): {', '.join(missing)}.")
+        unknown = [
+            h for h in header
+            if h and h not in BASE_COLUMNS and h not in self.static and h not in known_dynamic
+        ]
+        if unknown:
+            raise ImportFormatError(f"Unknown column(s): {', '.join(unknown)}.")
+
+    @staticmethod
+    def _date(value):
+        if isinstance(value, datetime.datetime):
+            return value.date()
+        if isinstance(value, datetime.date):
+            return value
+        return datetime.date.fromisoformat(str(value).strip())
+
+    @staticmethod
+    def _dynamic_value(definition, value):
+        if definition.field_type == "number":
+            return str(_whole_number(value))
+        if definition.field_type == "date":
+            return RowValidator._date(value).isoformat()
+        if definition.field_type == "boolean":
+            checked = value if isinstance(value, bool) else BOOLEAN_VALUES.get(_normalize(value))
+            if checked is None:
+                raise ValueError(value)
+            return "on" if checked else None
+        return str(value).strip()
+
+    def validate(self, values):
+        """
+        Return ``(report, team, answers)`` for one row, where ``report`` is
+        a dict of Report column values and ``answers`` a list of
+        (field_id, value). Raises ValueError with a readable message when
+        the row is invalid.
+        """
+        row = {h: v for h, v in zip(self.header, values) if h}
+
+        username = str(row.get("username") or "").strip()
+        if username not in self.users:
+            raise ValueError(f"Unknown user '{username}'.")
+        user_id, team = self.users[username]
+
+        try:
+            day = self._date(row.get("date"))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid date '{row.get('date') or ''}'; use YYYY-MM-DD.")
+
+        shift = "9_5_30" if _blank(row.get("shift")) else SHIFTS.get(_normalize(row["shift"]))
+        if shift is None:
+            raise ValueError(f"Unknown shift '{row['shift']}'.")
+        report_type = "regular" if _blank(row.get("report_type")) else REPORT_TYPES.get(_normalize(row["report_type"]))
+        if report_type is None:
+            raise ValueError(f"Unknown report type '{row['report_type']}'.")
+
+        team_keys = self.team_keys.get(team, ())
+        team_dynamic = self.dynamic.get(team, {})
+        tasks = dict.fromkeys(team_keys, 0)
+        answers = {}
+
+        for header, value in row.items():
+            if header in BASE_COLUMNS or _blank(value):
+                continue
+            if header in team_dynamic:
+                definition = team_dynamic[header]
+                try:
+                    answer = self._dynamic_value(definition, value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"Invalid {definition.field_type} '{value}' for '{definition.label}'.")
+                if answer is not None:
+                    answers[definition.id] = answer
+            elif self.static.get(header) in team_keys:
+                try:
+                    count = _whole_number(value)
+                except (TypeError, ValueError):
+                    count = -1
+                if count < 0:
+                    raise ValueError(f"'{header}' must be a whole number of 0 or more, not '{value}'.")
+                tasks[self.static[header]] = count
+            else:
+                raise ValueError(f"'{header}' is not a task of the {team} team.")
+
+        if report_type == "regular":
+            missing = [label for pk, label in self.required.get(team, {}).items() if pk not in answers]
+            if missing:
+                raise ValueError(f"Missing required field(s): {', '.join(missing)}.")
+
+        report = {
+            "user_id": user_id,
+            "custom_date": day,
+            # Historical rows count as filed on the day they are for
+            "date": day,
+            "shift": shift,
+            "report_type": report_type,
+            "tasks": tasks,
+            "task_total": Report.sum_tasks(tasks),
+            "notes": "" if _blank(row.get("notes")) else str(row["notes"]).strip(),
+        }
+        return report, team, list(answers.items())
+
+
+# ----------------------------------------------------
+# 💾 WRITING
+# ----------------------------------------------------
+class ReportWriter:
+    """
+    Writes validated rows in chunks, one transaction per chunk. Report ids
+    are reserved up front so answers and task counts can reference them.
+    """
+
+    def __init__(self):
+        self.reports = RowInserter(Report, with_pk=True)
+        self.responses = RowInserter(DynamicFieldResponse)
+        self.counts = RowInserter(TaskCount)
+        self.known_task_types = {}
+
+    def write(self, chunk):
+        now = timezone.now()
+        with transaction.atomic():
+            ids = allocate_ids(Report, len(chunk))
+            reports, responses, counts = [], [], []
+
+            for pk, (values, team, answers) in zip(ids, chunk):
+                reports.append({**values, "id": pk, "created_at": now})
+                responses.extend({"report_id": pk, "field_id": f, "value": v} for f, v in answers)
+                pairs = list(numeric_tasks(values["tasks"]))
+                type_ids = task_type_ids(team, [key for key, _ in pairs], self.known_task_types)
+                counts.extend({"report_id": pk, "task_type_id": type_ids[key], "count": n} for key, n in pairs)
+
+            self.reports.insert(reports)
+            self.responses.insert(responses)
+            self.counts.insert(counts)
+
+
+def _report_key(report):
+    return report["user_id"], report["custom_date"], report["shift"]
+
+
+def _existing_keys(chunk):
+    """
+    The (user, date, shift) keys of ``chunk`` that already have reports.
+    """
+    reports = [report for _, (report, _, _) in chunk]
+    days = [report["custom_date"] for report in reports]
+    existing = Report.objects.filter(
+        user_id__in={report["user_id"] for report in reports},
+        custom_date__gte=min(days),
+        custom_date__lte=max(days),
+    ).values_list("user_id", "custom_date", "shift")
+    return set(existing) & {_report_key(report) for report in reports}
+
+
+def import_reports(fileobj, filename, dry_run=False, chunk_size=CHUNK_SIZE, on_chunk=None):
+    """
+    Validate every row of ``fileobj`` and insert the valid ones unless
+    ``dry_run``. Returns an ImportResult; raises ImportFormatError when the
+    file cannot be read at all. ``on_chunk(result, user_ids)`` is called in
+    the transaction of every chunk written, with the users written so far.
+    """
+    result = ImportResult(dry_run=dry_run)
+    header, rows = read_rows(fileobj, filename)
+    validator = RowValidator(header)
+    writer = ReportWriter()
+    chunk = []
+    imported_keys = set()
+    touched_users = set()
+
+    def flush(chunk):
+        # Keys this import wrote itself may repeat: they are separate submissions
+        existing = _existing_keys(chunk) - imported_keys
+        fresh = []
+        for line, item in chunk:
+            key = _report_key(item[0])
+            if key in existing:
+                result.error(line, "A report for this user, date and shift already exists.")
+            else:
+                imported_keys.add(key)
+                fresh.append(item)
+        if dry_run or not fresh:
+            return
+
+        with transaction.atomic():
+            writer.write(fresh)
+            touched_users.update(report["user_id"] for report, _, _ in fresh)
+            result.created += len(fresh)
+            if on_chunk is not None:
+                on_chunk(result, sorted(touched_users))
+
+    try:
+        for line, values in rows:
+            result.rows += 1
+            try:
+                item = validator.validate(values)
+            except ValueError as e:
+                result.error(line, str(e))
+                continue
+
+            chunk.append((line, item))
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+
+        if chunk:
+            flush(chunk)
+    finally:
+        # Whatever was committed gets its derived data, even if a later chunk failed
+        rebuild_derived_data(touched_users, chunk_size)
+
+    result.errors.sort()
+    return result
+
+
+def rebuild_derived_data(user_ids, chunk_size=CHUNK_SIZE):
+    """
+    Rebuild the rollups, calendar bitmaps and aggregates of ``user_ids``
+    after their reports were written without signals.
+    """
+    for user_id in sorted(user_ids):
+        rebuild_rollups(user_id=user_id, chunk_size=chunk_size)
+    if user_ids:
+        refresh_aggregates()
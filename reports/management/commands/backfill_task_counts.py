@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reports.task_counts import backfill_task_counts
+
+
+class Command(BaseCommand):
+    help = "Populate TaskCount rows from the JSON tasks of existing reports."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        written = backfill_task_counts(chunk_size=options["chunk_size"], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} task counts."))
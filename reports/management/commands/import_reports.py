@@ -0,0 +1,43 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.imports import CHUNK_SIZE, ImportFormatError, import_reports
+
+
+class Command(BaseCommand):
+    help = "Import historical reports from a CSV or XLSX file, skipping and reporting invalid rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or XLSX file with one report per row.")
+        parser.add_argument("--dry-run", action="store_true", help="Validate every row without writing anything.")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--errors", help="Write the rejected rows (line, error) to this CSV file.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            with open(options["path"], "rb") as fh:
+                result = import_reports(fh, options["path"], dry_run=options["dry_run"], chunk_size=options["chunk_size"])
+        except (OSError, ImportFormatError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for line, message in result.errors[:20]:
+            self.stderr.write(f"Line {line}: {message}")
+        if len(result.errors) > 20:
+            self.stderr.write(f"...and {len(result.errors) - 20} more.")
+
+        if options["errors"]:
+            with open(options["errors"], "w", newline="") as fh:
+                writer = csv.writer(fh)
+                writer.writerow(["line", "error"])
+                writer.writerows(result.errors)
+
+        valid = result.rows - len(result.errors)
+        if result.dry_run:
+            summary = f"Dry run: {valid} of {result.rows} rows are valid"
+        else:
+            summary = f"Imported {result.created} of {result.rows} rows"
+        self.stdout.write(self.style.SUCCESS(f"{summary} in {elapsed:.1f}s ({len(result.errors)} rejected)."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reports.partitions import add_months, archive_before, ensure_partitions, month_start
+
+
+class Command(BaseCommand):
+    help = (
+        "Create Report partitions for the coming months and archive months older than --archive-after "
+        "into compressed dumps. Run it nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int, default=3, help="Future months to create partitions for.")
+        parser.add_argument(
+            "--archive-after", type=int,
+            help="Archive months that ended more than this many months ago (default: archive nothing).",
+        )
+
+    def handle(self, *args, **options):
+        if options["months_ahead"] < 0:
+            raise CommandError("--months-ahead cannot be negative.")
+
+        for month in ensure_partitions(months_ahead=options["months_ahead"]):
+            self.stdout.write(f"Created partition for {month:%Y-%m}")
+
+        if options["archive_after"] is not None:
+            if options["archive_after"] < 1:
+                raise CommandError("--archive-after must be at least 1.")
+            cutoff = add_months(month_start(timezone.localdate()), -options["archive_after"])
+            for archived in archive_before(cutoff):
+                self.stdout.write(f"Archived {archived.month:%Y-%m}: {archived.report_count} reports to {archived.path}")
+
+        self.stdout.write(self.style.SUCCESS("Report partitions are up to date."))
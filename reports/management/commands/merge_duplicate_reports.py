@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from reports.aggregates import refresh_aggregates
+from reports.merging import duplicate_keys, merge_existing_duplicates
+
+
+class Command(BaseCommand):
+    help = "Merge the reports filed for the same user, date and shift (run once when enabling REPORTS_MERGE_ON_WRITE)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500, help="Keys merged per transaction.")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the keys that have duplicates.")
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            self.stdout.write(f"{len(duplicate_keys())} user/date/shift keys have more than one report.")
+            return
+
+        deleted = merge_existing_duplicates(chunk_size=options["chunk_size"])
+        # Report counts changed
+        refresh_aggregates()
+        self.stdout.write(self.style.SUCCESS(f"Merged away {deleted} duplicate reports."))
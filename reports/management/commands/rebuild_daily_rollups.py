@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.models import User
+from reports.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Backfill the ReportDailyRollup table from the raw Report history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only rebuild rollups for this username.")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        user_id = None
+        if options["user"]:
+            try:
+                user_id = User.objects.get(username=options["user"]).pk
+            except User.DoesNotExist:
+                raise CommandError(f"Unknown user '{options['user']}'.")
+
+        written = rebuild_rollups(user_id=user_id, chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily rollup rows."))
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports.aggregates import refresh_aggregates
+from reports.rollups import data_version
+
+
+class Command(BaseCommand):
+    help = "Refresh the team, user and daily report aggregates (materialized views on Postgres)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--watch", action="store_true",
+            help="Keep running and refresh after each burst of writes instead of once.",
+        )
+        parser.add_argument("--poll-interval", type=float, default=5.0, help="Seconds between change checks.")
+        parser.add_argument(
+            "--settle", type=float, default=10.0,
+            help="With --watch, wait until no writes have been seen for this many seconds.",
+        )
+        parser.add_argument(
+            "--max-delay", type=float, default=300.0,
+            help="With --watch, refresh at the latest this many seconds after the first unrefreshed write.",
+        )
+
+    def handle(self, *args, **options):
+        # A watcher refreshes on start too, or writes made while none was
+        # running (during a deploy, say) would wait for the next write
+        refreshed = data_version()
+        self.refresh()
+        if not options["watch"]:
+            return
+
+        seen, first_change, last_change = refreshed, None, None
+        while True:
+            time.sleep(options["poll_interval"])
+            current = data_version()
+            now = time.monotonic()
+            if current != seen:
+                seen, last_change = current, now
+                first_change = first_change or now
+            if current == refreshed:
+                first_change = None
+                continue
+
+            settled = now - last_change >= options["settle"]
+            overdue = now - first_change >= options["max_delay"]
+            if settled or overdue:
+                self.refresh()
+                refreshed, first_change = current, None
+
+    def refresh(self):
+        started = time.perf_counter()
+        refresh_aggregates()
+        self.stdout.write(self.style.SUCCESS(f"Report aggregates refreshed in {time.perf_counter() - started:.2f}s."))
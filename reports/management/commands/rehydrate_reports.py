@@ -0,0 +1,35 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.partitions import archived_months, rehydrate_month
+
+
+def parse_month(value):
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise CommandError(f"Invalid month '{value}'; use YYYY-MM.")
+
+
+class Command(BaseCommand):
+    help = "Load archived report months back from their dumps, or list the archived months."
+
+    def add_arguments(self, parser):
+        parser.add_argument("months", nargs="*", help="Months to load back (YYYY-MM).")
+        parser.add_argument("--list", action="store_true", help="List the archived months.")
+
+    def handle(self, *args, **options):
+        if options["list"] or not options["months"]:
+            for archived in archived_months():
+                self.stdout.write(
+                    f"{archived.month:%Y-%m} reports={archived.report_count} archived_at={archived.archived_at:%Y-%m-%d %H:%M} "
+                    f"{archived.path}"
+                )
+            return
+
+        for month in map(parse_month, options["months"]):
+            if not archived_months(month, month).exists():
+                self.stdout.write(f"{month:%Y-%m} is not archived.")
+                continue
+            self.stdout.write(f"{month:%Y-%m}: loaded {rehydrate_month(month)} reports.")
@@ -0,0 +1,77 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports import benchmarks
+from reports.benchmarks import SUITES
+
+
+def _key(row):
+    return (row["suite"], row["scenario"], row["rows"])
+
+
+def _change(new, old):
+    if not old:
+        return "      n/a"
+    return f"{(new - old) / old * 100:>+8.1f}%"
+
+
+class Command(BaseCommand):
+    help = "Run performance benchmark suites and optionally save the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--suite", action="append", choices=sorted(SUITES), help="Suite to run (repeatable, default: all).")
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+        parser.add_argument("--legacy", action="store_true", help="Also run the previous implementation for comparison.")
+        parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc; report wall time only.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument("--baseline", help="Compare against results saved earlier with --output.")
+        parser.add_argument(
+            "--max-regression", type=float,
+            help="With --baseline, fail if any scenario is this many percent slower.",
+        )
+
+    def handle(self, *args, **options):
+        benchmarks.TRACE_MEMORY = not options["no_memory"]
+
+        results = []
+        for name in options["suite"] or sorted(SUITES):
+            for row in SUITES[name](options["sizes"], legacy=options["legacy"]):
+                results.append(row)
+                peak = f"{row['peak_mb']:>8.2f} MB" if row["peak_mb"] is not None else "       -"
+                extra = f"  {row['rows_per_second']} rows/s  {row['bytes']} bytes" if "bytes" in row else ""
+                self.stdout.write(
+                    f"{row['suite']:<12} {row['scenario']:<20} rows={row['rows']:<9} "
+                    f"{row['seconds']:>9.3f}s  queries={row['queries']:<6} peak={peak}{extra}"
+                )
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(results, fh, indent=2, default=str)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if options["baseline"]:
+            self.compare(results, options["baseline"], options["max_regression"])
+
+    def compare(self, results, path, max_regression):
+        with open(path) as fh:
+            baseline = {_key(row): row for row in json.load(fh)}
+
+        regressions = []
+        self.stdout.write(f"\nCompared with {path}:")
+        for row in results:
+            old = baseline.get(_key(row))
+            if old is None:
+                continue
+            self.stdout.write(
+                f"{row['suite']:<12} {row['scenario']:<20} rows={row['rows']:<9} "
+                f"time {_change(row['seconds'], old['seconds'])}  "
+                f"queries {old.get('queries', '?')} -> {row['queries']}"
+            )
+            if max_regression is not None and old["seconds"]:
+                slower = (row["seconds"] - old["seconds"]) / old["seconds"] * 100
+                if slower > max_regression:
+                    regressions.append(f"{row['suite']}/{row['scenario']}@{row['rows']} ({slower:+.1f}%)")
+
+        if regressions:
+            raise CommandError("Slower than baseline: " + ", ".join(regressions))
@@ -0,0 +1,63 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from reports.export_jobs import claim_pending_jobs, fail_jobs, fail_stale_jobs, run_export_job
+
+
+class Command(BaseCommand):
+    help = "Build queued Excel exports in a local process pool (no broker required)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=2, help="Number of export processes.")
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between queue polls.")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--once", action="store_true", help="Drain the current queue and exit.")
+
+    def handle(self, *args, **options):
+        processes = options["processes"]
+        running = {}
+
+        # Children are forked, so they inherit the configured Django setup
+        context = multiprocessing.get_context("fork")
+        pool = ProcessPoolExecutor(max_workers=processes, mp_context=context)
+        try:
+            while True:
+                broken = False
+                for future, job_id in list(running.items()):
+                    if not future.done():
+                        continue
+                    del running[future]
+                    try:
+                        future.result()
+                    except BrokenProcessPool:
+                        # A process died (OOM kill, segfault): every job still in the pool is lost
+                        broken = True
+                        fail_jobs([job_id], "The export process died before finishing the file.")
+                        self.stderr.write(f"Export job {job_id} failed: its process died.")
+                    else:
+                        self.stdout.write(f"Export job {job_id} finished.")
+
+                if broken:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = ProcessPoolExecutor(max_workers=processes, mp_context=context)
+
+                fail_stale_jobs(exclude=running.values())
+                free = processes - len(running)
+                job_ids = claim_pending_jobs(free) if free else []
+
+                # Never hand an open database connection to a forked process
+                connections.close_all()
+                for job_id in job_ids:
+                    self.stdout.write(f"Export job {job_id} started.")
+                    running[pool.submit(run_export_job, job_id, options["chunk_size"])] = job_id
+
+                if options["once"] and not running and not job_ids:
+                    break
+                time.sleep(options["poll_interval"])
+        finally:
+            pool.shutdown()
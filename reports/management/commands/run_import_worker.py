@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports.import_jobs import claim_pending_imports, recover_stale_imports, run_import_job
+from reports.imports import CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Import uploaded report files queued from the import page, one at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between queue polls.")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--once", action="store_true", help="Drain the current queue and exit.")
+
+    def handle(self, *args, **options):
+        while True:
+            recovered = recover_stale_imports(options["chunk_size"])
+            if recovered:
+                self.stderr.write(f"Failed {recovered} stale import job(s).")
+
+            job_ids = claim_pending_imports(1)
+            for job_id in job_ids:
+                self.stdout.write(f"Import job {job_id} started.")
+                run_import_job(job_id, options["chunk_size"])
+                self.stdout.write(f"Import job {job_id} finished.")
+
+            if options["once"] and not job_ids:
+                break
+            if not job_ids:
+                time.sleep(options["poll_interval"])
@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.benchmarks import submission_load_test
+
+
+class Command(BaseCommand):
+    help = (
+        "Submit reports from concurrent threads and report latency percentiles. "
+        "Creates and deletes its own users and fields; run it against a benchmark database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=400, help="Reports to submit per path.")
+        parser.add_argument("--concurrency", type=int, default=8, help="Threads submitting at once.")
+        parser.add_argument("--fields", type=int, default=4, help="Dynamic fields answered by every report.")
+        parser.add_argument("--legacy", action="store_true", help="Also run the previous submission path for comparison.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1 or options["requests"] < 1:
+            raise CommandError("--requests and --concurrency must be at least 1.")
+
+        results = submission_load_test(
+            options["requests"], options["concurrency"], fields=options["fields"], legacy=options["legacy"],
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['scenario']:<8} requests={row['requests']:<6} concurrency={row['concurrency']:<4} "
+                f"p50={row['p50_ms']}ms p95={row['p95_ms']}ms p99={row['p99_ms']}ms max={row['max_ms']}ms "
+                f"{row['per_second']}/s queries/request={row['queries_per_request']} failures={row['failures']}"
+            )
+            if row["first_failure"]:
+                self.stderr.write(f"{row['scenario']}: first failure: {row['first_failure']}")
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.benchmarks import SERVER_PAGES, pool_load_test
+from reports.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the app with gunicorn with and without DATABASE_POOL and compare latency and the "
+        "number of Postgres connections held under concurrent load (Postgres only)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="Username to load the page as (staff for admin pages).")
+        parser.add_argument("--page", choices=sorted(SERVER_PAGES), default="overview")
+        parser.add_argument("--mode", action="append", choices=["wsgi", "asgi"], help="Server mode (repeatable, default: both).")
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--threads", type=int, default=4, help="Threads per sync (wsgi) worker.")
+        parser.add_argument("--pool-size", type=int, default=4, help="Pooled connections per worker at most.")
+        parser.add_argument("--requests", type=int, default=500, help="Requests per mode and setup.")
+        parser.add_argument("--concurrency", type=int, default=16, help="Connections sending requests at once.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named '{options['user']}'.")
+        if SERVER_PAGES[options["page"]][1] and not user.is_staff:
+            raise CommandError(f"{user.username} is not staff, so cannot load: {options['page']}.")
+        if min(options["workers"], options["threads"], options["pool_size"]) < 1:
+            raise CommandError("--workers, --threads and --pool-size must be at least 1.")
+
+        try:
+            results = pool_load_test(
+                user, options["page"], modes=options["mode"] or ["wsgi", "asgi"], workers=options["workers"],
+                threads=options["threads"], requests=options["requests"], concurrency=options["concurrency"],
+                pool_size=options["pool_size"],
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        for row in results:
+            self.stdout.write(
+                f"{row['scenario']:<12} requests={row['requests']:<6} concurrency={row['concurrency']:<4} "
+                f"p50={row['p50_ms']}ms p95={row['p95_ms']}ms p99={row['p99_ms']}ms {row['per_second']}/s "
+                f"errors={row['errors']} connections: peak={row['connections_peak']} "
+                f"mean={row['connections_mean']} started={row['connections_started']}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,53 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.benchmarks import SERVER_PAGES, server_load_test
+from reports.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the app with gunicorn sync workers (wsgi) and uvicorn workers (asgi) and compare "
+        "throughput and latency percentiles of the read-heavy pages, loaded over HTTP."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="Username to load the pages as (staff for admin pages).")
+        parser.add_argument("--page", action="append", choices=sorted(SERVER_PAGES), help="Page to load (repeatable, default: all).")
+        parser.add_argument("--mode", action="append", choices=["wsgi", "asgi"], help="Server mode (repeatable, default: both).")
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--requests", type=int, default=500, help="Requests per mode and page.")
+        parser.add_argument("--concurrency", type=int, default=16, help="Connections sending requests at once.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named '{options['user']}'.")
+
+        pages = options["page"] or sorted(SERVER_PAGES)
+        staff_pages = [page for page in pages if SERVER_PAGES[page][1]]
+        if staff_pages and not user.is_staff:
+            raise CommandError(f"{user.username} is not staff, so cannot load: {', '.join(staff_pages)}.")
+
+        try:
+            results = server_load_test(
+                user, pages, modes=options["mode"] or ["wsgi", "asgi"], workers=options["workers"],
+                requests=options["requests"], concurrency=options["concurrency"],
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        for row in results:
+            self.stdout.write(
+                f"{row['scenario']:<18} requests={row['requests']:<6} concurrency={row['concurrency']:<4} "
+                f"p50={row['p50_ms']}ms p95={row['p95_ms']}ms p99={row['p99_ms']}ms max={row['max_ms']}ms "
+                f"{row['per_second']}/s errors={row['errors']}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
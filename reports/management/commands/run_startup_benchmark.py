@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.benchmarks import import_times, worker_startup
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile what a worker imports before its first request, then start gunicorn with and "
+        "without preload_app and compare worker boot, respawn time and memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", action="append", choices=["wsgi", "asgi"], help="Server mode (repeatable, default: wsgi).")
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--top", type=int, default=10, help="Slowest imports to list.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1.")
+
+        modules, total = import_times()
+        self.stdout.write(f"App import: {total:.1f}ms, {len(modules)} modules. Slowest (cumulative):")
+        slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:options["top"]]
+        for name, (own, cumulative) in slowest:
+            self.stdout.write(f"  {cumulative:>9.1f}ms {own:>8.1f}ms self  {name}")
+
+        try:
+            results = worker_startup(modes=options["mode"] or ["wsgi"], workers=options["workers"])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        for row in results:
+            self.stdout.write(
+                f"{row['scenario']:<18} workers={row['workers']:<3} first_response={row['first_response_ms']}ms "
+                f"respawn={row['respawn_ms']}ms worker_rss={row['worker_rss_mb']}MB worker_pss={row['worker_pss_mb']}MB"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump({"import_ms": total, "startup": results}, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
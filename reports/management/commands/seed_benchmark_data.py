@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reports.benchmarks import seed_benchmark_data
+from reports.models import User, DynamicField
+
+
+class Command(BaseCommand):
+    help = "Create users across every team with realistic reports, dynamic fields and notes for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--prefix", default="bench", help="Username and field name prefix of the seeded data.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, for reproducible data.")
+        parser.add_argument("--clear", action="store_true", help="Delete previously seeded data with this prefix first.")
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+
+        if options["clear"]:
+            deleted, _ = User.objects.filter(username__startswith=f"{prefix}_").delete()
+            DynamicField.objects.filter(name__startswith=f"{prefix}_").delete()
+            self.stdout.write(f"Deleted {deleted} rows of earlier '{prefix}' data.")
+
+        with transaction.atomic():
+            members = seed_benchmark_data(options["users"], options["days"], prefix=prefix, seed=options["seed"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(members)} users with {options['days']} days of reports. "
+            f"Log in as any of them with the password '{prefix}'."
+        ))
@@ -0,0 +1,237 @@
+"""
+Merge-on-write for reports (REPORTS_MERGE_ON_WRITE).
+
+By default every submission is a Report row of its own and the daily
+rollups merge the reports filed for the same (user, date, shift). With
+merge on write, a submission for a key that already has a merged report is
+folded into it by a single INSERT ... ON CONFLICT DO UPDATE against the
+partial unique constraint on merged reports. The database merges the task
+JSON with the same rules as the rollups (numbers are summed, blanks are
+ignored, anything else is overwritten) and appends the notes on a new
+line, so concurrent submissions for one key cannot lose each other's
+counts. Dynamic answers overwrite the earlier answer to the same field.
+
+Reports written while the mode was off, or by the bulk import, are not
+flagged and keep being merged by the rollups at read time, until the
+``merge_duplicate_reports`` command consolidates them.
+"""
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import connection, transaction
+from django.db.models import Count, Exists, Max, OuterRef, Q
+
+from .models import DynamicFieldResponse, Report, TaskCount
+from .rollups import deferred_rollups, effective_date, merge_task_value, request_rollup_refresh
+from .task_counts import write_task_counts
+
+NOTES_SEPARATOR = "\n"
+
+# The merged tasks object of the current row ("cur") and the submitted one
+# ("sub"), as a one-column subquery "m(tasks)"
+POSTGRES_MERGED_TASKS = """
+    SELECT COALESCE(jsonb_object_agg(key, CASE
+        WHEN jsonb_typeof(cur.value) = 'number' AND jsonb_typeof(sub.value) = 'number'
+            THEN to_jsonb(cur.value::numeric + sub.value::numeric)
+        ELSE COALESCE(NULLIF(sub.value, 'null'::jsonb), cur.value)
+    END), '{{}}'::jsonb) AS tasks
+    FROM jsonb_each(COALESCE({table}.tasks, '{{}}'::jsonb)) AS cur
+    FULL JOIN jsonb_each(COALESCE(EXCLUDED.tasks, '{{}}'::jsonb)) AS sub USING (key)
+"""
+POSTGRES_TASK_TOTAL = """
+    GREATEST((
+        SELECT COALESCE(SUM(trunc(t.value::numeric)), 0) FROM jsonb_each(m.tasks) AS t
+        WHERE jsonb_typeof(t.value) = 'number'
+    ), 0)
+"""
+
+# SQLite returns JSON booleans from json_each as 1/0; turn them back into JSON
+SQLITE_VALUE = "CASE {t}.type WHEN 'true' THEN json('true') WHEN 'false' THEN json('false') ELSE {t}.value END"
+SQLITE_MERGED_TASKS = """
+    SELECT COALESCE(json_group_object(key, value), '{{}}') AS tasks FROM (
+        SELECT cur.key AS key, CASE
+            WHEN sub.key IS NULL OR sub.type = 'null' THEN {cur_value}
+            WHEN cur.type IN ('integer', 'real') AND sub.type IN ('integer', 'real') THEN cur.value + sub.value
+            ELSE {sub_value}
+        END AS value
+        FROM json_each(COALESCE({table}.tasks, '{{}}')) AS cur
+        LEFT JOIN json_each(COALESCE(excluded.tasks, '{{}}')) AS sub ON sub.key = cur.key
+        UNION ALL
+        SELECT sub.key, {sub_value}
+        FROM json_each(COALESCE(excluded.tasks, '{{}}')) AS sub
+        WHERE sub.key NOT IN (SELECT key FROM json_each(COALESCE({table}.tasks, '{{}}')))
+    )
+"""
+SQLITE_TASK_TOTAL = """
+    MAX((
+        SELECT COALESCE(SUM(CAST(t.value AS INTEGER)), 0) FROM json_each(m.tasks) AS t
+        WHERE t.type IN ('integer', 'real')
+    ), 0)
+"""
+
+
+def _upsert_sql(fields):
+    quote = connection.ops.quote_name
+    table = quote(Report._meta.db_table)
+    if connection.vendor == "postgresql":
+        merged_tasks = POSTGRES_MERGED_TASKS.format(table=table)
+        task_total = POSTGRES_TASK_TOTAL
+    else:
+        merged_tasks = SQLITE_MERGED_TASKS.format(
+            table=table, cur_value=SQLITE_VALUE.format(t="cur"), sub_value=SQLITE_VALUE.format(t="sub"),
+        )
+        task_total = SQLITE_TASK_TOTAL
+
+    return f"""
+        INSERT INTO {table} ({", ".join(quote(f.column) for f in fields)})
+        VALUES ({", ".join(["%s"] * len(fields))})
+        ON CONFLICT ("user_id", "custom_date", "shift") WHERE "merged"
+        DO UPDATE SET
+            ("tasks", "task_total") = (SELECT m.tasks, {task_total} FROM ({merged_tasks}) AS m),
+            "notes" = CASE
+                WHEN COALESCE(excluded."notes", '') = '' THEN {table}."notes"
+                WHEN COALESCE({table}."notes", '') = '' THEN excluded."notes"
+                ELSE {table}."notes" || %s || excluded."notes"
+            END
+        RETURNING "id", "tasks", "task_total", "notes"
+    """
+
+
+def upsert_report(report):
+    """
+    Insert ``report`` as the merged report of its (user, date, shift), or
+    fold it into the one already there. Sets the primary key and the merged
+    tasks, total and notes on ``report``. Signals are not sent; the caller
+    (save_merged) writes task counts and refreshes the rollup.
+    """
+    report.fill_derived_fields()
+    report.merged = True
+    fields = [f for f in Report._meta.concrete_fields if not f.primary_key and not f.generated]
+    values = [f.get_db_prep_save(f.pre_save(report, True), connection) for f in fields]
+
+    with connection.cursor() as cursor:
+        cursor.execute(_upsert_sql(fields), [*values, NOTES_SEPARATOR])
+        pk, tasks, task_total, notes = cursor.fetchone()
+
+    report.pk = pk
+    report.tasks = Report._meta.get_field("tasks").from_db_value(tasks, None, connection)
+    report.task_total = task_total
+    report.notes = notes
+    report._state.adding = False
+    report._state.db = connection.alias
+    return report
+
+
+def save_merged(report, responses):
+    """
+    Merge-on-write counterpart of ``report.save()`` plus inserting its
+    dynamic ``responses``. Call inside a transaction and deferred_rollups().
+    """
+    upsert_report(report)
+    write_task_counts(report)
+
+    for response in responses:
+        response.report = report
+    DynamicFieldResponse.objects.filter(report=report, field_id__in=[r.field_id for r in responses]).delete()
+    DynamicFieldResponse.objects.bulk_create(responses)
+
+    request_rollup_refresh(report.user_id, effective_date(report), report.shift)
+    return report
+
+
+def duplicate_keys():
+    """
+    The (user_id, custom_date, shift) keys that have more than one report.
+    """
+    return list(
+        Report.objects
+        .values("user_id", "custom_date", "shift")
+        .annotate(reports=Count("id"))
+        .filter(reports__gt=1)
+        .order_by("user_id", "custom_date", "shift")
+        .values_list("user_id", "custom_date", "shift")
+    )
+
+
+def _merge_keys(keys):
+    # Fold the reports of each key into its first one, as the rollups
+    # merge them for display
+    matching = reduce(or_, (Q(user_id=u, custom_date=d, shift=s) for u, d, s in keys))
+    groups = defaultdict(list)
+    for report in Report.objects.filter(matching).prefetch_related("dynamic_responses").order_by("pk"):
+        groups[(report.user_id, report.custom_date, report.shift)].append(report)
+
+    survivors, moved, dropped, owner = [], [], [], {}
+    for key, reports in groups.items():
+        first = reports[0]
+        latest = {}
+        for report in reports:
+            for response in report.dynamic_responses.all():
+                if response.field_id in latest:
+                    dropped.append(latest[response.field_id].pk)
+                latest[response.field_id] = response
+        for response in latest.values():
+            if response.report_id != first.pk:
+                response.report_id = first.pk
+                moved.append(response)
+
+        tasks = {}
+        for report in reports:
+            for k, v in (report.tasks or {}).items():
+                merge_task_value(tasks, k, v)
+        first.tasks = tasks
+        first.task_total = Report.sum_tasks(tasks)
+        first.notes = NOTES_SEPARATOR.join(r.notes for r in reports if r.notes)
+        first.merged = True
+        survivors.append(first)
+        owner.update((r.pk, first.pk) for r in reports[1:])
+        request_rollup_refresh(*key)
+
+    group_ids = [*owner, *(r.pk for r in survivors)]
+    counts = defaultdict(int)
+    for report_id, task_type_id, count in TaskCount.objects.filter(report_id__in=group_ids).values_list(
+        "report_id", "task_type_id", "count",
+    ):
+        counts[(owner.get(report_id, report_id), task_type_id)] += count
+
+    DynamicFieldResponse.objects.filter(pk__in=dropped).delete()
+    DynamicFieldResponse.objects.bulk_update(moved, ["report"])
+    TaskCount.objects.filter(report_id__in=group_ids).delete()
+    TaskCount.objects.bulk_create(
+        [TaskCount(report_id=r, task_type_id=t, count=n) for (r, t), n in counts.items()]
+    )
+    # Duplicates go before the survivors are flagged, or the unique
+    # constraint on merged reports could see two of them
+    Report.objects.filter(pk__in=list(owner)).delete()
+    Report.objects.bulk_update(survivors, ["tasks", "task_total", "notes", "merged"])
+    return len(owner)
+
+
+def merge_existing_duplicates(chunk_size=500, flag_chunk_size=20000):
+    """
+    Consolidate the reports filed before REPORTS_MERGE_ON_WRITE was turned
+    on: every (user, date, shift) with several reports keeps its first one,
+    holding the merged tasks, notes, dynamic answers and task counts of all
+    of them, and every remaining report is flagged merged so later
+    submissions fold into it. Each chunk of keys commits on its own, so an
+    interrupted run can simply be started again. Returns the number of
+    reports deleted.
+    """
+    keys = duplicate_keys()
+    deleted = 0
+    for start in range(0, len(keys), chunk_size):
+        with transaction.atomic(), deferred_rollups():
+            deleted += _merge_keys(keys[start:start + chunk_size])
+
+    # Reports a submission duplicated since the keys were read stay
+    # unflagged, and are merged by the rollups or by the next run
+    siblings = Report.objects.filter(
+        user_id=OuterRef("user_id"), custom_date=OuterRef("custom_date"), shift=OuterRef("shift"),
+    ).exclude(pk=OuterRef("pk"))
+    last = Report.objects.aggregate(last=Max("pk"))["last"] or 0
+    for start in range(0, last, flag_chunk_size):
+        Report.objects.filter(
+            pk__gt=start, pk__lte=start + flag_chunk_size, merged=False,
+        ).exclude(Exists(siblings)).update(merged=True)
+    return deleted
@@ -0,0 +1,115 @@
+"""
+Prometheus metrics for requests and exports.
+
+Under gunicorn every worker is a separate process, so values are kept in
+prometheus_client's multiprocess mode: each process writes its samples to
+memory-mapped files in PROMETHEUS_MULTIPROC_DIR and the /metrics view
+merges them at scrape time. Without that variable (runserver, tests) the
+in-process default registry is used.
+
+Background export jobs are built by run_export_worker, usually in another
+container whose metric files the web workers never see, so their totals
+are read from the ExportJob table at scrape time instead.
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+REQUESTS = Counter(
+    "reports_http_requests_total", "Requests handled, by view and status.",
+    ["view", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "reports_http_request_duration_seconds", "Time spent producing a response, by view.",
+    ["view", "method"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "reports_http_request_db_queries", "SQL queries issued per request, by view.",
+    ["view"], buckets=QUERY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "reports_http_request_db_seconds", "Time spent in SQL per request, by view.",
+    ["view"], buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "reports_http_response_size_bytes", "Response body size, by view.",
+    ["view"], buckets=SIZE_BUCKETS,
+)
+EXPORT_ROWS = Counter(
+    "reports_export_rows_total", "Rows written to exports downloaded in the request.",
+    ["source"],
+)
+DB_POOL_WAIT = Histogram(
+    "reports_db_pool_wait_seconds", "Time spent waiting for a pooled database connection, by alias.",
+    ["alias"], buckets=WAIT_BUCKETS,
+)
+DB_POOL_TIMEOUTS = Counter(
+    "reports_db_pool_timeouts_total", "Requests that gave up waiting for a pooled database connection, by alias.",
+    ["alias"],
+)
+# Summed over the live workers: open connections, idle ones, and requests waiting
+DB_POOL_CONNECTIONS = Gauge(
+    "reports_db_pool_connections", "Pooled database connections by alias and state (open, idle, waiting).",
+    ["alias", "state"], multiprocess_mode="livesum",
+)
+REPLICA_ROUTING = Counter(
+    "reports_replica_routing_total", "Requests of @use_replica views, by the database they read from and why.",
+    ["database", "reason"],
+)
+
+
+class ExportJobCollector:
+    """
+    Finished export jobs and the rows they wrote, by status.
+    """
+
+    def collect(self):
+        from django.db.models import Count, Sum
+
+        from .models import ExportJob
+
+        jobs = CounterMetricFamily("reports_export_jobs", "Background export jobs finished, by status.", labels=["status"])
+        rows = CounterMetricFamily("reports_export_job_rows", "Rows written by background export jobs, by status.", labels=["status"])
+        totals = dict.fromkeys(["done", "failed"], (0, 0))
+        for status, count, written in (
+            ExportJob.objects.filter(status__in=totals).order_by()
+            .values_list("status").annotate(Count("pk"), Sum("rows_written"))
+        ):
+            totals[status] = (count, written or 0)
+        for status, (count, written) in totals.items():
+            jobs.add_metric([status], count)
+            rows.add_metric([status], written)
+        yield jobs
+        yield rows
+
+
+EXPORT_JOB_REGISTRY = CollectorRegistry(auto_describe=False)
+EXPORT_JOB_REGISTRY.register(ExportJobCollector())
+
+
+def render_metrics():
+    """
+    Return ``(body, content_type)`` with every metric in Prometheus text
+    format, merged across worker processes when multiprocess mode is on.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(EXPORT_JOB_REGISTRY), CONTENT_TYPE_LATEST
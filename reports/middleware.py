@@ -0,0 +1,160 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .metrics import REQUESTS, REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_DB_TIME, RESPONSE_SIZE
+from .replicas import note_write
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+
+class _QueryTimer:
+    """
+    Execute wrapper counting the queries of one request and the time they take.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Record latency, SQL query count and time, and response size per URL name.
+    Keep it first in MIDDLEWARE so the timings cover the whole stack.
+
+    Works under WSGI and ASGI. Under ASGI the ORM runs a request's queries
+    in a thread of its own, so the query timer is installed from there.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            self._time_queries(stack, timer)
+            response = self.get_response(request)
+        self._record(request, response, timer, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        stack = ExitStack()
+        await sync_to_async(self._time_queries)(stack, timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self._record(request, response, timer, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def _time_queries(stack, timer):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timer))
+
+    @staticmethod
+    def _record(request, response, timer, elapsed):
+        # URL names keep the label set small; unmatched paths share one label
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "<unresolved>"
+
+        REQUESTS.labels(view, request.method, response.status_code).inc()
+        REQUEST_LATENCY.labels(view, request.method).observe(elapsed)
+        REQUEST_QUERIES.labels(view).observe(timer.count)
+        REQUEST_DB_TIME.labels(view).observe(timer.seconds)
+
+        # Streaming bodies are only measured when they announce their length
+        if response.streaming:
+            size = response.get("Content-Length")
+        else:
+            size = len(response.content)
+        if size is not None:
+            RESPONSE_SIZE.labels(view).observe(int(size))
+
+
+class ReadYourWritesMiddleware:
+    """
+    Stamp the session of a signed-in user after each write request, so the
+    @use_replica views read from the primary until the replica has caught
+    up with it (see replicas.py). Place it after AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        response = self.get_response(request)
+        self._stamp(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        # Loading the session and the user may query the database
+        await sync_to_async(self._stamp)(request)
+        return response
+
+    @staticmethod
+    def _stamp(request):
+        # Stamped once the response is ready, after the view's writes committed
+        if request.method not in SAFE_METHODS and request.user.is_authenticated:
+            note_write(request)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, usable in an async middleware chain. WhiteNoise 6.7 is
+    sync-only, which under ASGI would push every request through a thread
+    and back just to check for a static file. Lookups only touch the
+    in-memory file table (or the disk with autorefresh), so they are safe to
+    run on the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
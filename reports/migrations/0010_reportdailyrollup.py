@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0009_report_report_type_user_weekly_off'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('custom_date', models.DateField(help_text='Effective report date (custom_date, or submission date if unset)')),
+                ('shift', models.CharField(choices=[('7_3_30', '7:00 AM – 3:30 PM'), ('8_8_30', '8:00 AM – 4:30 PM'), ('9_5_30', '9:00 AM – 5:30 PM'), ('10_6_30', '10:00 AM – 6:30 PM'), ('12_8_30', '12:00 PM – 8:30 PM'), ('2_30_11', '2:30 PM – 11:00 PM'), ('wfh', 'Work From Home')], max_length=20)),
+                ('report_type', models.CharField(choices=[('regular', 'Regular Working Day'), ('leave', 'On Leave')], default='regular', max_length=20)),
+                ('tasks', models.JSONField(blank=True, default=dict)),
+                ('dynamic_values', models.JSONField(blank=True, default=dict)),
+                ('notes', models.JSONField(blank=True, default=list)),
+                ('report_count', models.PositiveIntegerField(default=0)),
+                ('is_late_submission', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(help_text='Submission time of the first merged report')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['custom_date', 'user', 'shift'], name='rollup_date_user_shift_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reportdailyrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'custom_date', 'shift'), name='unique_daily_rollup'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:46
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+def backfill_task_totals(apps, schema_editor):
+    Report = apps.get_model('reports', 'Report')
+    last_pk = 0
+    while True:
+        chunk = list(Report.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'tasks')[:2000])
+        if not chunk:
+            break
+        for report in chunk:
+            total = 0
+            for value in (report.tasks or {}).values():
+                try:
+                    total += int(value)
+                except (TypeError, ValueError):
+                    continue
+            report.task_total = max(total, 0)
+        Report.objects.bulk_update(chunk, ['task_total'])
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0011_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='effective_date',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.comparison.Coalesce('custom_date', 'date'), output_field=models.DateField()),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='task_total',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['user', 'custom_date'], name='report_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['custom_date', 'shift'], name='report_date_shift_idx'),
+        ),
+        migrations.RunPython(backfill_task_totals, migrations.RunPython.noop),
+    ]
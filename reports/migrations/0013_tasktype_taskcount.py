@@ -0,0 +1,48 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0012_report_indexes_and_derived_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskType',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('team', models.CharField(choices=[('content_writer', 'Content Writer'), ('graphic_designer', 'Graphic Designer'), ('video_editor', 'Video Editor'), ('social_media', 'Social Media'), ('video_producer', 'Video Producer'), ('reporter', 'Reporter'), ('cameraman', 'Cameraman'), ('marketing', 'Marketing')], max_length=50)),
+                ('key', models.CharField(help_text='Key the task is stored under in Report.tasks', max_length=100)),
+                ('label', models.CharField(max_length=150)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TaskCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField()),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_counts', to='reports.report')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='tasktype',
+            constraint=models.UniqueConstraint(fields=('team', 'key'), name='unique_task_type_per_team'),
+        ),
+        migrations.AddField(
+            model_name='taskcount',
+            name='task_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counts', to='reports.tasktype'),
+        ),
+        migrations.AddIndex(
+            model_name='taskcount',
+            index=models.Index(fields=['task_type', 'count'], name='task_count_type_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskcount',
+            constraint=models.UniqueConstraint(fields=('report', 'task_type'), name='unique_task_count_per_report'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_submission_months(apps, schema_editor):
+    ReportDailyRollup = apps.get_model('reports', 'ReportDailyRollup')
+    SubmissionMonth = apps.get_model('reports', 'SubmissionMonth')
+
+    masks = {}
+    rows = ReportDailyRollup.objects.values_list('user_id', 'custom_date', 'report_type').iterator(chunk_size=5000)
+    for user_id, day, report_type in rows:
+        key = (user_id, day.replace(day=1))
+        submitted, leave = masks.get(key, (0, 0))
+        bit = 1 << (day.day - 1)
+        masks[key] = (submitted | bit, leave | bit if report_type == 'leave' else leave)
+
+    SubmissionMonth.objects.bulk_create(
+        [
+            SubmissionMonth(user_id=user_id, month=month, submitted_days=submitted, leave_days=leave)
+            for (user_id, month), (submitted, leave) in masks.items()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0013_tasktype_taskcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('submitted_days', models.IntegerField(default=0, help_text='Bitmask of days with a report')),
+                ('leave_days', models.IntegerField(default=0, help_text='Bitmask of days reported as leave')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submission_months', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='submissionmonth',
+            constraint=models.UniqueConstraint(fields=('user', 'month'), name='unique_submission_month'),
+        ),
+        migrations.RunPython(backfill_submission_months, migrations.RunPython.noop),
+    ]
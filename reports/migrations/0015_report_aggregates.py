@@ -0,0 +1,120 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of reports.aggregates.AGGREGATE_QUERIES as of this migration
+QUERIES = {
+    'reports_dailyaggregate': """
+        SELECT CAST(r.user_id AS TEXT) || ':' || CAST(r.effective_date AS TEXT) AS key,
+               r.user_id, u.team, r.effective_date AS day,
+               COUNT(*) AS report_count, SUM(r.task_total) AS task_total
+        FROM reports_report r
+        JOIN reports_user u ON u.id = r.user_id
+        GROUP BY r.user_id, u.team, r.effective_date
+    """,
+    'reports_useraggregate': """
+        SELECT r.user_id, u.team, COUNT(*) AS report_count, SUM(r.task_total) AS task_total
+        FROM reports_report r
+        JOIN reports_user u ON u.id = r.user_id
+        GROUP BY r.user_id, u.team
+    """,
+    'reports_teamaggregate': """
+        SELECT u.team, COUNT(*) AS report_count, SUM(r.task_total) AS task_total
+        FROM reports_report r
+        JOIN reports_user u ON u.id = r.user_id
+        GROUP BY u.team
+    """,
+}
+
+# Unique indexes double as the keys REFRESH ... CONCURRENTLY diffs on
+INDEXES = [
+    'CREATE UNIQUE INDEX reports_dailyaggregate_user_day ON reports_dailyaggregate (user_id, day)',
+    'CREATE INDEX reports_dailyaggregate_day ON reports_dailyaggregate (day)',
+    'CREATE UNIQUE INDEX reports_useraggregate_user ON reports_useraggregate (user_id)',
+    'CREATE UNIQUE INDEX reports_teamaggregate_team ON reports_teamaggregate (team)',
+]
+
+# SQLite fallback: plain tables with the views' columns, in the same order
+TABLES = {
+    'reports_dailyaggregate': (
+        'key varchar(32) NOT NULL PRIMARY KEY, user_id integer NOT NULL, team varchar(50) NOT NULL, '
+        'day date NOT NULL, report_count integer NOT NULL, task_total bigint NOT NULL'
+    ),
+    'reports_useraggregate': (
+        'user_id integer NOT NULL PRIMARY KEY, team varchar(50) NOT NULL, '
+        'report_count integer NOT NULL, task_total bigint NOT NULL'
+    ),
+    'reports_teamaggregate': (
+        'team varchar(50) NOT NULL PRIMARY KEY, report_count integer NOT NULL, task_total bigint NOT NULL'
+    ),
+}
+
+
+def create_aggregates(apps, schema_editor):
+    postgres = schema_editor.connection.vendor == 'postgresql'
+    for table, query in QUERIES.items():
+        if postgres:
+            schema_editor.execute(f'CREATE MATERIALIZED VIEW {table} AS {query} WITH DATA')
+        else:
+            schema_editor.execute(f'CREATE TABLE {table} ({TABLES[table]})')
+            schema_editor.execute(f'INSERT INTO {table} {query}')
+    for index in INDEXES:
+        schema_editor.execute(index)
+
+
+def drop_aggregates(apps, schema_editor):
+    kind = 'MATERIALIZED VIEW' if schema_editor.connection.vendor == 'postgresql' else 'TABLE'
+    for table in QUERIES:
+        schema_editor.execute(f'DROP {kind} IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0014_submissionmonth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAggregate',
+            fields=[
+                ('key', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('team', models.CharField(choices=[('content_writer', 'Content Writer'), ('graphic_designer', 'Graphic Designer'), ('video_editor', 'Video Editor'), ('social_media', 'Social Media'), ('video_producer', 'Video Producer'), ('reporter', 'Reporter'), ('cameraman', 'Cameraman'), ('marketing', 'Marketing')], max_length=50)),
+                ('day', models.DateField()),
+                ('report_count', models.IntegerField()),
+                ('task_total', models.BigIntegerField()),
+            ],
+            options={
+                'db_table': 'reports_dailyaggregate',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TeamAggregate',
+            fields=[
+                ('team', models.CharField(choices=[('content_writer', 'Content Writer'), ('graphic_designer', 'Graphic Designer'), ('video_editor', 'Video Editor'), ('social_media', 'Social Media'), ('video_producer', 'Video Producer'), ('reporter', 'Reporter'), ('cameraman', 'Cameraman'), ('marketing', 'Marketing')], max_length=50, primary_key=True, serialize=False)),
+                ('report_count', models.IntegerField()),
+                ('task_total', models.BigIntegerField()),
+            ],
+            options={
+                'db_table': 'reports_teamaggregate',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='UserAggregate',
+            fields=[
+                ('user', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='aggregate', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('team', models.CharField(choices=[('content_writer', 'Content Writer'), ('graphic_designer', 'Graphic Designer'), ('video_editor', 'Video Editor'), ('social_media', 'Social Media'), ('video_producer', 'Video Producer'), ('reporter', 'Reporter'), ('cameraman', 'Cameraman'), ('marketing', 'Marketing')], max_length=50)),
+                ('report_count', models.IntegerField()),
+                ('task_total', models.BigIntegerField()),
+            ],
+            options={
+                'db_table': 'reports_useraggregate',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_aggregates, drop_aggregates),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0015_report_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='merged',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:44
+"""
+The partial unique constraint that keeps merged reports unique. Existing
+reports stay unflagged; the ``merge_duplicate_reports`` command
+consolidates them when REPORTS_MERGE_ON_WRITE is turned on.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0016_report_merged'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='report',
+            constraint=models.UniqueConstraint(condition=models.Q(('merged', True)), fields=('user', 'effective_date', 'shift'), name='unique_merged_report'),
+        ),
+    ]
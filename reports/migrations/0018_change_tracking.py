@@ -0,0 +1,57 @@
+# Generated by Django 5.0.6 on 2026-10-17 22:41
+"""
+Track rollup changes for the delta export: a change sequence number on every
+rollup and a tombstone table for deleted keys. Existing rollups are numbered
+in id order, so the first delta export returns all of them.
+"""
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def number_existing_rollups(apps, schema_editor):
+    table = apps.get_model('reports', 'ReportDailyRollup')._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        if schema_editor.connection.vendor == 'postgresql':
+            cursor.execute('CREATE SEQUENCE IF NOT EXISTS reports_change_seq')
+            cursor.execute(
+                f"UPDATE {table} SET change_seq = s.seq FROM "
+                f"(SELECT id, nextval('reports_change_seq') AS seq FROM (SELECT id FROM {table} ORDER BY id) AS o) AS s "
+                f"WHERE {table}.id = s.id"
+            )
+        else:
+            cursor.execute(f'UPDATE {table} SET change_seq = id')
+
+
+def drop_change_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP SEQUENCE IF EXISTS reports_change_seq')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0017_merge_duplicate_reports'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportdailyrollup',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0, help_text='Change sequence number of the last write (see changes.py)'),
+        ),
+        migrations.CreateModel(
+            name='RollupTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('change_seq', models.BigIntegerField(db_index=True)),
+                ('username', models.CharField(max_length=150)),
+                ('team', models.CharField(max_length=50)),
+                ('custom_date', models.DateField()),
+                ('shift', models.CharField(choices=[('7_3_30', '7:00 AM – 3:30 PM'), ('8_8_30', '8:00 AM – 4:30 PM'), ('9_5_30', '9:00 AM – 5:30 PM'), ('10_6_30', '10:00 AM – 6:30 PM'), ('12_8_30', '12:00 PM – 8:30 PM'), ('2_30_11', '2:30 PM – 11:00 PM'), ('wfh', 'Work From Home')], max_length=20)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(number_existing_rollups, drop_change_sequence),
+    ]
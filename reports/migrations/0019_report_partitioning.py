@@ -0,0 +1,95 @@
+# Generated by Django 5.0.6 on 2026-10-17 22:47
+"""
+Prepare Report for range partitioning on custom_date (see
+reports/partitions.py and the partition_reports command):
+
+* reports without a custom_date get their submission date, which is what
+  effective_date already showed, and the column becomes NOT NULL,
+* the merged-report unique index moves from effective_date to custom_date,
+* answers and task counts lose their database foreign key to Report.
+
+Not atomic: the backfill commits chunk by chunk. On Postgres the NOT NULL
+is proven by a check constraint validated without blocking writes, so
+SET NOT NULL does not scan the table under an exclusive lock.
+"""
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+from django.db.models import F
+
+CHUNK_SIZE = 20000
+NOT_NULL_CHECK = 'report_custom_date_not_null'
+
+
+def fill_custom_dates(apps, schema_editor):
+    Report = apps.get_model('reports', 'Report')
+    missing = Report.objects.filter(custom_date__isnull=True).order_by('pk')
+    while True:
+        with transaction.atomic():
+            ids = list(missing.values_list('pk', flat=True)[:CHUNK_SIZE])
+            if not ids:
+                break
+            Report.objects.filter(pk__in=ids).update(custom_date=F('date'))
+
+    if schema_editor.connection.vendor == 'postgresql':
+        table = Report._meta.db_table
+        schema_editor.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {NOT_NULL_CHECK} CHECK (custom_date IS NOT NULL) NOT VALID'
+        )
+        schema_editor.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {NOT_NULL_CHECK}')
+
+
+def drop_not_null_check(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        table = apps.get_model('reports', 'Report')._meta.db_table
+        schema_editor.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {NOT_NULL_CHECK}')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('reports', '0018_change_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month', unique=True)),
+                ('path', models.CharField(max_length=500)),
+                ('report_count', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField()),
+                ('rehydrated_at', models.DateTimeField(blank=True, help_text='Set while the month is loaded back', null=True)),
+            ],
+            options={
+                'ordering': ['month'],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='report',
+            name='unique_merged_report',
+        ),
+        migrations.AlterField(
+            model_name='dynamicfieldresponse',
+            name='report',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='dynamic_responses', to='reports.report'),
+        ),
+        migrations.RunPython(fill_custom_dates, drop_not_null_check),
+        migrations.AlterField(
+            model_name='report',
+            name='custom_date',
+            field=models.DateField(blank=True, help_text='The date this report is for'),
+        ),
+        migrations.RunPython(drop_not_null_check, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='taskcount',
+            name='report',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='task_counts', to='reports.report'),
+        ),
+        migrations.AddConstraint(
+            model_name='report',
+            constraint=models.UniqueConstraint(condition=models.Q(('merged', True)), fields=('user', 'custom_date', 'shift'), name='unique_merged_report'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-18 01:25
+
+from django.db import migrations, models
+
+
+def heartbeat_from_start(apps, schema_editor):
+    # Jobs running across the deploy time out from when they started, as before
+    ExportJob = apps.get_model('reports', 'ExportJob')
+    ExportJob.objects.filter(heartbeat_at__isnull=True).update(heartbeat_at=models.F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0020_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last progress of a running job', null=True),
+        ),
+        migrations.RunPython(heartbeat_from_start, migrations.RunPython.noop),
+    ]
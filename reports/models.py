@@ -1,5 +1,8 @@
+import datetime
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Coalesce, Trunc
 
 
 # ------------------------------
@@ -55,7 +58,9 @@ class Report(models.Model):
     report_type = models.CharField(max_length=20, choices=REPORT_TYPES, default='regular')
     shift = models.CharField(max_length=20, choices=SHIFT_CHOICES, default='9_5_30')
     date = models.DateField(auto_now_add=True, help_text="Auto submission date")
-    custom_date = models.DateField(blank=True, null=True, help_text="The date this report is for")
+    # Never NULL in the table: Report can be range-partitioned on it by month
+    # (see reports/partitions.py). Left blank, it is the submission date.
+    custom_date = models.DateField(blank=True, help_text="The date this report is for")
 
     # ✅ Static task fields (common or known ones)
     presenter_video = models.IntegerField(default=0, blank=True, null=True)
@@ -74,15 +79,166 @@ class Report(models.Model):
     # ✅ Keep dynamic fields as JSON too (optional)
     tasks = models.JSONField(blank=True, null=True)
 
+    # ✅ Derived columns so hot filters / sorts can run in SQL
+    effective_date = models.GeneratedField(
+        expression=Coalesce("custom_date", "date"),
+        output_field=models.DateField(),
+        db_persist=True,
+        db_index=True,
+    )
+    task_total = models.PositiveIntegerField(default=0, db_index=True, editable=False)
+
+    # ✅ Set on the one report per (user, date, shift) that later submissions
+    # are merged into (REPORTS_MERGE_ON_WRITE, see reports/merging.py)
+    merged = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'custom_date'], name='report_user_date_idx'),
+            models.Index(fields=['custom_date', 'shift'], name='report_date_shift_idx'),
+        ]
+        constraints = [
+            # On custom_date (equal to effective_date) because a unique index
+            # on a partitioned table must include the partition key
+            models.UniqueConstraint(
+                fields=['user', 'custom_date', 'shift'],
+                condition=models.Q(merged=True),
+                name='unique_merged_report',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.custom_date or self.date} ({self.get_shift_display()})"
 
+    @staticmethod
+    def sum_tasks(tasks):
+        total = 0
+        for value in (tasks or {}).values():
+            try:
+                total += int(value)
+            except (TypeError, ValueError):
+                continue
+        return max(total, 0)
+
+    def fill_derived_fields(self):
+        # Postgres cannot sum JSON values in a generated column, so the
+        # total is kept in a plain column refreshed on every save.
+        self.task_total = self.sum_tasks(self.tasks)
+        if self.custom_date is None:
+            # What auto_now_add will store in date
+            self.custom_date = self.date or datetime.date.today()
+
+    def save(self, *args, **kwargs):
+        self.fill_derived_fields()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "tasks" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "task_total"}
+        super().save(*args, **kwargs)
+
     @property
     def is_late_submission(self):
         if self.custom_date:
             return self.custom_date < self.date
         return False
 
+    def preview_fields(self, labels):
+        """
+        ``(static, dynamic)`` dicts for display: task counts keyed by a
+        title-cased task key, and dynamic responses keyed by field label.
+        """
+        static = {k.replace("_", " ").title(): v for k, v in (self.tasks or {}).items()}
+        dynamic = {labels.get(r.field_id, r.field_id): r.value for r in self.dynamic_responses.all()}
+        return static, dynamic
+
+
+# ------------------------------
+# ✅ Task Type (dictionary of task keys per team)
+# ------------------------------
+class TaskType(models.Model):
+    team = models.CharField(max_length=50, choices=User.TEAM_CHOICES)
+    key = models.CharField(max_length=100, help_text="Key the task is stored under in Report.tasks")
+    label = models.CharField(max_length=150)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['team', 'key'], name='unique_task_type_per_team'),
+        ]
+
+    def __str__(self):
+        return f"{self.team} - {self.label}"
+
+
+# ------------------------------
+# ✅ Task Count (one row per report and task)
+# ------------------------------
+class PeriodStart(Trunc):
+    """
+    Trunc for date columns that compiles to SQLite's native date() modifiers
+    instead of Django's per-row Python function; other backends use Trunc.
+    """
+    SQLITE_MODIFIERS = {
+        'day': (),
+        'week': ('weekday 0', '-6 days'),
+        'month': ('start of month',),
+        'year': ('start of year',),
+    }
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        modifiers = self.SQLITE_MODIFIERS.get(self.kind)
+        if modifiers is None:
+            return self.as_sql(compiler, connection, **extra_context)
+        sql, params = compiler.compile(self.lhs)
+        return 'date(%s)' % ', '.join([sql] + ["'%s'" % m for m in modifiers]), params
+
+
+class TaskCountQuerySet(models.QuerySet):
+    def for_reports(self, reports):
+        return self.filter(report__in=reports)
+
+    def by_task(self):
+        return (
+            self.values('task_type__team', 'task_type__key', 'task_type__label')
+            .annotate(total=models.Sum('count'))
+            .order_by('task_type__team', 'task_type__key')
+        )
+
+    def by_team(self):
+        return (
+            self.values('task_type__team')
+            .annotate(total=models.Sum('count'))
+            .order_by('task_type__team')
+        )
+
+    def by_period(self, kind):
+        """Totals per day, week, month or year of the report's effective date."""
+        return (
+            self.annotate(period=PeriodStart('report__effective_date', kind, output_field=models.DateField()))
+            .values('period')
+            .annotate(total=models.Sum('count'))
+            .order_by('period')
+        )
+
+
+class TaskCount(models.Model):
+    # No database constraint: Postgres can only reference a partitioned
+    # Report through a key that includes custom_date. Deletes still cascade.
+    report = models.ForeignKey(Report, on_delete=models.CASCADE, db_constraint=False, related_name='task_counts')
+    task_type = models.ForeignKey(TaskType, on_delete=models.CASCADE, related_name='counts')
+    count = models.IntegerField()
+
+    objects = TaskCountQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['report', 'task_type'], name='unique_task_count_per_report'),
+        ]
+        indexes = [
+            models.Index(fields=['task_type', 'count'], name='task_count_type_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.report} - {self.task_type.key}: {self.count}"
+
 
 # ------------------------------
 # ✅ Admin Notice Model
@@ -128,9 +284,253 @@ class DynamicField(models.Model):
 # ✅ Dynamic Field Response (Stores the user input)
 # ------------------------------
 class DynamicFieldResponse(models.Model):
-    report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name='dynamic_responses')
+    # No database constraint, like TaskCount.report
+    report = models.ForeignKey(Report, on_delete=models.CASCADE, db_constraint=False, related_name='dynamic_responses')
     field = models.ForeignKey(DynamicField, on_delete=models.CASCADE)
     value = models.TextField(blank=True, null=True)
 
     def __str__(self):
-        return f"{self.report} - {self.field.label}: {self.value}"
\ No newline at end of file
+        return f"{self.report} - {self.field.label}: {self.value}"
+
+
+# ------------------------------
+# ✅ Daily Rollup (one row per user / date / shift)
+# ------------------------------
+class ReportDailyRollup(models.Model):
+    """
+    Write-time merge of every Report filed for the same (user, date, shift).
+    Kept current by the Report / DynamicFieldResponse signals so the admin
+    pages never have to re-combine raw reports on read.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    custom_date = models.DateField(help_text="Effective report date (custom_date, or submission date if unset)")
+    shift = models.CharField(max_length=20, choices=Report.SHIFT_CHOICES)
+    report_type = models.CharField(max_length=20, choices=Report.REPORT_TYPES, default='regular')
+
+    # Summed static task counts, keyed like Report.tasks
+    tasks = models.JSONField(default=dict, blank=True)
+    # Latest dynamic field values, keyed by DynamicField id
+    dynamic_values = models.JSONField(default=dict, blank=True)
+    notes = models.JSONField(default=list, blank=True)
+
+    report_count = models.PositiveIntegerField(default=0)
+    is_late_submission = models.BooleanField(default=False)
+    created_at = models.DateTimeField(help_text="Submission time of the first merged report")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    change_seq = models.BigIntegerField(default=0, db_index=True, help_text="Change sequence number of the last write (see changes.py)")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'custom_date', 'shift'], name='unique_daily_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['custom_date', 'user', 'shift'], name='rollup_date_user_shift_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.custom_date} ({self.get_shift_display()})"
+
+    def combined_tasks(self, labels):
+        """
+        Static task counts followed by dynamic values keyed by field label,
+        matching the order the old read-time merge produced.
+        """
+        tasks = dict(self.tasks or {})
+        for field_id, value in (self.dynamic_values or {}).items():
+            label = labels.get(int(field_id))
+            if label is not None:
+                tasks[label] = value
+        return tasks
+
+
+class RollupTombstone(models.Model):
+    """
+    A ReportDailyRollup key that was deleted, for the delta export. The
+    username and team are copied and the user is not a constraint, so the
+    delete is still reported after the user is gone.
+    """
+    change_seq = models.BigIntegerField(db_index=True)
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    username = models.CharField(max_length=150)
+    team = models.CharField(max_length=50)
+    custom_date = models.DateField()
+    shift = models.CharField(max_length=20, choices=Report.SHIFT_CHOICES)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.username} - {self.custom_date} ({self.get_shift_display()}) deleted"
+
+
+# ------------------------------
+# ✅ Archived Month (reports moved out to a dump file)
+# ------------------------------
+class ArchivedMonth(models.Model):
+    """
+    A month of reports, with their answers, task counts and daily rollups,
+    moved out of the database into a compressed dump (see partitions.py).
+    """
+    month = models.DateField(unique=True, help_text="First day of the month")
+    path = models.CharField(max_length=500)
+    report_count = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField()
+    rehydrated_at = models.DateTimeField(blank=True, null=True, help_text="Set while the month is loaded back")
+
+    class Meta:
+        ordering = ['month']
+
+    def __str__(self):
+        state = "rehydrated" if self.rehydrated_at else "archived"
+        return f"{self.month:%Y-%m} ({state})"
+
+    @property
+    def is_archived(self):
+        return self.rehydrated_at is None
+
+
+# ------------------------------
+# ✅ Submission Month (calendar bitmap per user / month)
+# ------------------------------
+class SubmissionMonth(models.Model):
+    """
+    Day n of the month is bit n-1 of each mask, so a whole month of the
+    submission calendar is two integers.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='submission_months')
+    month = models.DateField(help_text="First day of the month")
+    submitted_days = models.IntegerField(default=0, help_text="Bitmask of days with a report")
+    leave_days = models.IntegerField(default=0, help_text="Bitmask of days reported as leave")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='unique_submission_month'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.month:%b %Y}"
+
+
+# ------------------------------
+# ✅ Report Aggregates (materialized views, see aggregates.py)
+# ------------------------------
+class TeamAggregate(models.Model):
+    """
+    Report and task totals per team, as of the last aggregate refresh.
+    """
+    team = models.CharField(max_length=50, primary_key=True, choices=User.TEAM_CHOICES)
+    report_count = models.IntegerField()
+    task_total = models.BigIntegerField()
+
+    class Meta:
+        managed = False
+        db_table = 'reports_teamaggregate'
+
+
+class UserAggregate(models.Model):
+    """
+    Report and task totals per user, as of the last aggregate refresh.
+    """
+    user = models.OneToOneField(
+        User, primary_key=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name='aggregate',
+    )
+    team = models.CharField(max_length=50, choices=User.TEAM_CHOICES)
+    report_count = models.IntegerField()
+    task_total = models.BigIntegerField()
+
+    class Meta:
+        managed = False
+        db_table = 'reports_useraggregate'
+
+
+class DailyAggregate(models.Model):
+    """
+    Report and task totals per user and effective date, as of the last
+    aggregate refresh. ``key`` is "<user_id>:<date>" so the view has a
+    single-column primary key.
+    """
+    key = models.CharField(max_length=32, primary_key=True)
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='daily_aggregates',
+    )
+    team = models.CharField(max_length=50, choices=User.TEAM_CHOICES)
+    day = models.DateField()
+    report_count = models.IntegerField()
+    task_total = models.BigIntegerField()
+
+    class Meta:
+        managed = False
+        db_table = 'reports_dailyaggregate'
+
+
+# ------------------------------
+# ✅ Background Export Job
+# ------------------------------
+class ExportJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs')
+    filters = models.JSONField(default=dict, blank=True)
+    data_version = models.CharField(max_length=64)
+    fingerprint = models.CharField(max_length=64, db_index=True, help_text="Hash of filters + data version")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+
+    rows_total = models.PositiveIntegerField(default=0)
+    rows_written = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/', blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True, help_text="Last progress of a running job")
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Export #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def progress(self):
+        if self.status == 'done':
+            return 100
+        if not self.rows_total:
+            return 0
+        return min(100, int(self.rows_written * 100 / self.rows_total))
+
+
+# ------------------------------
+# ✅ Background Import Job
+# ------------------------------
+class ImportJob(models.Model):
+    STATUS_CHOICES = ExportJob.STATUS_CHOICES
+
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_jobs')
+    file = models.FileField(upload_to='imports/')
+    filename = models.CharField(max_length=255)
+    dry_run = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+
+    rows = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    # The first rejected rows as [line, message] pairs, and how many there were
+    rejected = models.JSONField(default=list, blank=True)
+    rejected_count = models.PositiveIntegerField(default=0)
+    # Users with committed rows, so a job that dies can still have their derived data rebuilt
+    user_ids = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import #{self.pk} of {self.filename} ({self.get_status_display()})"
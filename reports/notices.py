@@ -0,0 +1,120 @@
+"""
+Admin notice feed.
+
+Notices change about once a day but are shown on every dashboard and
+submit page. The newest FEED_SIZE are serialized once into the shared cache
+under the "notices" version token and mirrored in a process-local copy;
+AdminNotice save/delete signals bump the token so every worker reloads on
+its next read. A steady-state read costs one cache lookup and no queries.
+
+Older notices are only fetched on demand, a keyset page at a time.
+"""
+import datetime
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import AdminNotice
+from .versions import get_version
+
+FEED_SIZE = 20
+PAGE_SIZE = 20
+
+FEED_CACHE_KEY = "reports:notices:{version}"
+
+
+@dataclass(frozen=True)
+class Notice:
+    id: int
+    title: str
+    content: str
+    created_at: datetime.datetime
+    created_by: str | None
+
+    @classmethod
+    def from_model(cls, notice):
+        return cls(
+            id=notice.pk,
+            title=notice.title,
+            content=notice.content,
+            created_at=notice.created_at,
+            created_by=notice.created_by.username if notice.created_by else None,
+        )
+
+    @property
+    def cursor(self):
+        return f"{self.created_at.isoformat()}|{self.id}"
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "title": self.title,
+            "content": self.content,
+            "created_at": self.created_at.isoformat(),
+            "created_by": self.created_by,
+        }
+
+
+@dataclass(frozen=True)
+class Feed:
+    version: str
+    notices: tuple
+
+
+_local = {"feed": None}
+
+
+def _newest_first():
+    return AdminNotice.objects.select_related("created_by").order_by("-created_at", "-pk")
+
+
+def get_feed():
+    version = get_version("notices")
+
+    feed = _local["feed"]
+    if feed is not None and feed.version == version:
+        return feed
+
+    key = FEED_CACHE_KEY.format(version=version)
+    feed = cache.get(key)
+    if feed is None:
+        feed = Feed(version=version, notices=tuple(map(Notice.from_model, _newest_first()[:FEED_SIZE])))
+        cache.set(key, feed, None)
+
+    _local["feed"] = feed
+    return feed
+
+
+def latest_notices(limit=FEED_SIZE):
+    """
+    Return ``(notices, next_cursor)`` for the newest ``limit`` notices. The
+    first FEED_SIZE come from the cached feed, any beyond it from a keyset
+    query after its last notice. ``next_cursor`` is None when there are no
+    older notices.
+    """
+    feed = get_feed().notices
+    if limit > FEED_SIZE and len(feed) == FEED_SIZE:
+        older, cursor = older_notices(feed[-1].cursor, limit - FEED_SIZE)
+        return feed + tuple(older), cursor
+
+    notices = feed[:limit]
+    more = len(feed) > len(notices) or len(feed) == FEED_SIZE
+    return notices, notices[-1].cursor if notices and more else None
+
+
+def older_notices(cursor, limit=PAGE_SIZE):
+    """
+    Return ``(notices, next_cursor)`` for the page after ``cursor`` (a
+    Notice.cursor). ``next_cursor`` is None on the last page. Raises
+    ValueError when the cursor is malformed.
+    """
+    created_at, pk = cursor.split("|")
+    created_at, pk = datetime.datetime.fromisoformat(created_at), int(pk)
+
+    rows = _newest_first().filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    notices = [Notice.from_model(n) for n in rows[:limit + 1]]
+    if len(notices) > limit:
+        notices = notices[:limit]
+        return notices, notices[-1].cursor
+    return notices, None
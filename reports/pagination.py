@@ -0,0 +1,53 @@
+"""
+Keyset (seek) pagination for the admin overview.
+
+Rows are ordered newest first by (custom_date, user_id, shift), which is
+unique per rollup. A page boundary is encoded as that tuple, so fetching
+page N costs the same as fetching page 1 regardless of how deep it is.
+"""
+import datetime
+
+from django.db.models import Q
+
+from .models import Report
+
+OVERVIEW_ORDERING = ("-custom_date", "-user_id", "-shift")
+
+SHIFT_KEYS = {key for key, _ in Report.SHIFT_CHOICES}
+
+
+def encode_cursor(rollup):
+    return f"{rollup.custom_date.isoformat()}|{rollup.user_id}|{rollup.shift}"
+
+
+def decode_cursor(cursor):
+    """
+    Parse a cursor produced by ``encode_cursor``. Raises ValueError when it
+    is malformed.
+    """
+    day, user_id, shift = cursor.split("|")
+    if shift not in SHIFT_KEYS:
+        raise ValueError(f"Unknown shift '{shift}'")
+    return datetime.date.fromisoformat(day), int(user_id), shift
+
+
+def keyset_page(rollups, cursor=None, page_size=50):
+    """
+    Return ``(rows, next_cursor)`` for the page after ``cursor``.
+    ``next_cursor`` is None on the last page.
+    """
+    rollups = rollups.order_by(*OVERVIEW_ORDERING)
+
+    if cursor:
+        day, user_id, shift = decode_cursor(cursor)
+        rollups = rollups.filter(
+            Q(custom_date__lt=day)
+            | Q(custom_date=day, user_id__lt=user_id)
+            | Q(custom_date=day, user_id=user_id, shift__lt=shift)
+        )
+
+    rows = list(rollups[:page_size + 1])
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
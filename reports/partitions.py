@@ -0,0 +1,590 @@
+"""
+Monthly range partitions and archiving for the Report table.
+
+On Postgres, the partition_reports command converts reports_report into a
+table partitioned by RANGE (custom_date): one partition per month and a
+default partition for dates nobody created a partition for. Rows are
+copied in chunks while a trigger mirrors concurrent writes, and the tables
+are swapped in one short transaction (convert_to_partitioned). Queries
+that filter on custom_date then only read the months they cover.
+
+Old months can be archived. A month's reports, dynamic answers, task
+counts and daily rollups are written to a gzip JSON Lines dump (Django's
+jsonl serialization) and removed from the database; on a partitioned table
+the month's partition is detached and dropped instead of deleted row by
+row. rehydrate_month() loads an archived month back, either by hand or
+when a view is asked to include archived data. Archiving works on SQLite
+too, with plain deletes.
+
+Archiving is not deleting: no rollup tombstones are written, so delta
+export clients keep the archived rows.
+"""
+import datetime
+import gzip
+import os
+import re
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .bulk import RowInserter
+from .models import (
+    ArchivedMonth, DynamicField, DynamicFieldResponse, Report, ReportDailyRollup, TaskCount, TaskType, User,
+)
+from .rollups import refresh_rollup
+from .versions import bump_version
+
+REPORT_TABLE = Report._meta.db_table
+DEFAULT_PARTITION = f"{REPORT_TABLE}_default"
+# Names used while converting; see convert_to_partitioned
+PARTITIONED_TABLE = f"{REPORT_TABLE}_partitioned"
+UNPARTITIONED_TABLE = f"{REPORT_TABLE}_unpartitioned"
+MIRROR_TRIGGER = f"{REPORT_TABLE}_mirror"
+ID_SEQUENCE = f"{REPORT_TABLE}_partitioned_id_seq"
+NEW_SUFFIX = "_p"
+OLD_SUFFIX = "_old"
+
+LOCK_TIMEOUT = "5s"
+LOAD_BATCH_SIZE = 2000
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{REPORT_TABLE}_p{month:%Y_%m}"
+
+
+def _report_columns():
+    # Generated columns are computed by every partition and cannot be copied
+    return [connection.ops.quote_name(f.column) for f in Report._meta.concrete_fields if not f.generated]
+
+
+def is_partitioned():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))", [REPORT_TABLE])
+        return cursor.fetchone()[0]
+
+
+def partition_months():
+    """
+    Months that have a partition of the Report table, oldest first.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            """,
+            [REPORT_TABLE],
+        )
+        names = [name for name, in cursor.fetchall()]
+    prefix = f"{REPORT_TABLE}_p"
+    return sorted(
+        datetime.datetime.strptime(name[len(prefix):], "%Y_%m").date()
+        for name in names if name.startswith(prefix)
+    )
+
+
+def create_partition(month):
+    """
+    Add the partition for ``month``. Its rows are moved out of the default
+    partition first, so a month can be created after reports for it arrived.
+    """
+    name = partition_name(month)
+    columns = ", ".join(_report_columns())
+    bounds = [month, add_months(month, 1)]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        cursor.execute(
+            f"CREATE TABLE {name} (LIKE {REPORT_TABLE} INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION} WHERE custom_date >= %s AND custom_date < %s RETURNING {columns}
+            )
+            INSERT INTO {name} ({columns}) SELECT {columns} FROM moved
+            """,
+            bounds,
+        )
+        # ATTACH only needs SHARE UPDATE EXCLUSIVE on the parent, so reads
+        # and writes to other months carry on
+        cursor.execute(f"ALTER TABLE {REPORT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", bounds)
+
+
+def ensure_partitions(months_ahead=3, today=None):
+    """
+    Create the missing partitions from the current month to ``months_ahead``
+    months ahead. Returns the months created; nothing is done when the
+    table is not partitioned.
+    """
+    if not is_partitioned():
+        return []
+
+    existing = set(partition_months())
+    current = month_start(today or timezone.localdate())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            create_partition(month)
+            created.append(month)
+    return created
+
+
+# ------------------------------
+# ✅ Archiving
+# ------------------------------
+class ArchiveEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder rounds times to milliseconds; a dump must give back
+    exactly what it took.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def archive_path(month):
+    return os.path.join(settings.REPORTS_ARCHIVE_DIR, f"reports-{month:%Y-%m}.jsonl.gz")
+
+
+def _month_rows(month):
+    """
+    Everything archived with ``month``, in load order.
+    """
+    reports = Report.objects.filter(custom_date__gte=month, custom_date__lt=add_months(month, 1))
+    return [
+        reports,
+        DynamicFieldResponse.objects.filter(report__in=reports.values("pk")),
+        TaskCount.objects.filter(report__in=reports.values("pk")),
+        ReportDailyRollup.objects.filter(custom_date__gte=month, custom_date__lt=add_months(month, 1)),
+    ]
+
+
+def _delete_month(cursor, month, detach):
+    bounds = [month, add_months(month, 1)]
+    in_month = f"report_id IN (SELECT id FROM {REPORT_TABLE} WHERE custom_date >= %s AND custom_date < %s)"
+    for model in (DynamicFieldResponse, TaskCount):
+        cursor.execute(f"DELETE FROM {model._meta.db_table} WHERE {in_month}", bounds)
+    cursor.execute(
+        f"DELETE FROM {ReportDailyRollup._meta.db_table} WHERE custom_date >= %s AND custom_date < %s", bounds,
+    )
+    if detach:
+        # Last, so the exclusive lock on the parent is held only until commit
+        cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        cursor.execute(f"ALTER TABLE {REPORT_TABLE} DETACH PARTITION {partition_name(month)}")
+        cursor.execute(f"DROP TABLE {partition_name(month)}")
+    else:
+        cursor.execute(f"DELETE FROM {REPORT_TABLE} WHERE custom_date >= %s AND custom_date < %s", bounds)
+
+
+def archive_month(month):
+    """
+    Move ``month``'s reports, with their answers, task counts and daily
+    rollups, into its dump file. If the month was archived before, the
+    dump is loaded back first, so reports filed since are added to it.
+    Returns the ArchivedMonth.
+    """
+    month = month_start(month)
+    if ArchivedMonth.objects.filter(month=month, rehydrated_at__isnull=True).exists():
+        rehydrate_month(month)
+
+    path = archive_path(month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    detach = is_partitioned() and month in partition_months()
+    querysets = _month_rows(month)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if detach:
+            # Writes to this month wait until its rows are gone
+            cursor.execute(f"LOCK TABLE {partition_name(month)} IN SHARE MODE")
+        report_count = querysets[0].count()
+
+        # The dump is complete on disk before anything is deleted
+        partial = f"{path}.partial"
+        with open(partial, "wb") as raw:
+            with gzip.open(raw, "wt", encoding="utf-8") as stream:
+                for queryset in querysets:
+                    rows = queryset.order_by("pk").iterator(chunk_size=LOAD_BATCH_SIZE)
+                    serializers.serialize("jsonl", rows, stream=stream, cls=ArchiveEncoder)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(partial, path)
+
+        _delete_month(cursor, month, detach)
+        archived, _ = ArchivedMonth.objects.update_or_create(
+            month=month,
+            defaults={"path": path, "report_count": report_count, "archived_at": timezone.now(), "rehydrated_at": None},
+        )
+        # The rows went without refresh_rollup(): invalidate every user's
+        # summaries and previews, as a full rebuild does
+        bump_version("rollups", "rollups:rebuild")
+    return archived
+
+
+def archive_before(cutoff):
+    """
+    Archive every month before the month of ``cutoff`` that still has
+    reports. Returns the ArchivedMonth rows written.
+    """
+    months = Report.objects.filter(custom_date__lt=month_start(cutoff)).dates("custom_date", "month")
+    return [archive_month(month) for month in months]
+
+
+def _load_dump(path, month):
+    """
+    Insert the rows of a month's dump. Rows of users, fields and task types
+    deleted since are skipped. Keys that got new reports while the month
+    was archived have their rollups recomputed instead of restored, and the
+    restored merged report stops being the merged one for its key.
+    """
+    users = set(User.objects.values_list("pk", flat=True))
+    fields = set(DynamicField.objects.values_list("pk", flat=True))
+    task_types = set(TaskType.objects.values_list("pk", flat=True))
+    live = _month_rows(month)
+    merged_keys = set(live[0].filter(merged=True).values_list("user_id", "custom_date", "shift"))
+    rollup_keys = set(live[3].values_list("user_id", "custom_date", "shift"))
+
+    reports, stale_keys = set(), set()
+    batches = defaultdict(list)
+    inserters = {}
+
+    def flush(model):
+        # Not bulk_create: auto_now fields must keep their archived values
+        inserter = inserters.setdefault(model, RowInserter(model, with_pk=True))
+        rows = batches.pop(model, [])
+        inserter.insert([{f.attname: getattr(obj, f.attname) for f in inserter.fields} for obj in rows])
+
+    with gzip.open(path, "rt", encoding="utf-8") as stream:
+        for item in serializers.deserialize("jsonl", stream, ignorenonexistent=True):
+            obj = item.object
+            if isinstance(obj, Report):
+                if obj.user_id not in users:
+                    continue
+                obj.merged = obj.merged and (obj.user_id, obj.custom_date, obj.shift) not in merged_keys
+                reports.add(obj.pk)
+            elif isinstance(obj, DynamicFieldResponse):
+                if obj.report_id not in reports or obj.field_id not in fields:
+                    continue
+            elif isinstance(obj, TaskCount):
+                if obj.report_id not in reports or obj.task_type_id not in task_types:
+                    continue
+            elif isinstance(obj, ReportDailyRollup):
+                key = (obj.user_id, obj.custom_date, obj.shift)
+                if obj.user_id not in users:
+                    continue
+                if key in rollup_keys:
+                    stale_keys.add(key)
+                    continue
+
+            model = type(obj)
+            batches[model].append(obj)
+            if len(batches[model]) >= LOAD_BATCH_SIZE:
+                flush(model)
+
+    for model in list(batches):
+        flush(model)
+    for key in stale_keys:
+        refresh_rollup(*key)
+    return len(reports)
+
+
+def rehydrate_month(month):
+    """
+    Load an archived month back from its dump, recreating its partition on
+    a partitioned table. The dump file is kept; archiving the month again
+    rewrites it. Returns the number of reports loaded (0 when the month is
+    not archived).
+    """
+    month = month_start(month)
+    if not ArchivedMonth.objects.filter(month=month, rehydrated_at__isnull=True).exists():
+        return 0
+    if is_partitioned() and month not in partition_months():
+        create_partition(month)
+
+    with transaction.atomic():
+        # Two requests asking for the same month load it once
+        archived = ArchivedMonth.objects.select_for_update().get(month=month)
+        if archived.rehydrated_at is not None:
+            return 0
+        loaded = _load_dump(archived.path, month)
+        archived.rehydrated_at = timezone.now()
+        archived.save(update_fields=["rehydrated_at"])
+        bump_version("rollups", "rollups:rebuild")
+    return loaded
+
+
+def archived_months(start=None, end=None):
+    """
+    Months currently archived, optionally only those overlapping the dates
+    ``start`` to ``end``.
+    """
+    months = ArchivedMonth.objects.filter(rehydrated_at__isnull=True)
+    if start is not None:
+        months = months.filter(month__gte=month_start(start))
+    if end is not None:
+        months = months.filter(month__lte=end)
+    return months
+
+
+def rehydrate_range(start, end):
+    """
+    Load back every archived month overlapping ``start`` to ``end``.
+    Returns the number of reports loaded.
+    """
+    if start is None or end is None:
+        raise ValueError("Archived months are only loaded back for a bounded date range.")
+    return sum(rehydrate_month(archived.month) for archived in archived_months(start, end))
+
+
+# ------------------------------
+# ✅ Converting to a partitioned table (Postgres)
+# ------------------------------
+INDEX_DEFINITION = re.compile(r"^(CREATE (?:UNIQUE )?INDEX )(\S+)( ON (?:ONLY )?)(\S+)( USING .*)$", re.S)
+
+
+def _index_definitions(cursor, relation):
+    """
+    ``[(name, definition)]`` for the indexes of ``relation``, primary key
+    included.
+    """
+    cursor.execute(
+        """
+        SELECT c.relname, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = to_regclass(%s)
+        ORDER BY c.relname
+        """,
+        [relation],
+    )
+    return cursor.fetchall()
+
+
+def _copy_indexes(cursor, source, target, skip_primary_key=True):
+    """
+    Create the indexes of ``source`` on ``target`` under the same names
+    plus NEW_SUFFIX. Returns the original names.
+    """
+    names = []
+    for name, definition in _index_definitions(cursor, source):
+        if skip_primary_key and name == f"{source}_pkey":
+            continue
+        match = INDEX_DEFINITION.match(definition)
+        if match is None:
+            raise RuntimeError(f"Cannot copy index {name}: {definition}")
+        create, _, on, _, rest = match.groups()
+        cursor.execute(f"{create}{name}{NEW_SUFFIX}{on}{target}{rest}")
+        names.append(name)
+    return names
+
+
+def _dependent_materialized_views(cursor):
+    cursor.execute(
+        """
+        SELECT DISTINCT v.relname, pg_get_viewdef(v.oid)
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        JOIN pg_class v ON v.oid = r.ev_class
+        WHERE d.refobjid = to_regclass(%s) AND v.relkind = 'm'
+        """,
+        [REPORT_TABLE],
+    )
+    return cursor.fetchall()
+
+
+def _prepare_partitioned_table(cursor, months):
+    """
+    Create the partitioned copy of the Report table, its partitions,
+    indexes and foreign keys, and the trigger that mirrors writes into it.
+    """
+    columns = _report_columns()
+    cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    cursor.execute(f"CREATE SEQUENCE {ID_SEQUENCE}")
+    cursor.execute(
+        f"CREATE TABLE {PARTITIONED_TABLE} "
+        f"(LIKE {REPORT_TABLE} INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE (custom_date)"
+    )
+    cursor.execute(f"ALTER TABLE {PARTITIONED_TABLE} ALTER COLUMN id SET DEFAULT nextval('{ID_SEQUENCE}')")
+    cursor.execute(f"ALTER SEQUENCE {ID_SEQUENCE} OWNED BY {PARTITIONED_TABLE}.id")
+    # A primary key on a partitioned table must include the partition key
+    cursor.execute(
+        f"ALTER TABLE {PARTITIONED_TABLE} ADD CONSTRAINT {REPORT_TABLE}_pkey{NEW_SUFFIX} PRIMARY KEY (id, custom_date)"
+    )
+
+    for month in months:
+        cursor.execute(
+            f"CREATE TABLE {partition_name(month)} PARTITION OF {PARTITIONED_TABLE} FOR VALUES FROM (%s) TO (%s)",
+            [month, add_months(month, 1)],
+        )
+    cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARTITIONED_TABLE} DEFAULT")
+
+    _copy_indexes(cursor, REPORT_TABLE, PARTITIONED_TABLE)
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        [REPORT_TABLE],
+    )
+    for name, definition in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {PARTITIONED_TABLE} ADD CONSTRAINT {name} {definition}")
+
+    # Every write to the old table from here on is repeated on the new one
+    new_values = ", ".join(f"NEW.{column}" for column in columns)
+    cursor.execute(
+        f"""
+        CREATE FUNCTION {MIRROR_TRIGGER}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                DELETE FROM {PARTITIONED_TABLE} WHERE id = OLD.id AND custom_date = OLD.custom_date;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                INSERT INTO {PARTITIONED_TABLE} ({", ".join(columns)}) VALUES ({new_values});
+            END IF;
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    cursor.execute(
+        f"CREATE TRIGGER {MIRROR_TRIGGER} AFTER INSERT OR UPDATE OR DELETE ON {REPORT_TABLE} "
+        f"FOR EACH ROW EXECUTE FUNCTION {MIRROR_TRIGGER}()"
+    )
+
+
+def _copy_chunk(cursor, low, high):
+    columns = ", ".join(_report_columns())
+    # Locking the chunk's rows keeps the trigger from mirroring an update
+    # between the copy and its commit; other rows stay writable
+    cursor.execute(f"SELECT id FROM {REPORT_TABLE} WHERE id > %s AND id <= %s FOR UPDATE", [low, high])
+    cursor.execute(f"DELETE FROM {PARTITIONED_TABLE} WHERE id > %s AND id <= %s", [low, high])
+    cursor.execute(
+        f"INSERT INTO {PARTITIONED_TABLE} ({columns}) SELECT {columns} FROM {REPORT_TABLE} WHERE id > %s AND id <= %s",
+        [low, high],
+    )
+    return cursor.rowcount
+
+
+def _swap_tables(cursor, views, log):
+    """
+    Put the partitioned table (and the materialized views built on it) in
+    place of the old ones. Only renames happen under the exclusive lock.
+    """
+    cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    cursor.execute(f"LOCK TABLE {REPORT_TABLE}, {PARTITIONED_TABLE} IN ACCESS EXCLUSIVE MODE")
+    cursor.execute(f"DROP TRIGGER {MIRROR_TRIGGER} ON {REPORT_TABLE}")
+    cursor.execute(f"DROP FUNCTION {MIRROR_TRIGGER}()")
+
+    for name, _ in _index_definitions(cursor, REPORT_TABLE):
+        cursor.execute(f"ALTER INDEX {name} RENAME TO {name}{OLD_SUFFIX}")
+    cursor.execute(f"ALTER TABLE {REPORT_TABLE} RENAME TO {UNPARTITIONED_TABLE}")
+    cursor.execute(f"ALTER TABLE {PARTITIONED_TABLE} RENAME TO {REPORT_TABLE}")
+    for name, _ in _index_definitions(cursor, REPORT_TABLE):
+        if name.endswith(NEW_SUFFIX):
+            cursor.execute(f"ALTER INDEX {name} RENAME TO {name[:-len(NEW_SUFFIX)]}")
+
+    # Carry on numbering where the old table's sequence stopped
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [UNPARTITIONED_TABLE])
+    old_sequence = cursor.fetchone()[0]
+    cursor.execute(
+        f"SELECT setval('{ID_SEQUENCE}', GREATEST("
+        f"(SELECT last_value FROM {old_sequence}), (SELECT COALESCE(MAX(id), 1) FROM {REPORT_TABLE})))"
+    )
+
+    for name, _ in views:
+        cursor.execute(f"DROP MATERIALIZED VIEW {name}")
+        cursor.execute(f"ALTER MATERIALIZED VIEW {name}{NEW_SUFFIX} RENAME TO {name}")
+        for index, _ in _index_definitions(cursor, name):
+            if index.endswith(NEW_SUFFIX):
+                cursor.execute(f"ALTER INDEX {index} RENAME TO {index[:-len(NEW_SUFFIX)]}")
+    log(f"Swapped {REPORT_TABLE}; the old table is kept as {UNPARTITIONED_TABLE}.")
+
+
+def convert_to_partitioned(chunk_size=20000, months_ahead=3, start_id=0, pause=0.0, log=print):
+    """
+    Turn the Report table into a table partitioned by custom_date month,
+    without holding long locks:
+
+    1. create the partitioned table and a trigger on the old one that
+       repeats every insert, update and delete on it,
+    2. copy the existing rows in id chunks, each in its own short
+       transaction (rerunning with ``start_id`` resumes a copy),
+    3. rebuild the materialized views that read the table against it,
+    4. swap the tables in one transaction that only renames.
+
+    The old table is left as UNPARTITIONED_TABLE for the operator to check
+    and drop. Postgres only.
+    """
+    if connection.vendor != "postgresql":
+        raise RuntimeError("Partitioning needs Postgres.")
+    if is_partitioned():
+        raise RuntimeError(f"{REPORT_TABLE} is already partitioned.")
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conrelid::regclass::text FROM pg_constraint WHERE confrelid = to_regclass(%s) AND contype = 'f'",
+            [REPORT_TABLE],
+        )
+        referencing = [name for name, in cursor.fetchall()]
+        if referencing:
+            raise RuntimeError(f"Foreign keys still reference {REPORT_TABLE} from: {', '.join(referencing)}. Run migrate first.")
+
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [PARTITIONED_TABLE])
+        prepared = cursor.fetchone()[0]
+
+    if not prepared:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"SELECT MIN(custom_date) FROM {REPORT_TABLE}")
+            first = cursor.fetchone()[0] or timezone.localdate()
+            last = add_months(month_start(timezone.localdate()), months_ahead)
+            months = []
+            month = month_start(first)
+            while month <= last:
+                months.append(month)
+                month = add_months(month, 1)
+            _prepare_partitioned_table(cursor, months)
+        log(f"Created {PARTITIONED_TABLE} with {len(months)} monthly partitions.")
+    elif not start_id:
+        log(f"{PARTITIONED_TABLE} exists; copying again from the start (pass --start-id to resume).")
+
+    # Rows inserted after the trigger was created are mirrored, so the copy
+    # stops at the highest id that existed then
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {REPORT_TABLE}")
+        last_id = cursor.fetchone()[0]
+
+    copied = 0
+    for low in range(start_id, last_id, chunk_size):
+        with transaction.atomic(), connection.cursor() as cursor:
+            copied += _copy_chunk(cursor, low, low + chunk_size)
+        log(f"Copied {copied} rows (ids up to {min(low + chunk_size, last_id)} of {last_id}).")
+        if pause:
+            time.sleep(pause)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        views = _dependent_materialized_views(cursor)
+        for name, definition in views:
+            definition = re.sub(rf"\b{REPORT_TABLE}\b", PARTITIONED_TABLE, definition).rstrip().rstrip(";")
+            cursor.execute(f"DROP MATERIALIZED VIEW IF EXISTS {name}{NEW_SUFFIX}")
+            cursor.execute(f"CREATE MATERIALIZED VIEW {name}{NEW_SUFFIX} AS {definition} WITH DATA")
+            _copy_indexes(cursor, name, f"{name}{NEW_SUFFIX}", skip_primary_key=False)
+        if views:
+            log(f"Rebuilt {', '.join(name for name, _ in views)} on {PARTITIONED_TABLE}.")
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _swap_tables(cursor, views, log)
@@ -0,0 +1,135 @@
+"""
+PostgreSQL backend drawing its connections from a psycopg connection pool.
+
+Django 5.0 keeps one connection per thread at best (CONN_MAX_AGE), so
+threaded workers hold one each, and ASGI, where every request runs in a new
+thread, connects on every request. With ``OPTIONS["pool"]`` set, this
+backend borrows connections from a psycopg_pool.ConnectionPool shared by
+all threads of the process, and gives them back when Django closes them at
+the end of each request. Pool waits, timeouts and sizes are exported as
+Prometheus metrics.
+
+The options are those of Django 5.1's own pool (min_size, max_size,
+timeout, max_lifetime, max_idle...), so on 5.1 only ENGINE has to change
+back to django.db.backends.postgresql. Requires psycopg 3 with the pool
+extra, and CONN_MAX_AGE = 0.
+"""
+import os
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.creation import DatabaseCreation as BaseDatabaseCreation
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+from django.utils.asyncio import async_unsafe
+
+from reports.metrics import DB_POOL_CONNECTIONS, DB_POOL_TIMEOUTS, DB_POOL_WAIT
+
+
+class DatabaseCreation(BaseDatabaseCreation):
+    # Pooled connections would still point at the database being replaced
+
+    def create_test_db(self, *args, **kwargs):
+        self.connection.close_pool()
+        return super().create_test_db(*args, **kwargs)
+
+    def destroy_test_db(self, *args, **kwargs):
+        self.connection.close_pool()
+        return super().destroy_test_db(*args, **kwargs)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    # alias -> (pid, pool); a pool's worker threads do not survive a fork,
+    # so a process never uses a pool its parent opened
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, settings_dict, alias=None):
+        super().__init__(settings_dict, alias)
+        if self.pool_options is not None and settings_dict.get("CONN_MAX_AGE"):
+            raise ImproperlyConfigured(f"DATABASES['{self.alias}']: pooled connections need CONN_MAX_AGE = 0.")
+
+    @property
+    def pool_options(self):
+        options = self.settings_dict["OPTIONS"].get("pool")
+        if self.alias == NO_DB_ALIAS or not options:
+            return None
+        return options if isinstance(options, dict) else {}
+
+    @property
+    def pool(self):
+        options = self.pool_options
+        if options is None:
+            return None
+
+        with self._pools_lock:
+            pid, pool = self._pools.get(self.alias, (None, None))
+            if pid != os.getpid():
+                if not is_psycopg3:
+                    raise ImproperlyConfigured("Pooled connections need psycopg 3: pip install 'psycopg[binary,pool]'.")
+                from psycopg_pool import ConnectionPool
+
+                pool = ConnectionPool(
+                    # Handed out in autocommit; Django sets its own mode on each borrow
+                    kwargs={**self.get_connection_params(), "autocommit": True},
+                    check=ConnectionPool.check_connection if self.settings_dict["CONN_HEALTH_CHECKS"] else None,
+                    name=self.alias,
+                    open=False,
+                    **options,
+                )
+                self._pools[self.alias] = (os.getpid(), pool)
+        return pool
+
+    def close_pool(self):
+        with self._pools_lock:
+            pid, pool = self._pools.pop(self.alias, (None, None))
+        if pool is not None and pid == os.getpid():
+            pool.close()
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop("pool", None)
+        return params
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        from psycopg_pool import PoolTimeout
+
+        pool.open()
+        started = time.perf_counter()
+        try:
+            connection = pool.getconn()
+        except PoolTimeout:
+            DB_POOL_TIMEOUTS.labels(self.alias).inc()
+            raise
+        finally:
+            DB_POOL_WAIT.labels(self.alias).observe(time.perf_counter() - started)
+            stats = pool.get_stats()
+            DB_POOL_CONNECTIONS.labels(self.alias, "open").set(stats.get("pool_size", 0))
+            DB_POOL_CONNECTIONS.labels(self.alias, "idle").set(stats.get("pool_available", 0))
+            DB_POOL_CONNECTIONS.labels(self.alias, "waiting").set(stats.get("requests_waiting", 0))
+
+        # As in the parent: the isolation level is set before Django's autocommit
+        level = self.settings_dict["OPTIONS"].get("isolation_level")
+        self.isolation_level = IsolationLevel.READ_COMMITTED if level is None else IsolationLevel(level)
+        if level is not None:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        # psycopg_pool marks the connections it hands out with their pool
+        pool = getattr(self.connection, "_pool", None)
+        if pool is None:
+            return super()._close()
+        # Back to the pool it came from, which rolls back anything left open
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
+        self.connection = None
@@ -0,0 +1,205 @@
+"""
+Read-replica routing for the staff analytics views.
+
+Views decorated with ``@use_replica`` send their reads to the
+REPORTS_REPLICA_DATABASE alias, so the overview, user detail pages and
+exports stay off the primary while it takes the shift-end submissions.
+Writes always go to the primary. A request reads from the primary instead
+when:
+
+* no replica is configured,
+* the replica is unreachable or more than REPORTS_REPLICA_MAX_LAG seconds
+  behind,
+* the user wrote something the replica may not have replayed yet.
+  ReadYourWritesMiddleware stamps the session with the time of every
+  write request, and the replica is used again once it has caught up past
+  that stamp.
+
+Replica lag is measured at most once every REPORTS_REPLICA_LAG_CHECK_INTERVAL
+seconds per process.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from functools import wraps
+from types import SimpleNamespace
+
+from asgiref.local import Local
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from .metrics import REPLICA_ROUTING
+
+logger = logging.getLogger(__name__)
+
+LAST_WRITE_SESSION_KEY = "reports_last_write"
+
+# Caught up when everything received is replayed (an idle primary sends
+# nothing, so the last replay time alone would look like growing lag)
+POSTGRES_LAG = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+# Route of the request being handled: asgiref's Local follows async views
+# into the threads their ORM calls run in
+_state = Local()
+# alias -> (time of the check, lag in seconds or None)
+_lag_checks = {}
+
+
+class ReplicaRouter:
+    """
+    Reads made under use_replica go to the replica, every write to the
+    primary, including saves of rows that were read from the replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        route = getattr(_state, "route", None)
+        return route.alias if route else None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+
+def replica_lag(alias):
+    """
+    Seconds the ``alias`` replica is behind the primary, or None when it
+    cannot be told.
+    """
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        # Local stand-ins (two SQLite files in development and tests) are not replicated
+        return 0.0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(POSTGRES_LAG)
+            lag = cursor.fetchone()[0]
+    except DatabaseError:
+        logger.warning("Replica %s is unreachable, reading from the primary", alias, exc_info=True)
+        return None
+    return None if lag is None else max(float(lag), 0.0)
+
+
+def replica_horizon(alias):
+    """
+    Time up to which the ``alias`` replica is known to hold every committed
+    write, or None when it must not be used.
+    """
+    checked_at, lag = _lag_checks.get(alias, (0.0, None))
+    if time.time() - checked_at >= settings.REPORTS_REPLICA_LAG_CHECK_INTERVAL:
+        checked_at = time.time()
+        lag = replica_lag(alias)
+        _lag_checks[alias] = (checked_at, lag)
+    if lag is None or lag > settings.REPORTS_REPLICA_MAX_LAG:
+        return None
+    return checked_at - lag
+
+
+def replica_for(request):
+    """
+    The alias ``request`` may read from, or None for the primary.
+    """
+    alias = settings.REPORTS_REPLICA_DATABASE
+    if not alias or alias not in settings.DATABASES:
+        return None
+
+    horizon = replica_horizon(alias)
+    if horizon is None:
+        database, reason = DEFAULT_DB_ALIAS, "lag"
+    elif request.session.get(LAST_WRITE_SESSION_KEY, 0) >= horizon:
+        database, reason = DEFAULT_DB_ALIAS, "recent_write"
+    else:
+        database, reason = alias, "replica"
+    REPLICA_ROUTING.labels(database, reason).inc()
+    return None if database == DEFAULT_DB_ALIAS else alias
+
+
+def note_write(request):
+    """
+    Record in the session that the user has just written, so their next
+    analytics reads see it (ReadYourWritesMiddleware calls this).
+    """
+    request.session[LAST_WRITE_SESSION_KEY] = time.time()
+
+
+def read_from_primary():
+    """
+    Send the rest of the current request's reads, streamed responses
+    included, to the primary.
+    """
+    route = getattr(_state, "route", None)
+    if route:
+        route.alias = None
+
+
+@contextmanager
+def _routed(route):
+    previous = getattr(_state, "route", None)
+    _state.route = route
+    try:
+        yield
+    finally:
+        _state.route = previous
+
+
+def _stream(route, content):
+    # Each chunk is produced under the route, without leaving it set between chunks
+    content = iter(content)
+    while True:
+        with _routed(route):
+            chunk = next(content, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+async def _astream(route, content):
+    # Under ASGI: the route set here follows each chunk into the thread
+    # that produces it
+    content = aiter(content)
+    while True:
+        with _routed(route):
+            try:
+                chunk = await anext(content)
+            except StopAsyncIteration:
+                return
+        yield chunk
+
+
+def _route_response(route, response):
+    if route.alias and response.streaming:
+        stream = _astream if response.is_async else _stream
+        response.streaming_content = stream(route, response.streaming_content)
+    return response
+
+
+def use_replica(view_func):
+    """
+    Read from the replica in ``view_func`` when this request may (see
+    replica_for), including while a streamed response is being sent. Put it
+    below the login checks, which should read the user from the primary.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            route = SimpleNamespace(alias=await sync_to_async(replica_for)(request))
+            with _routed(route):
+                response = await view_func(request, *args, **kwargs)
+            return _route_response(route, response)
+        return wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        route = SimpleNamespace(alias=replica_for(request))
+        with _routed(route):
+            response = view_func(request, *args, **kwargs)
+        return _route_response(route, response)
+    return wrapper
@@ -0,0 +1,282 @@
+"""
+Write-time daily rollups.
+
+Every (user, date, shift) combination gets exactly one ReportDailyRollup row
+holding the merged view of all reports filed for it. The admin overview,
+its charts and the Excel export read these rows instead of re-combining the
+raw Report table on every request.
+"""
+from contextlib import contextmanager
+from itertools import groupby
+from threading import local
+
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef
+from django.utils import timezone
+
+from .bulk import RowInserter
+from .changes import change_sequence, record_deletes
+from .models import Report, ReportDailyRollup
+from .submission_calendar import rebuild_submission_months, refresh_submission_month
+from .versions import bump_version
+
+
+# Report count from which iter_combined() pays for importing pandas
+VECTORIZED_MIN_REPORTS = 20_000
+
+
+def effective_date(report):
+    return report.custom_date or report.date
+
+
+def merge_task_value(tasks, key, value):
+    """
+    Fold one static task value into ``tasks``: numeric values are summed,
+    blanks never overwrite, anything else does.
+    """
+    if value is None:
+        tasks.setdefault(key, None)
+        return
+    try:
+        tasks[key] = tasks.get(key, 0) + int(value)
+    except (TypeError, ValueError):
+        tasks[key] = value
+
+
+def combine_reports(reports):
+    """
+    Merge the reports of a single (user, date, shift) key into the field
+    values of a ReportDailyRollup. ``reports`` must be ordered by pk and have
+    ``dynamic_responses`` prefetched. aggregation.combine_history() gives the
+    same result for many keys at once.
+    """
+    first = reports[0]
+    tasks = {}
+    dynamic_values = {}
+    notes = []
+
+    for r in reports:
+        for k, v in (r.tasks or {}).items():
+            merge_task_value(tasks, k, v)
+
+        # Dynamic fields: the latest answer wins
+        for resp in r.dynamic_responses.all():
+            dynamic_values[str(resp.field_id)] = resp.value
+
+        if r.notes:
+            notes.append(r.notes)
+
+    return {
+        "report_type": first.report_type,
+        "tasks": tasks,
+        "dynamic_values": dynamic_values,
+        "notes": notes,
+        "report_count": len(reports),
+        "is_late_submission": first.is_late_submission,
+        "created_at": first.created_at,
+    }
+
+
+def reports_for_key(user_id, day, shift):
+    return (
+        Report.objects
+        .filter(user_id=user_id, custom_date=day, shift=shift)
+        .prefetch_related("dynamic_responses")
+        .order_by("pk")
+    )
+
+
+def refresh_rollup(user_id, day, shift):
+    """
+    Recompute the rollup for one key from its raw reports, deleting it when
+    no reports remain.
+    """
+    if day is None:
+        return
+
+    reports = list(reports_for_key(user_id, day, shift))
+
+    # No savepoint: nothing here recovers from a partial failure, and inside
+    # a submission's transaction the extra round trips add up
+    with transaction.atomic(savepoint=False):
+        allocate = change_sequence()
+        if reports:
+            ReportDailyRollup.objects.update_or_create(
+                user_id=user_id,
+                custom_date=day,
+                shift=shift,
+                defaults={**combine_reports(reports), "change_seq": allocate(1)[0]},
+            )
+        else:
+            gone = ReportDailyRollup.objects.filter(user_id=user_id, custom_date=day, shift=shift)
+            record_deletes(gone, allocate)
+            gone.delete()
+        refresh_submission_month(user_id, day)
+        bump_version("rollups", f"user:{user_id}")
+
+
+_deferred = local()
+
+
+@contextmanager
+def deferred_rollups():
+    """
+    Collect the rollup refreshes requested inside the block and run each
+    distinct key once when it exits, instead of once per saved row. Nested
+    blocks join the outermost one.
+    """
+    if getattr(_deferred, "keys", None) is not None:
+        yield
+        return
+
+    _deferred.keys = {}
+    try:
+        yield
+        keys = list(_deferred.keys)
+    finally:
+        _deferred.keys = None
+    for key in keys:
+        refresh_rollup(*key)
+
+
+def request_rollup_refresh(user_id, day, shift):
+    """
+    Refresh a rollup now, or when the enclosing deferred_rollups() exits.
+    """
+    keys = getattr(_deferred, "keys", None)
+    if keys is None:
+        refresh_rollup(user_id, day, shift)
+    else:
+        keys[(user_id, day, shift)] = None
+
+
+def combine_per_key(reports, chunk_size=2000):
+    """
+    Yield ``((user_id, date, shift), values)`` for every rollup key of the
+    ``reports`` queryset in key order, merging each key with
+    combine_reports().
+    """
+    rows = (
+        reports
+        .prefetch_related("dynamic_responses")
+        .order_by("user_id", "effective_date", "shift", "pk")
+        .iterator(chunk_size=chunk_size)
+    )
+    for key, group in groupby(rows, key=lambda r: (r.user_id, r.effective_date, r.shift)):
+        yield key, combine_reports(list(group))
+
+
+def iter_combined(user_id=None, chunk_size=2000):
+    """
+    Stream every rollup key and its merged values straight from the Report
+    table. From VECTORIZED_MIN_REPORTS reports on, users are combined a
+    batch at a time by aggregation.py; smaller sets, such as most single
+    users, are merged key by key without loading pandas.
+    """
+    reports = Report.objects.all()
+    if user_id is not None:
+        reports = reports.filter(user_id=user_id)
+    if reports.count() < VECTORIZED_MIN_REPORTS:
+        return combine_per_key(reports, chunk_size=chunk_size)
+
+    from .aggregation import combine_history
+
+    return combine_history(reports, chunk_size=chunk_size)
+
+
+def rebuild_rollups(user_id=None, chunk_size=2000):
+    """
+    Rebuild rollups from scratch (all users, or a single one), along with
+    their submission calendar bitmaps. Returns the number of rollup rows
+    written.
+    """
+    existing = ReportDailyRollup.objects.all()
+    if user_id is not None:
+        existing = existing.filter(user_id=user_id)
+
+    inserter = RowInserter(ReportDailyRollup)
+    now = timezone.now()
+    written = 0
+    batch = []
+    with transaction.atomic():
+        allocate = change_sequence()
+        # Only keys without reports are deleted for the delta export; the
+        # others are rewritten below with a new change_seq
+        record_deletes(
+            existing.exclude(Exists(Report.objects.filter(
+                user_id=OuterRef("user_id"), custom_date=OuterRef("custom_date"), shift=OuterRef("shift"),
+            ))),
+            allocate,
+        )
+        existing.delete()
+
+        def flush():
+            for row, seq in zip(batch, allocate(len(batch))):
+                row["change_seq"] = seq
+            return inserter.insert(batch)
+
+        for (uid, day, shift), values in iter_combined(user_id=user_id, chunk_size=chunk_size):
+            batch.append({"user_id": uid, "custom_date": day, "shift": shift, "updated_at": now, **values})
+            if len(batch) >= chunk_size:
+                written += flush()
+                batch = []
+        if batch:
+            written += flush()
+        rebuild_submission_months(user_id=user_id)
+        bump_version("rollups", "rollups:rebuild" if user_id is None else f"user:{user_id}")
+
+    return written
+
+
+ROLLUP_COMPARED_FIELDS = (
+    "report_type", "tasks", "dynamic_values", "notes",
+    "report_count", "is_late_submission", "created_at",
+)
+
+
+def find_rollup_drift(user_id=None, chunk_size=2000):
+    """
+    Compare stored rollups against the raw reports, one user at a time.
+
+    Returns three lists of (user_id, date, shift) keys: rollups that are
+    missing, rollups whose values differ, and rollups with no reports left.
+    """
+    stored = ReportDailyRollup.objects.all()
+    if user_id is not None:
+        stored = stored.filter(user_id=user_id)
+
+    orphaned_users = set(stored.values_list("user_id", flat=True).distinct())
+    missing, mismatched, orphaned = [], [], []
+
+    combined = iter_combined(user_id=user_id, chunk_size=chunk_size)
+    for uid, keys in groupby(combined, key=lambda item: item[0][0]):
+        orphaned_users.discard(uid)
+        current = {
+            (row["user_id"], row["custom_date"], row["shift"]): row
+            for row in stored.filter(user_id=uid).values(
+                "user_id", "custom_date", "shift", *ROLLUP_COMPARED_FIELDS
+            )
+        }
+        for key, values in keys:
+            row = current.pop(key, None)
+            if row is None:
+                missing.append(key)
+            elif any(row[f] != values[f] for f in ROLLUP_COMPARED_FIELDS):
+                mismatched.append(key)
+        orphaned.extend(current)
+
+    if orphaned_users:
+        orphaned.extend(
+            stored.filter(user_id__in=orphaned_users).values_list("user_id", "custom_date", "shift")
+        )
+
+    return missing, mismatched, orphaned
+
+
+def data_version():
+    """
+    Cheap watermark that changes whenever a rollup is written or removed.
+    """
+    stats = ReportDailyRollup.objects.aggregate(count=Count("id"), last=Max("updated_at"))
+    last = stats["last"].timestamp() if stats["last"] else 0
+    return f"{stats['count']}-{last:.6f}"
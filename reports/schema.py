@@ -0,0 +1,157 @@
+"""
+Report field schema: the static task fields each team reports on, and a
+registry of admin-defined DynamicField definitions.
+
+Field definitions change rarely but are read on every form render and for
+every dynamic response shown in a view. They are loaded once into the
+shared cache under a version token and mirrored in a process-local copy;
+DynamicField save/delete signals bump the token when their transaction
+commits, so every worker reloads on its next lookup. A steady-state lookup costs one cache read and no queries.
+"""
+from dataclasses import dataclass
+
+from django.core.cache import cache
+
+from .models import DynamicField
+from .versions import bump_version, get_version
+
+# Static task labels per team; values are stored in Report.tasks under task_key(label)
+TEAM_FIELDS = {
+    "video_producer": [
+        "Presenter Video", "Live Video", "Logo Video", "Special Work Video",
+        "Reel Video", "VO Video", "Interview Video", "Anchor/Presenter Video"
+    ],
+    "video_editor": [
+        "Logo Video", "Reel Video", "Two/Three Frame Video", "VO Video",
+        "Presenter Video", "Khabarbaat Video", "Special Interview",
+        "Video Shoot", "इतर"
+    ],
+    "graphic_designer": [
+        "Thumbnail (IG/YT)", "Reel/Live Thumbnail", "WhatsApp Creative",
+        "News of the Day", "News/Vdo Comment Link", "Infographics", "Slider",
+        "Statement", "Special Day", "Swipe Up", "Pointer Creative",
+        "Special Video Graphics", "Comment Creative"
+    ],
+    "content_writer": [
+        "News", "Bulletin", "Gallery", "Web Story", "Creative",
+        "Slider", "X Post", "App Post"
+    ],
+    "social_media": [
+        "Video Post", "Creative Post", "Live Video", "Slider Post",
+        "Swipe Up", "News In Comment", "Paid Promotion Post"
+    ],
+    "reporter": [
+        "Attended Press Conference", "Breaking News",
+        "Special Story", "Interview"
+    ],
+    "cameraman": [
+        "Attended Press Conference", "Special Story",
+        "Interview", "Event", "B Rolls", "Live"
+    ],
+    "marketing": [
+        "Client Visit Details", "Next Day Plan", "Client Follow-up Details"
+    ],
+}
+
+
+def task_key(label):
+    """Key a static task label is stored under in Report.tasks."""
+    return label.lower().replace(" ", "_").replace("/", "_").replace("-", "_")
+
+
+STATIC_TASK_LABELS = {
+    (team, task_key(label)): label
+    for team, labels in TEAM_FIELDS.items()
+    for label in labels
+}
+
+
+def task_label(team, key):
+    """Human label for a stored task key, falling back to a title-cased key."""
+    return STATIC_TASK_LABELS.get((team, key), key.replace("_", " ").title())
+
+
+SCHEMA_CACHE_KEY = "reports:dynamic-fields:{version}"
+
+
+@dataclass(frozen=True)
+class FieldDefinition:
+    id: int
+    team: str
+    name: str
+    label: str
+    field_type: str
+    required: bool
+
+
+@dataclass(frozen=True)
+class Schema:
+    version: str
+    by_team: dict
+    labels: dict
+
+
+_local = {"schema": None}
+
+
+def schema_version():
+    return get_version("schema")
+
+
+def bump_schema_version():
+    # Only once the field change is visible: a lookup racing an earlier
+    # bump would cache the old definitions under the new token for good
+    bump_version("schema")
+
+
+def _build_schema(version):
+    by_team = {}
+    labels = {}
+    for field in DynamicField.objects.order_by("pk"):
+        definition = FieldDefinition(
+            id=field.pk,
+            team=field.team,
+            name=field.name,
+            label=field.label,
+            field_type=field.field_type,
+            required=field.required,
+        )
+        by_team.setdefault(field.team, []).append(definition)
+        labels[field.pk] = field.label
+
+    return Schema(
+        version=version,
+        by_team={team: tuple(fields) for team, fields in by_team.items()},
+        labels=labels,
+    )
+
+
+def get_schema():
+    version = schema_version()
+
+    schema = _local["schema"]
+    if schema is not None and schema.version == version:
+        return schema
+
+    key = SCHEMA_CACHE_KEY.format(version=version)
+    schema = cache.get(key)
+    if schema is None:
+        schema = _build_schema(version)
+        cache.set(key, schema, None)
+
+    _local["schema"] = schema
+    return schema
+
+
+def team_fields(team):
+    """
+    Dynamic field definitions for a team, in creation order.
+    """
+    return get_schema().by_team.get(team, ())
+
+
+def field_labels():
+    """
+    Mapping of DynamicField id to its label, across every team.
+    """
+    return get_schema().labels
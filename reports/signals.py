@@ -1,7 +1,15 @@
 import logging
 from django.contrib.auth.signals import user_login_failed, user_logged_in, user_logged_out
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
 
+from .changes import record_deletes
+from .models import User, Report, AdminNotice, DynamicField, DynamicFieldResponse
+from .rollups import effective_date, request_rollup_refresh
+from .schema import bump_schema_version
+from .task_counts import write_task_counts
+from .versions import bump_version
+
 # Define a logger
 logger = logging.getLogger("reports.auth")
 
@@ -20,3 +28,84 @@ def log_user_logged_in(sender, user, request, **kwargs):
 def log_user_logged_out(sender, user, request, **kwargs):
     if user:
         logger.info(f"LOGOUT: user '{user.username}'")
+
+
+# ------------------------------
+# ✅ Keep daily rollups in sync with raw reports
+# ------------------------------
+def _rollup_key(report):
+    return (report.user_id, effective_date(report), report.shift)
+
+
+@receiver(pre_save, sender=Report)
+def remember_previous_rollup_key(sender, instance, raw=False, **kwargs):
+    # An edit can move a report to a different (user, date, shift) key, in
+    # which case the rollup it used to belong to must be rebuilt as well.
+    instance._previous_rollup_key = None
+    if raw or instance.pk is None:
+        return
+    previous = Report.objects.filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._previous_rollup_key = _rollup_key(previous)
+
+
+@receiver(post_save, sender=Report)
+def refresh_rollup_on_report_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    key = _rollup_key(instance)
+    request_rollup_refresh(*key)
+    previous = getattr(instance, "_previous_rollup_key", None)
+    if previous and previous != key:
+        request_rollup_refresh(*previous)
+
+
+@receiver(post_delete, sender=Report)
+def refresh_rollup_on_report_delete(sender, instance, **kwargs):
+    request_rollup_refresh(*_rollup_key(instance))
+
+
+@receiver(post_save, sender=DynamicFieldResponse)
+@receiver(post_delete, sender=DynamicFieldResponse)
+def refresh_rollup_on_response_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Look the report up by id: during a cascading delete it may already be gone
+    report = Report.objects.filter(pk=instance.report_id).first()
+    if report is not None:
+        request_rollup_refresh(*_rollup_key(report))
+
+
+@receiver(pre_delete, sender=User)
+def record_rollup_deletes_on_user_delete(sender, instance, **kwargs):
+    # The user's rollups go with it by cascade, which sends no signal of its
+    # own; leave tombstones for them while the rows can still be read
+    record_deletes(instance.daily_rollups.all())
+
+
+# ------------------------------
+# ✅ Keep normalized task counts in sync with Report.tasks
+# ------------------------------
+@receiver(post_save, sender=Report)
+def write_task_counts_on_report_save(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    write_task_counts(instance, replace=not created)
+
+
+# ------------------------------
+# ✅ Invalidate the dynamic field schema registry
+# ------------------------------
+@receiver(post_save, sender=DynamicField)
+@receiver(post_delete, sender=DynamicField)
+def bump_dynamic_field_schema(sender, **kwargs):
+    bump_schema_version()
+
+
+# ------------------------------
+# ✅ Version the notices feed
+# ------------------------------
+@receiver(post_save, sender=AdminNotice)
+@receiver(post_delete, sender=AdminNotice)
+def bump_notices_version(sender, **kwargs):
+    bump_version("notices")
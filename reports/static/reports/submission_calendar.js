@@ -0,0 +1,71 @@
+// Submission calendar fed one month at a time by the bitmap endpoint.
+// Bit n-1 of "submitted" / "leave" stands for day n of the month.
+// options.url is the endpoint for 1970/1; other months are substituted in.
+function renderSubmissionCalendar(el, options) {
+  const months = {};
+  const pad = n => String(n).padStart(2, '0');
+  const isoDate = d => d.getFullYear() + '-' + pad(d.getMonth() + 1) + '-' + pad(d.getDate());
+  const monthKey = d => d.getFullYear() + '-' + pad(d.getMonth() + 1);
+
+  function loadMonth(year, month) {
+    const key = year + '-' + pad(month);
+    if (!months[key]) {
+      let url = options.url.replace('/1970/1/', '/' + year + '/' + month + '/');
+      if (options.user) url += '?user=' + encodeURIComponent(options.user);
+      months[key] = fetch(url, { credentials: 'same-origin' }).then(r => r.json());
+    }
+    return months[key];
+  }
+
+  function events(info, success, failure) {
+    const wanted = [];
+    for (let m = new Date(info.start.getFullYear(), info.start.getMonth(), 1); m < info.end; m.setMonth(m.getMonth() + 1)) {
+      wanted.push(loadMonth(m.getFullYear(), m.getMonth() + 1));
+    }
+
+    Promise.all(wanted).then(results => {
+      const byMonth = {};
+      results.forEach(r => { byMonth[r.month] = r; });
+
+      const today = new Date();
+      today.setHours(0, 0, 0, 0);
+      const joined = options.joined ? new Date(options.joined + 'T00:00:00') : null;
+      const items = [];
+
+      for (let d = new Date(info.start); d < info.end; d.setDate(d.getDate() + 1)) {
+        const data = byMonth[monthKey(d)];
+        const bit = 1 << (d.getDate() - 1);
+        const isWeeklyOff = d.getDay() === ((options.weeklyOff + 1) % 7);
+        let title = null;
+        let color = null;
+
+        if (data && data.leave & bit) {
+          title = 'LEAVE'; color = '#f59e0b';
+        } else if (data && data.submitted & bit) {
+          title = '✓'; color = '#10b981';
+        } else if (isWeeklyOff) {
+          title = 'OFF'; color = '#3b82f6';
+        } else if (d < today && (!joined || d >= joined)) {
+          title = '✕'; color = '#ef4444';
+        }
+
+        if (title) {
+          items.push({ title, start: isoDate(d), backgroundColor: color, textColor: 'white', display: 'block' });
+        }
+      }
+      success(items);
+    }).catch(failure);
+  }
+
+  const calendar = new FullCalendar.Calendar(el, {
+    initialView: 'dayGridMonth',
+    height: 'auto',
+    headerToolbar: { left: 'prev', center: 'title', right: 'next' },
+    events: events,
+    dateClick: options.onDateClick,
+    eventDisplay: 'block',
+    fixedWeekCount: false,
+  });
+  calendar.render();
+  return calendar;
+}
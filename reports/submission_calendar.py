@@ -0,0 +1,90 @@
+"""
+Compact submission calendar.
+
+Each (user, month) keeps a SubmissionMonth row with one bit per day for
+"a report was filed" and one for "it was a leave day". The rows are
+recomputed from the daily rollups whenever a rollup changes, and the
+calendar widgets fetch them one month at a time, so neither the page nor
+the endpoint grows with a user's tenure.
+"""
+import datetime
+from itertools import groupby
+
+from django.db import transaction
+
+from .models import ReportDailyRollup, SubmissionMonth
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def day_bit(day):
+    return 1 << (day.day - 1)
+
+
+def month_masks(rows):
+    """
+    Fold ``(custom_date, report_type)`` pairs into
+    ``{month: (submitted_days, leave_days)}``.
+    """
+    masks = {}
+    for day, report_type in rows:
+        month = month_start(day)
+        submitted, leave = masks.get(month, (0, 0))
+        bit = day_bit(day)
+        masks[month] = (submitted | bit, leave | bit if report_type == "leave" else leave)
+    return masks
+
+
+def refresh_submission_month(user_id, day):
+    """
+    Recompute the bitmap row for the month containing ``day``.
+    """
+    month = month_start(day)
+    rows = (
+        ReportDailyRollup.objects
+        .filter(user_id=user_id, custom_date__gte=month, custom_date__lt=next_month(month))
+        .values_list("custom_date", "report_type")
+    )
+    submitted, leave = month_masks(rows).get(month, (0, 0))
+
+    with transaction.atomic(savepoint=False):
+        if not submitted:
+            SubmissionMonth.objects.filter(user_id=user_id, month=month).delete()
+            return
+        SubmissionMonth.objects.update_or_create(
+            user_id=user_id,
+            month=month,
+            defaults={"submitted_days": submitted, "leave_days": leave},
+        )
+
+
+def rebuild_submission_months(user_id=None):
+    """
+    Rebuild every bitmap row (all users, or a single one) from the rollups.
+    Returns the number of rows written.
+    """
+    rollups = ReportDailyRollup.objects.order_by("user_id")
+    existing = SubmissionMonth.objects.all()
+    if user_id is not None:
+        rollups = rollups.filter(user_id=user_id)
+        existing = existing.filter(user_id=user_id)
+
+    rows = rollups.values_list("user_id", "custom_date", "report_type").iterator(chunk_size=5000)
+    written = 0
+    with transaction.atomic():
+        existing.delete()
+        # One user's history at a time keeps memory flat
+        for uid, group in groupby(rows, key=lambda row: row[0]):
+            masks = month_masks((day, report_type) for _, day, report_type in group)
+            SubmissionMonth.objects.bulk_create([
+                SubmissionMonth(user_id=uid, month=month, submitted_days=submitted, leave_days=leave)
+                for month, (submitted, leave) in masks.items()
+            ])
+            written += len(masks)
+    return written
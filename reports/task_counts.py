@@ -0,0 +1,137 @@
+"""
+Normalized task counts.
+
+Report.tasks keeps the submitted JSON, but every numeric value is also
+written to TaskCount(report, task_type, count) against a per-team TaskType
+dictionary. Per-task, per-team and per-period totals then become plain
+SUM ... GROUP BY queries (see TaskCountQuerySet) instead of JSON parsing
+in Python.
+"""
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+from .models import Report, TaskType, TaskCount
+from .schema import task_label
+
+
+def numeric_tasks(tasks):
+    """
+    The (key, count) pairs of a tasks dict that hold non-zero integers.
+    """
+    for key, value in (tasks or {}).items():
+        try:
+            count = int(value)
+        except (TypeError, ValueError):
+            continue
+        if count:
+            yield key, count
+
+
+def task_type_ids(team, keys, known=None):
+    """
+    Map task keys to TaskType ids for a team, creating missing types.
+    ``known`` is an optional {(team, key): id} dict reused across calls.
+    """
+    known = {} if known is None else known
+    missing = [key for key in keys if (team, key) not in known]
+    if missing:
+        TaskType.objects.bulk_create(
+            [TaskType(team=team, key=key, label=task_label(team, key)) for key in missing],
+            ignore_conflicts=True,
+        )
+        for pk, key in TaskType.objects.filter(team=team, key__in=missing).values_list("pk", "key"):
+            known[(team, key)] = pk
+    return {key: known[(team, key)] for key in keys}
+
+
+def write_task_counts(report, team=None, replace=True):
+    """
+    Replace the TaskCount rows of one report with the numbers in its tasks.
+    Pass ``replace=False`` for a report that was just created and so has no
+    rows to delete yet.
+    """
+    pairs = list(numeric_tasks(report.tasks))
+    team = team or report.user.team
+    ids = task_type_ids(team, [key for key, _ in pairs])
+
+    with transaction.atomic(savepoint=False):
+        if replace:
+            TaskCount.objects.filter(report=report).delete()
+        TaskCount.objects.bulk_create(
+            [TaskCount(report=report, task_type_id=ids[key], count=count) for key, count in pairs]
+        )
+
+
+def user_task_summaries(user):
+    """
+    Chart data for one user's history: totals per task label, per day, per
+    month and per year. Task and day totals are each a single GROUP BY
+    query, so only the aggregate rows leave the database; months and years
+    are summed from the days. Every day with a report is listed, with 0 when
+    none of its tasks were done.
+    """
+    counts = TaskCount.objects.filter(report__user=user)
+
+    # Grouped per team as well, so a user who changed teams can repeat a label
+    task_totals = {}
+    for r in counts.by_task():
+        label = r["task_type__label"]
+        task_totals[label] = task_totals.get(label, 0) + r["total"]
+
+    days = (
+        Report.objects.filter(user=user)
+        .values_list("effective_date")
+        .annotate(total=Coalesce(Sum("task_counts__count"), 0))
+        .order_by("effective_date")
+    )
+    daily_summary, monthly_summary, yearly_summary = {}, {}, {}
+    for day, total in days:
+        daily_summary[str(day)] = total
+        month = day.strftime("%b %Y")
+        monthly_summary[month] = monthly_summary.get(month, 0) + total
+        yearly_summary[day.year] = yearly_summary.get(day.year, 0) + total
+
+    return {
+        "task_totals": task_totals,
+        "daily_summary": daily_summary,
+        "monthly_summary": monthly_summary,
+        "yearly_summary": yearly_summary,
+    }
+
+
+def backfill_task_counts(chunk_size=2000, stdout=None):
+    """
+    Populate TaskCount from the JSON of every existing report, walking the
+    table in primary-key chunks. Reports that already have counts are
+    skipped, so the backfill can be resumed.
+    """
+    known = dict(((team, key), pk) for pk, team, key in TaskType.objects.values_list("pk", "team", "key"))
+    last_pk = 0
+    written = 0
+
+    while True:
+        chunk = list(
+            Report.objects
+            .filter(pk__gt=last_pk, task_counts__isnull=True)
+            .order_by("pk")
+            .values_list("pk", "user__team", "tasks")[:chunk_size]
+        )
+        if not chunk:
+            break
+
+        rows = []
+        for pk, team, tasks in chunk:
+            pairs = list(numeric_tasks(tasks))
+            ids = task_type_ids(team, [key for key, _ in pairs], known)
+            rows.extend(TaskCount(report_id=pk, task_type_id=ids[key], count=count) for key, count in pairs)
+
+        with transaction.atomic():
+            TaskCount.objects.bulk_create(rows, ignore_conflicts=True)
+
+        written += len(rows)
+        last_pk = chunk[-1][0]
+        if stdout is not None:
+            stdout.write(f"Backfilled up to report {last_pk} ({written} counts)")
+
+    return written
@@ -1,3 +1,1749 @@
-from django.test import TestCase
+import csv
+import datetime
+import json
+import os
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.models import F
+from django.db.utils import load_backend
+from django.http import Http404
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.signals import template_rendered
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from openpyxl import Workbook, load_workbook
+from prometheus_client import REGISTRY
+
+from . import views
+from .aggregates import refresh_aggregates
+from .aggregation import combine_history
+from .benchmarks import import_times
+from .bulk import RowInserter, copy_csv
+from .export_jobs import claim_pending_jobs, fail_jobs, fail_stale_jobs, request_export, run_export_job
+from .forms import ReportForm
+from .import_jobs import recover_stale_imports
+from .imports import ImportFormatError, import_reports
+from .notices import FEED_SIZE as NOTICE_FEED_SIZE, latest_notices
+from .partitions import (
+    UNPARTITIONED_TABLE, add_months, archive_month, convert_to_partitioned, create_partition, is_partitioned, partition_months,
+    partition_name, rehydrate_month, rehydrate_range,
+)
+from .rollups import (
+    VECTORIZED_MIN_REPORTS, combine_reports, deferred_rollups, find_rollup_drift, rebuild_rollups, refresh_rollup,
+    reports_for_key,
+)
+from .schema import schema_version, team_fields, field_labels
+from .models import (
+    Report, User, AdminNotice, DynamicField, DynamicFieldResponse, ReportDailyRollup, ExportJob, ImportJob, TaskCount,
+    SubmissionMonth,
+    TeamAggregate, UserAggregate, DailyAggregate, ArchivedMonth, RollupTombstone,
+)
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage",
+    # cache.clear() below must never reach a shared cache such as production's Redis
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+)
+class ReportsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user("boss", password="pw", team="marketing", is_staff=True)
+        self.editor = User.objects.create_user("editor", password="pw", team="video_editor")
+        self.day = datetime.date(2024, 5, 6)
+
+    def make_report(self, user=None, day=None, shift="9_5_30", tasks=None, notes="", **extra):
+        return Report.objects.create(
+            user=user or self.editor,
+            custom_date=day or self.day,
+            shift=shift,
+            tasks=tasks or {},
+            notes=notes,
+            **extra,
+        )
+
+
+# ------------------------------
+# ✅ Daily rollups
+# ------------------------------
+class DailyRollupTests(ReportsTestCase):
+    def test_reports_for_same_key_are_merged(self):
+        field = DynamicField.objects.create(team="video_editor", name="camera", label="Camera", field_type="text")
+        first = self.make_report(tasks={"logo_video": 2, "vo_video": 1}, notes="morning")
+        self.make_report(tasks={"logo_video": 3}, notes="evening")
+        DynamicFieldResponse.objects.create(report=first, field=field, value="A7")
+
+        rollup = ReportDailyRollup.objects.get()
+        self.assertEqual(rollup.tasks, {"logo_video": 5, "vo_video": 1})
+        self.assertEqual(rollup.notes, ["morning", "evening"])
+        self.assertEqual(rollup.report_count, 2)
+        self.assertEqual(rollup.combined_tasks({field.pk: "Camera"}), {"logo_video": 5, "vo_video": 1, "Camera": "A7"})
+
+    def test_moving_and_deleting_reports_updates_rollups(self):
+        report = self.make_report(tasks={"logo_video": 2})
+        report.shift = "wfh"
+        report.save()
+        self.assertEqual(list(ReportDailyRollup.objects.values_list("shift", flat=True)), ["wfh"])
+
+        report.delete()
+        self.assertFalse(ReportDailyRollup.objects.exists())
+
+    def test_check_command_detects_and_repairs_drift(self):
+        self.make_report(tasks={"logo_video": 2})
+        ReportDailyRollup.objects.update(tasks={"logo_video": 99})
+
+        with self.assertRaises(CommandError):
+            call_command("check_daily_rollups", stdout=StringIO())
+
+        call_command("check_daily_rollups", "--fix", stdout=StringIO())
+        self.assertEqual(ReportDailyRollup.objects.get().tasks, {"logo_video": 2})
+
+    def test_rebuild_command_backfills_rollups(self):
+        self.make_report(tasks={"logo_video": 2})
+        self.make_report(day=self.day + datetime.timedelta(days=1), tasks={"logo_video": 1})
+        ReportDailyRollup.objects.all().delete()
+
+        call_command("rebuild_daily_rollups", stdout=StringIO())
+        self.assertEqual(ReportDailyRollup.objects.count(), 2)
+
+    def test_overview_reads_merged_rows(self):
+        self.make_report(tasks={"logo_video": 2})
+        self.make_report(tasks={"logo_video": 3})
+        self.client.force_login(self.staff)
+
+        response = self.client.get(reverse("admin_reports_overview"))
+
+        self.assertEqual(len(response.context["reports"]), 1)
+        self.assertEqual(response.context["reports"][0]["tasks"], {"Logo Video": 5})
+
+
+# ------------------------------
+# ✅ Vectorized rollup combining
+# ------------------------------
+class AggregationTests(ReportsTestCase):
+    def assertMatchesPerKeyCombine(self, reports, **options):
+        combined = list(combine_history(reports, **options))
+        self.assertEqual(len(combined), reports.values("user_id", "custom_date", "shift").distinct().count())
+        self.assertEqual([key for key, _ in combined], sorted(key for key, _ in combined))
+        for (user_id, day, shift), values in combined:
+            self.assertEqual(values, combine_reports(list(reports_for_key(user_id, day, shift))), (user_id, day, shift))
+
+    def test_matches_per_key_combine_on_mixed_values(self):
+        field = DynamicField.objects.create(team="video_editor", name="camera", label="Camera", field_type="text")
+        other = User.objects.create_user("other", password="pw", team="video_editor")
+        late = datetime.datetime(2024, 6, 1, 9, 0, tzinfo=datetime.timezone.utc)
+        first = self.make_report(tasks={"logo_video": 2, "vo_video": None, "camera_note": "wide"}, notes="morning")
+        second = self.make_report(tasks={"logo_video": "3", "vo_video": None, "camera_note": 4}, notes="")
+        self.make_report(tasks={"logo_video": 1.5, "reel_video": True, "vo_video": 7}, notes="evening")
+        self.make_report(shift="wfh", tasks={"logo_video": None, "reel_video": -2, "extra": {"nested": [1, 2]}})
+        self.make_report(user=other, day=self.day - datetime.timedelta(days=3), tasks={"reel_video": 10**12})
+        self.make_report(user=other, tasks=None, notes="empty")
+        DynamicFieldResponse.objects.create(report=first, field=field, value="A7")
+        DynamicFieldResponse.objects.create(report=second, field=field, value="FX3")
+        Report.objects.filter(pk=second.pk).update(date=late)
+
+        self.assertMatchesPerKeyCombine(Report.objects.all())
+
+    def test_batches_split_between_users(self):
+        users = [self.editor] + [User.objects.create_user(f"user{i}", password="pw", team="video_editor") for i in range(3)]
+        for n, user in enumerate(users):
+            for offset in range(n + 1):
+                self.make_report(user=user, day=self.day + datetime.timedelta(days=offset), tasks={"logo_video": n})
+                self.make_report(user=user, day=self.day + datetime.timedelta(days=offset), tasks={"logo_video": 1})
+
+        self.assertMatchesPerKeyCombine(Report.objects.all(), batch_size=3)
+        self.assertMatchesPerKeyCombine(Report.objects.filter(user=users[2]), batch_size=1)
+
+    def test_rebuilt_rollups_show_no_drift(self):
+        self.make_report(tasks={"logo_video": 2, "vo_video": "n/a"}, notes="morning")
+        self.make_report(tasks={"logo_video": "4", "vo_video": 1})
+        before = list(ReportDailyRollup.objects.values("tasks", "notes", "report_count"))
+
+        # Vectorized, then key by key
+        for threshold in (0, VECTORIZED_MIN_REPORTS):
+            with self.subTest(threshold=threshold), mock.patch("reports.rollups.VECTORIZED_MIN_REPORTS", threshold):
+                ReportDailyRollup.objects.all().delete()
+                call_command("rebuild_daily_rollups", stdout=StringIO())
+
+                self.assertEqual(list(ReportDailyRollup.objects.values("tasks", "notes", "report_count")), before)
+                self.assertEqual(find_rollup_drift(), ([], [], []))
+
+    def test_small_sets_are_combined_without_pandas(self):
+        self.make_report(tasks={"logo_video": 2})
+        with mock.patch("reports.aggregation.combine_history") as vectorized:
+            rebuild_rollups(user_id=self.editor.pk)
+        vectorized.assert_not_called()
+        self.assertEqual(ReportDailyRollup.objects.get().tasks["logo_video"], 2)
+
+
+# ------------------------------
+# ✅ Streaming export
+# ------------------------------
+class ExportTests(ReportsTestCase):
+    def test_export_streams_merged_rows_with_dynamic_columns(self):
+        field = DynamicField.objects.create(team="video_editor", name="camera", label="Camera", field_type="text")
+        report = self.make_report(tasks={"logo_video": 2}, notes="a")
+        self.make_report(tasks={"logo_video": 1, "vo_video": 4}, notes="b")
+        DynamicFieldResponse.objects.create(report=report, field=field, value="A7")
+        self.client.force_login(self.staff)
+
+        response = self.client.get(reverse("export_reports_excel"), {"team": "video_editor"})
+        workbook = load_workbook(BytesIO(b"".join(response.streaming_content)))
+        rows = list(workbook.active.iter_rows(values_only=True))
+
+        self.assertEqual(rows[0], ("username", "team", "custom_date", "shift", "notes", "logo_video", "vo_video", "Camera"))
+        self.assertEqual(rows[1][0], "editor")
+        self.assertEqual(rows[1][4:], ("a | b", 3, 4, "A7"))
+        self.assertEqual(len(rows), 2)
+
+    def export(self, export_format, **params):
+        self.client.force_login(self.staff)
+        return self.client.get(reverse("export_reports_excel"), {"format": export_format, **params})
+
+    def test_flat_formats_stream_the_same_rows(self):
+        field = DynamicField.objects.create(team="video_editor", name="camera", label="Camera", field_type="text")
+        report = self.make_report(tasks={"logo_video": 2}, notes="a")
+        self.make_report(user=self.staff, tasks={"client_visit_details": "Visited"})
+        DynamicFieldResponse.objects.create(report=report, field=field, value="A7")
+
+        response = self.export("csv", team="video_editor")
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="reports.csv"')
+        rows = list(csv.reader(StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows, [
+            ["username", "team", "custom_date", "shift", "notes", "logo_video", "Camera"],
+            ["editor", "video_editor", self.day.isoformat(), "9:00 AM – 5:30 PM", "a", "2", "A7"],
+        ])
+
+        response = self.export("jsonl")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual({line["username"] for line in lines}, {"editor", "boss"})
+        editor = next(line for line in lines if line["username"] == "editor")
+        self.assertEqual((editor["custom_date"], editor["logo_video"], editor["Camera"]), (self.day.isoformat(), 2, "A7"))
+        self.assertNotIn("client_visit_details", editor)
+
+    def test_parquet_columns_are_typed(self):
+        import pyarrow.parquet as pq
+
+        self.make_report(tasks={"logo_video": 2, "vo_video": "n/a"})
+        self.make_report(user=self.staff, tasks={"client_visit_details": "Visited", "vo_video": 1})
+
+        response = self.export("parquet")
+        table = pq.read_table(BytesIO(b"".join(response.streaming_content)))
+        types = {field.name: str(field.type) for field in table.schema}
+        self.assertEqual(
+            types,
+            {
+                "username": "string", "team": "string", "custom_date": "date32[day]", "shift": "string", "notes": "string",
+                "client_visit_details": "string", "logo_video": "int64", "vo_video": "string",
+            },
+        )
+        rows = sorted(table.to_pylist(), key=lambda row: row["username"])
+        self.assertEqual([row["logo_video"] for row in rows], [None, 2])
+        self.assertEqual([row["vo_video"] for row in rows], ["1", "n/a"])
+
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self.export("pdf").status_code, 400)
+
+    async def test_asgi_streams_exports_asynchronously(self):
+        await sync_to_async(self.make_report)(tasks={"logo_video": 2}, notes="a")
+        await self.async_client.aforce_login(self.staff)
+
+        with self.settings(SERVER_MODE="asgi"):
+            for export_format in ("csv", "xlsx"):
+                response = await self.async_client.get(reverse("export_reports_excel"), {"format": export_format})
+                # A sync iterator would be read whole by Django before the first byte is sent
+                self.assertTrue(response.is_async)
+                content = b"".join([chunk async for chunk in response.streaming_content])
+                if export_format == "csv":
+                    self.assertIn(b",a,2", content)
+                else:
+                    self.assertEqual(load_workbook(BytesIO(content)).active.max_row, 2)
+
+
+# ------------------------------
+# ✅ Delta export (change watermark + tombstones)
+# ------------------------------
+class DeltaExportTests(ReportsTestCase):
+    def sync(self, since="", **params):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("export_reports_excel"), {"format": "jsonl", "since": since, **params})
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        return lines, response["X-Next-Since"]
+
+    def by_day(self, lines):
+        return {(line["username"], line["custom_date"]): line for line in lines}
+
+    def test_delta_returns_only_changed_and_deleted_rows(self):
+        self.make_report(tasks={"logo_video": 1})
+        edited = self.make_report(day=self.day + datetime.timedelta(days=1), tasks={"logo_video": 2})
+        removed = self.make_report(day=self.day + datetime.timedelta(days=2), tasks={"logo_video": 3})
+
+        rows, token = self.sync()
+        self.assertEqual(len(rows), 3)
+        self.assertFalse(any(row["deleted"] for row in rows))
+        self.assertEqual(self.sync(token), ([], token))
+
+        edited.tasks = {"logo_video": 5}
+        edited.save()
+        removed.delete()
+        self.make_report(user=self.staff, tasks={"client_visit_details": "Visited"})
+
+        rows, next_token = self.sync(token)
+        rows = self.by_day(rows)
+        self.assertGreater(int(next_token), int(token))
+        day = lambda offset: (self.day + datetime.timedelta(days=offset)).isoformat()
+        self.assertEqual(set(rows), {("editor", day(1)), ("editor", day(2)), ("boss", day(0))})
+        self.assertEqual((rows["editor", day(1)]["logo_video"], rows["editor", day(1)]["deleted"]), (5, False))
+        self.assertEqual(rows["editor", day(2)]["deleted"], True)
+        self.assertNotIn("logo_video", rows["editor", day(2)])
+        self.assertNotIn(("editor", day(0)), rows)
+
+        rows, _ = self.sync(token, team="marketing")
+        self.assertEqual(set(self.by_day(rows)), {("boss", day(0))})
+        self.assertEqual(self.sync(next_token), ([], next_token))
+
+    def test_deleted_then_recreated_key_is_a_single_update(self):
+        _, token = self.sync()
+        self.make_report(tasks={"logo_video": 1}).delete()
+        self.make_report(tasks={"logo_video": 4})
+
+        rows, _ = self.sync(token)
+        self.assertEqual([(row["logo_video"], row["deleted"]) for row in rows], [(4, False)])
+
+    def test_rebuild_and_user_deletion_leave_tombstones(self):
+        self.make_report(tasks={"logo_video": 1})
+        self.make_report(user=self.staff, tasks={"client_visit_details": "Visited"})
+        _, token = self.sync()
+
+        Report.objects.filter(user=self.staff).update(shift="wfh")
+        call_command("rebuild_daily_rollups", stdout=StringIO())
+        self.editor.delete()
+
+        rows, _ = self.sync(token)
+        deleted = sorted((row["username"], row["shift"]) for row in rows if row["deleted"])
+        self.assertEqual(deleted, [("boss", "9:00 AM – 5:30 PM"), ("editor", "9:00 AM – 5:30 PM")])
+        self.assertEqual([row["shift"] for row in rows if not row["deleted"]], ["Work From Home"])
+
+    def test_spooled_formats_carry_the_token(self):
+        self.make_report(tasks={"logo_video": 1})
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("export_reports_excel"), {"since": "0"})
+        rows = list(load_workbook(BytesIO(b"".join(response.streaming_content))).active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][-1], "deleted")
+        self.assertEqual(response["X-Next-Since"], str(ReportDailyRollup.objects.get().change_seq))
+
+    def test_invalid_token_is_rejected(self):
+        self.client.force_login(self.staff)
+        for token in ("abc", "-1"):
+            response = self.client.get(reverse("export_reports_excel"), {"since": token})
+            self.assertEqual(response.status_code, 400)
+
+
+# ------------------------------
+# ✅ Background export jobs
+# ------------------------------
+class ExportJobTests(ReportsTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+    def test_job_builds_file_and_is_reused_until_data_changes(self):
+        self.make_report(tasks={"logo_video": 2})
+        job, reused = request_export(self.staff, {"team": "video_editor"})
+        self.assertFalse(reused)
+
+        self.assertEqual(claim_pending_jobs(5), [job.pk])
+        run_export_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_total, job.rows_written), ("done", 1, 1))
+
+        again, reused = request_export(self.staff, {"team": "video_editor"})
+        self.assertTrue(reused)
+        self.assertEqual(again.pk, job.pk)
+
+        self.make_report(day=self.day + datetime.timedelta(days=1), tasks={"logo_video": 1})
+        fresh, reused = request_export(self.staff, {"team": "video_editor"})
+        self.assertFalse(reused)
+
+    @override_settings(REPORTS_XLSX_DOWNLOAD_MAX_ROWS=1)
+    def test_large_workbooks_are_refused_with_a_background_export_form(self):
+        self.make_report(tasks={"logo_video": 2})
+        self.client.force_login(self.staff)
+        export = reverse("export_reports_excel")
+
+        self.assertTrue(self.client.get(export, {"team": "video_editor"}).streaming)
+        self.assertFalse(ExportJob.objects.exists())
+
+        self.make_report(day=self.day + datetime.timedelta(days=1), tasks={"logo_video": 1})
+        response = self.client.get(export, {"team": "video_editor", "date": ""})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.context["filters"], {"team": "video_editor"})
+        self.assertContains(response, reverse("export_job_create"), status_code=400)
+        self.assertIn("format=csv", response.context["csv_url"])
+        # A GET never queues the job
+        self.assertFalse(ExportJob.objects.exists())
+
+        # Streamed formats and delta exports are still sent directly
+        self.assertTrue(self.client.get(export, {"format": "csv"}).streaming)
+        self.assertTrue(self.client.get(export, {"since": ""}).streaming)
+
+        self.client.post(reverse("export_job_create"), response.context["filters"])
+        self.assertEqual(ExportJob.objects.get().filters, {"team": "video_editor"})
+
+    def test_staff_can_poll_and_download(self):
+        self.make_report(tasks={"logo_video": 2})
+        self.client.force_login(self.staff)
+        self.client.post(reverse("export_job_create"), {"start_date": "2024-05-01", "end_date": "2024-05-31"})
+        job = ExportJob.objects.get()
+        claim_pending_jobs(1)
+        run_export_job(job.pk)
+
+        status = self.client.get(reverse("export_job_status", args=[job.pk])).json()
+        self.assertEqual(status["status"], "done")
+
+        response = self.client.get(status["download_url"])
+        rows = list(load_workbook(BytesIO(b"".join(response.streaming_content))).active.iter_rows(values_only=True))
+        self.assertEqual(len(rows), 2)
+
+    @override_settings(REPORTS_EXPORT_JOB_TIMEOUT=60)
+    def test_stale_jobs_are_failed_and_not_reused(self):
+        long_ago = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        job, _ = request_export(self.staff, {})
+        ExportJob.objects.filter(pk=job.pk).update(created_at=long_ago)
+
+        again, reused = request_export(self.staff, {})
+        self.assertFalse(reused)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+
+        self.assertEqual(claim_pending_jobs(1), [again.pk])
+        # A long export that still makes progress is not stale
+        ExportJob.objects.filter(pk=again.pk).update(started_at=long_ago)
+        self.assertEqual(fail_stale_jobs(), 0)
+
+        ExportJob.objects.filter(pk=again.pk).update(heartbeat_at=long_ago)
+        self.assertEqual(fail_stale_jobs(exclude=[again.pk]), 0)
+        self.assertEqual(fail_stale_jobs(), 1)
+
+    def test_job_failed_while_running_is_not_set_to_done(self):
+        self.make_report(tasks={"logo_video": 2})
+        job, _ = request_export(self.staff, {})
+        claim_pending_jobs(1)
+
+        def write_then_time_out(params, fileobj, chunk_size, on_progress):
+            fileobj.write(b"xlsx")
+            fail_jobs([job.pk], "Timed out: no export worker finished the job.")
+            return 1
+
+        with mock.patch("reports.export_jobs.write_export", side_effect=write_then_time_out):
+            run_export_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertFalse(job.file)
+        self.assertFalse(os.listdir(os.path.join(settings.MEDIA_ROOT, "exports")))
+
+    def test_worker_fails_jobs_whose_process_died(self):
+        job, _ = request_export(self.staff, {})
+        err = StringIO()
+        with mock.patch("reports.management.commands.run_export_worker.run_export_job", _kill_process):
+            call_command("run_export_worker", "--once", "--poll-interval", "0", stdout=StringIO(), stderr=err)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertIn(f"Export job {job.pk} failed: its process died.", err.getvalue())
+
+    def test_job_metrics_are_read_from_the_database(self):
+        # The worker's own metric files never reach the web workers' /metrics
+        self.make_report(tasks={"logo_video": 2})
+        job, _ = request_export(self.staff, {})
+        claim_pending_jobs(1)
+        run_export_job(job.pk)
+
+        self.client.force_login(self.staff)
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('reports_export_jobs_total{status="done"} 1.0', body)
+        self.assertIn('reports_export_job_rows_total{status="done"} 1.0', body)
+        self.assertIn('reports_export_jobs_total{status="failed"} 0.0', body)
+
+
+def _kill_process(job_id, chunk_size):
+    os._exit(1)
+
+
+# ------------------------------
+# ✅ Overview keyset pagination
+# ------------------------------
+class OverviewPaginationTests(ReportsTestCase):
+    @mock.patch("reports.views.OVERVIEW_PAGE_SIZE", 2)
+    def test_pages_walk_every_row_once_newest_first(self):
+        for offset in range(5):
+            self.make_report(day=self.day + datetime.timedelta(days=offset), tasks={"logo_video": 1})
+        self.client.force_login(self.staff)
+
+        response = self.client.get(reverse("admin_reports_overview"))
+        seen = [row["custom_date"] for row in response.context["reports"]]
+        cursor = response.context["next_cursor"]
+
+        while cursor:
+            page = self.client.get(reverse("admin_reports_overview_rows"), {"after": cursor})
+            seen += [row["custom_date"] for row in page.context["reports"]]
+            cursor = page["X-Next-Cursor"]
+
+        self.assertEqual(seen, [self.day + datetime.timedelta(days=offset) for offset in reversed(range(5))])
+
+    def test_malformed_cursor_is_rejected(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("admin_reports_overview_rows"), {"after": "garbage"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rows_url_encodes_the_filters(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("admin_reports_overview"), {"team": "video editor&user=1"})
+        self.assertContains(response, "?team=video%20editor%26user%3D1&user=&date=")
+
+
+# ------------------------------
+# ✅ Dynamic field schema registry
+# ------------------------------
+class SchemaRegistryTests(ReportsTestCase):
+    def field_queries(self, queries):
+        return [q["sql"] for q in queries if '"reports_dynamicfield"' in q["sql"]]
+
+    def test_registry_is_invalidated_by_field_changes(self):
+        self.assertEqual(team_fields("video_editor"), ())
+        with self.captureOnCommitCallbacks(execute=True):
+            field = DynamicField.objects.create(team="video_editor", name="camera", label="Camera", field_type="text")
+        self.assertEqual([f.label for f in team_fields("video_editor")], ["Camera"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            field.label = "Camera Body"
+            field.save()
+        self.assertEqual(field_labels(), {field.pk: "Camera Body"})
+
+        with self.assertNumQueries(0):
+            team_fields("video_editor")
+
+    def test_version_is_bumped_only_when_the_change_commits(self):
+        version = schema_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            DynamicField.objects.create(team="video_editor", name="camera", label="Camera", field_type="text")
+            # A lookup before the commit caches under the old token
+            self.assertEqual(schema_version(), version)
+        self.assertEqual(len(callbacks), 1)
+
+        callbacks[0]()
+        self.assertNotEqual(schema_version(), version)
+        self.assertEqual([f.label for f in team_fields("video_editor")], ["Camera"])
+
+    def test_views_do_not_look_up_fields_per_response(self):
+        fields = [
+            DynamicField.objects.create(team="video_editor", name=f"f{i}", label=f"Field {i}", field_type="text")
+            for i in range(4)
+        ]
+        report = self.make_report(tasks={"logo_video": 1})
+        for field in fields:
+            DynamicFieldResponse.objects.create(report=report, field=field, value="x")
+        field_labels()  # warm the registry
+
+        self.client.force_login(self.editor)
+        with CaptureQueriesContext(connection) as preview:
+            response = self.client.get(reverse("user_report_preview", args=[self.day.isoformat()]))
+        self.assertEqual(len(response.context["dynamic_fields"]), 4)
+        self.assertEqual(self.field_queries(preview.captured_queries), [])
+
+        with CaptureQueriesContext(connection) as form:
+            self.client.get(reverse("submit_report"))
+        self.assertEqual(self.field_queries(form.captured_queries), [])
+
+        self.client.force_login(self.staff)
+        for name, args in (
+            ("admin_reports_overview", []),
+            ("export_reports_excel", []),
+            ("user_report_detail", [self.editor.username]),
+        ):
+            with CaptureQueriesContext(connection) as page:
+                response = self.client.get(reverse(name, args=args))
+                if response.streaming:
+                    b"".join(response.streaming_content)
+            self.assertEqual(self.field_queries(page.captured_queries), [], name)
+
+
+# ------------------------------
+# ✅ Normalized task counts
+# ------------------------------
+class TaskCountTests(ReportsTestCase):
+    def test_form_submission_writes_task_counts(self):
+        form = ReportForm(
+            data={"custom_date": "2024-05-06", "shift": "9_5_30", "report_type": "regular", "logo_video": 3, "vo_video": 0},
+            user=self.editor,
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        report = form.save()
+
+        counts = {tc.task_type.key: tc.count for tc in report.task_counts.select_related("task_type")}
+        self.assertEqual(counts, {"logo_video": 3})
+        self.assertEqual(report.task_counts.get().task_type.label, "Logo Video")
+
+    def test_backfill_and_aggregates(self):
+        reporter = User.objects.create_user("reporter", team="reporter")
+        self.make_report(tasks={"logo_video": 2, "vo_video": "x"})
+        self.make_report(day=datetime.date(2024, 6, 1), tasks={"logo_video": 1, "reel_video": 4})
+        self.make_report(user=reporter, tasks={"breaking_news": 5})
+        TaskCount.objects.all().delete()
+
+        call_command("backfill_task_counts", stdout=StringIO())
+        call_command("backfill_task_counts", stdout=StringIO())
+        self.assertEqual(TaskCount.objects.count(), 4)
+
+        by_task = {(r["task_type__team"], r["task_type__key"]): r["total"] for r in TaskCount.objects.by_task()}
+        self.assertEqual(by_task, {
+            ("reporter", "breaking_news"): 5,
+            ("video_editor", "logo_video"): 3,
+            ("video_editor", "reel_video"): 4,
+        })
+        by_team = {r["task_type__team"]: r["total"] for r in TaskCount.objects.by_team()}
+        self.assertEqual(by_team, {"reporter": 5, "video_editor": 7})
+        by_month = [(r["period"], r["total"]) for r in TaskCount.objects.by_period("month")]
+        self.assertEqual(by_month, [(datetime.date(2024, 5, 1), 7), (datetime.date(2024, 6, 1), 5)])
+        by_week = [(r["period"], r["total"]) for r in TaskCount.objects.by_period("week")]
+        self.assertEqual(by_week, [(datetime.date(2024, 5, 6), 7), (datetime.date(2024, 5, 27), 5)])
+
+    def test_editing_a_report_rewrites_its_counts(self):
+        report = self.make_report(tasks={"logo_video": 2, "vo_video": 1})
+        report.tasks = {"logo_video": 4}
+        report.save()
+        self.assertEqual(list(report.task_counts.values_list("task_type__key", "count")), [("logo_video", 4)])
+
+
+class UserDetailTests(ReportsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.staff)
+
+    def summary(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("api_user_summary", args=["editor"]))
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_summaries_are_grouped_in_the_database(self):
+        self.make_report(tasks={"logo_video": 2, "vo_video": 1})
+        self.make_report(day=datetime.date(2023, 12, 31), tasks={"logo_video": 4})
+        self.make_report(day=datetime.date(2024, 1, 2), tasks={"logo_video": 0})
+
+        summary, queries = self.summary()
+        self.assertEqual(summary["task_totals"], {"Logo Video": 6, "VO Video": 1})
+        # Days with nothing done are kept
+        self.assertEqual(summary["daily_summary"], {"2023-12-31": 4, "2024-01-02": 0, "2024-05-06": 3})
+        self.assertEqual(summary["monthly_summary"], {"Dec 2023": 4, "Jan 2024": 0, "May 2024": 3})
+        self.assertEqual(summary["yearly_summary"], {"2023": 4, "2024": 3})
+
+        # Session, login and target user, then one query for the task totals
+        # and one for the days, however long the history
+        self.assertEqual(queries, 5)
+        for offset in range(30):
+            self.make_report(day=self.day + datetime.timedelta(days=offset + 1), tasks={"logo_video": 1, "reel_video": 2})
+        self.assertEqual(self.summary()[1], queries)
+
+    def test_history_table_pages_newest_first(self):
+        for offset in range(60):
+            self.make_report(day=self.day - datetime.timedelta(days=offset))
+
+        response = self.client.get(reverse("user_report_detail", args=["editor"]))
+        self.assertEqual(response.context["total_submissions"], 60)
+        self.assertEqual(len(response.context["reports"]), 50)
+        self.assertEqual(response.context["reports"][0]["custom_date"], self.day)
+
+        rows = self.client.get(
+            reverse("user_report_detail_rows", args=["editor"]),
+            {"after": response.context["next_cursor"]},
+        )
+        self.assertEqual(rows["X-Next-Cursor"], "")
+        self.assertEqual(len(rows.context["reports"]), 10)
+
+
+# ------------------------------
+# ✅ Submission calendar
+# ------------------------------
+class SubmissionCalendarTests(ReportsTestCase):
+    def month(self, user=None, year=2024, month=5, **headers):
+        params = {"user": user} if user else {}
+        return self.client.get(reverse("submission_calendar", args=[year, month]), params, **headers)
+
+    def test_bitmap_follows_saves_and_deletes(self):
+        self.make_report(day=datetime.date(2024, 5, 1))
+        leave = self.make_report(day=datetime.date(2024, 5, 31), report_type="leave")
+        self.make_report(day=datetime.date(2024, 6, 3))
+
+        self.client.force_login(self.editor)
+        data = self.month().json()
+        self.assertEqual(data, {"month": "2024-05", "submitted": 1 | 1 << 30, "leave": 1 << 30})
+
+        leave.delete()
+        self.assertEqual(self.month().json()["submitted"], 1)
+        self.assertEqual(self.month(month=7).json(), {"month": "2024-07", "submitted": 0, "leave": 0})
+
+        SubmissionMonth.objects.all().delete()
+        call_command("rebuild_daily_rollups", stdout=StringIO())
+        self.assertEqual(
+            list(SubmissionMonth.objects.order_by("month").values_list("month", "submitted_days")),
+            [(datetime.date(2024, 5, 1), 1), (datetime.date(2024, 6, 1), 1 << 2)],
+        )
+
+    def test_unchanged_month_revalidates_and_only_staff_see_others(self):
+        self.make_report(day=datetime.date(2024, 5, 2))
+        self.client.force_login(self.editor)
+
+        response = self.month()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.month(HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.make_report(day=datetime.date(2024, 5, 3))
+        self.assertEqual(self.month(HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 200)
+
+        self.assertEqual(self.month(user="boss").status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.month(user="editor").json()["submitted"], 0b110)
+
+    def test_pages_no_longer_embed_the_history(self):
+        for offset in range(40):
+            self.make_report(day=self.day - datetime.timedelta(days=offset))
+        self.client.force_login(self.editor)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("submit_report"))
+        self.assertFalse([q for q in queries if "FROM \"reports_report\"" in q["sql"]])
+
+
+# ------------------------------
+# ✅ Benchmarks
+# ------------------------------
+class BenchmarkTests(ReportsTestCase):
+    def test_seeded_data_is_consistent(self):
+        call_command("seed_benchmark_data", users=8, days=10, stdout=StringIO())
+
+        seeded = Report.objects.filter(user__username__startswith="bench_")
+        self.assertEqual(set(seeded.values_list("user__team", flat=True)), {team for team, _ in User.TEAM_CHOICES})
+        self.assertTrue(DynamicFieldResponse.objects.filter(report__in=seeded).exists())
+        self.assertTrue(TaskCount.objects.filter(report__in=seeded).exists())
+        call_command("check_daily_rollups", stdout=StringIO())
+
+    def test_views_suite_records_and_compares_results(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = f"{tmp}/results.json"
+            call_command("run_benchmarks", suite=["views"], sizes=[100], no_memory=True, output=output, stdout=StringIO())
+            with open(output) as fh:
+                results = json.load(fh)
+
+            self.assertEqual(
+                {row["scenario"]: row["status"] for row in results},
+                {
+                    "user_dashboard": 200, "submit_report_get": 200, "submit_report_post": 302,
+                    "admin_overview": 200, "user_detail": 200, "export_excel": 200,
+                    "export_csv": 200, "export_jsonl": 200, "export_parquet": 200,
+                },
+            )
+            self.assertTrue(all(row["queries"] > 0 for row in results))
+            self.assertFalse(Report.objects.exists())
+
+            out = StringIO()
+            call_command("run_benchmarks", suite=["views"], sizes=[100], no_memory=True, baseline=output, stdout=out)
+            self.assertIn("Compared with", out.getvalue())
+
+
+# ------------------------------
+# ✅ Prometheus metrics
+# ------------------------------
+class MetricsTests(ReportsTestCase):
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_are_recorded_per_view(self):
+        self.make_report(tasks={"logo_video": 2})
+        self.client.force_login(self.staff)
+        before = self.sample("reports_http_request_db_queries_count", view="admin_reports_overview")
+        rows_before = self.sample("reports_export_rows_total", source="download")
+
+        self.client.get(reverse("admin_reports_overview"))
+        b"".join(self.client.get(reverse("export_reports_excel")).streaming_content)
+
+        self.assertEqual(self.sample("reports_http_request_db_queries_count", view="admin_reports_overview"), before + 1)
+        self.assertGreater(self.sample("reports_http_request_db_queries_sum", view="admin_reports_overview"), 0)
+        self.assertEqual(self.sample("reports_export_rows_total", source="download"), rows_before + 1)
+        self.assertGreater(self.sample("reports_http_response_size_bytes_sum", view="export_reports_excel"), 0)
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('reports_http_request_duration_seconds_bucket{le="0.005",method="GET",view="admin_reports_overview"}', response.content.decode())
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_endpoint_is_limited_to_staff_or_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        self.assertEqual(self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        self.assertEqual(self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200)
+
+        self.client.force_login(self.editor)
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+
+
+# ------------------------------
+# ✅ Async views (SERVER_MODE=asgi)
+# ------------------------------
+class AsyncViewTests(ReportsTestCase):
+    async def call(self, view, user, *args, path="/", **params):
+        """
+        Run an async view directly (the URLconf serves the sync views under
+        WSGI) and return its response and template context.
+        """
+        request = AsyncRequestFactory().get(path, params)
+        request.auser = sync_to_async(lambda: user)
+        request.session = {}
+        contexts = []
+        receiver = lambda sender, context, **kwargs: contexts.append(context)
+        template_rendered.connect(receiver)
+        try:
+            response = await view(request, *args)
+        finally:
+            template_rendered.disconnect(receiver)
+        return response, contexts[0] if contexts else None
+
+    async def test_async_views_check_login_and_staff(self):
+        response, _ = await self.call(views.user_dashboard_async, AnonymousUser())
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(reverse("login")))
+
+        response, _ = await self.call(views.admin_reports_overview_async, self.editor)
+        self.assertTrue(response.url.startswith(reverse("admin:login")))
+
+        with self.assertRaises(Http404):
+            await self.call(views.user_report_detail_async, self.staff, "nobody")
+
+    async def test_async_views_match_sync_views(self):
+        await sync_to_async(self.make_report)(day=datetime.date.today(), tasks={"logo_video": 2})
+
+        _, context = await self.call(views.user_dashboard_async, self.editor)
+        self.assertTrue(context["has_submitted_today"])
+        self.assertEqual(context["total_reports"], 1)
+
+        _, context = await self.call(views.admin_reports_overview_async, self.staff, team="video_editor")
+        self.assertEqual(len(context["reports"]), 1)
+        self.assertEqual(sorted(context["teams"]), ["marketing", "video_editor"])
+        self.assertEqual(context["selected_team"], "video_editor")
+
+        _, context = await self.call(views.user_report_detail_async, self.staff, self.editor.username)
+        self.assertEqual(context["total_submissions"], 1)
+        self.assertEqual(context["reports"][0]["tasks"], {"Logo Video": 2})
+
+    async def test_metrics_middleware_under_asgi(self):
+        await self.async_client.aforce_login(self.staff)
+        labels = {"view": "user_report_detail"}
+        queries = REGISTRY.get_sample_value("reports_http_request_db_queries_sum", labels) or 0
+
+        response = await self.async_client.get(reverse("user_report_detail", args=[self.editor.username]))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(REGISTRY.get_sample_value("reports_http_request_db_queries_sum", labels), queries)
+
+
+# ------------------------------
+# ✅ Read replica routing (two local databases)
+# ------------------------------
+@override_settings(REPORTS_REPLICA_DATABASE="replica", REPORTS_REPLICA_LAG_CHECK_INTERVAL=0)
+class ReplicaRoutingTests(ReportsTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        super().setUp()
+        self.replicate(User.objects.all())
+        self.make_report(tasks={"logo_video": 2}, notes="a")
+        self.client.force_login(self.staff)
+
+    def replicate(self, queryset):
+        """Copy rows to the replica, as replication would."""
+        queryset.model.objects.using("replica").bulk_create(list(queryset))
+
+    def overview_rows(self):
+        return len(self.client.get(reverse("admin_reports_overview")).context["reports"])
+
+    def test_analytics_views_read_from_the_replica(self):
+        self.assertEqual(self.overview_rows(), 0)
+
+        self.replicate(ReportDailyRollup.objects.all())
+        self.assertEqual(self.overview_rows(), 1)
+        response = self.client.get(reverse("user_report_detail", args=["editor"]))
+        self.assertEqual(response.context["total_submissions"], 1)
+
+        # Rows read from the replica are written back to the primary
+        rollup = ReportDailyRollup.objects.using("replica").get()
+        rollup.notes = ["edited"]
+        rollup.save()
+        self.assertEqual(ReportDailyRollup.objects.get().notes, ["edited"])
+        self.assertEqual(ReportDailyRollup.objects.using("replica").get().notes, ["a"])
+
+    def test_streamed_exports_read_from_the_replica_except_deltas(self):
+        self.replicate(ReportDailyRollup.objects.all())
+        ReportDailyRollup.objects.update(notes=["primary"])
+        export = lambda **params: b"".join(
+            self.client.get(reverse("export_reports_excel"), {"format": "csv", **params}).streaming_content
+        ).decode()
+
+        self.assertIn(",a,", export())
+        self.assertIn(",primary,", export(since=""))
+
+    async def test_async_streamed_exports_read_from_the_replica(self):
+        await sync_to_async(self.replicate)(ReportDailyRollup.objects.all())
+        await ReportDailyRollup.objects.aupdate(notes=["primary"])
+        await self.async_client.aforce_login(self.staff)
+
+        with self.settings(SERVER_MODE="asgi"):
+            response = await self.async_client.get(reverse("export_reports_excel"), {"format": "csv"})
+            self.assertTrue(response.is_async)
+            content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertIn(b",a,", content)
+
+    def test_recent_writers_and_lagging_replicas_read_from_the_primary(self):
+        with mock.patch("reports.replicas.replica_lag", return_value=5.0):
+            self.assertEqual(self.overview_rows(), 0)
+            self.client.post(reverse("submit_report"), {})
+            self.assertEqual(self.overview_rows(), 1)
+
+        # Caught up with the write
+        self.assertEqual(self.overview_rows(), 0)
+
+        self.client.force_login(self.staff)
+        with mock.patch("reports.replicas.replica_lag", return_value=60.0):
+            self.assertEqual(self.overview_rows(), 1)
+        with mock.patch("reports.replicas.replica_lag", return_value=None):
+            self.assertEqual(self.overview_rows(), 1)
+
+    async def test_async_views_read_from_the_replica(self):
+        request = AsyncRequestFactory().get("/")
+        request.auser = sync_to_async(lambda: self.staff)
+        request.session = {}
+        contexts = []
+        receiver = lambda sender, context, **kwargs: contexts.append(context)
+        template_rendered.connect(receiver)
+        try:
+            await views.admin_reports_overview_async(request)
+        finally:
+            template_rendered.disconnect(receiver)
+        self.assertEqual(contexts[0]["reports"], [])
+
+
+# ------------------------------
+# ✅ Atomic report submission
+# ------------------------------
+class SubmissionTests(ReportsTestCase):
+    def submit(self, fields, day=None):
+        data = {"custom_date": (day or self.day).isoformat(), "shift": "9_5_30", "report_type": "regular", "logo_video": 2}
+        data.update({field.name: "x" for field in fields})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("submit_report"), data)
+        self.assertEqual(response.status_code, 302)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_answers(self):
+        self.client.force_login(self.editor)
+        one = [DynamicField.objects.create(team="video_editor", name="f0", label="Field 0", field_type="text")]
+        self.submit(one, day=self.day - datetime.timedelta(days=1))  # warm the registry and task types
+        baseline = self.submit(one)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            more = one + [
+                DynamicField.objects.create(team="video_editor", name=f"f{i}", label=f"Field {i}", field_type="text")
+                for i in range(1, 6)
+            ]
+        self.submit(more, day=self.day - datetime.timedelta(days=2))
+        self.assertEqual(self.submit(more, day=self.day + datetime.timedelta(days=1)), baseline)
+
+        rollup = ReportDailyRollup.objects.get(user=self.editor, custom_date=self.day + datetime.timedelta(days=1))
+        self.assertEqual(len(rollup.dynamic_values), 6)
+
+    def test_failed_answers_leave_no_partial_report(self):
+        DynamicField.objects.create(team="video_editor", name="camera", label="Camera", field_type="text")
+        form = ReportForm(
+            {"custom_date": self.day.isoformat(), "shift": "9_5_30", "report_type": "regular", "camera": "A7"},
+            user=self.editor,
+        )
+        self.assertTrue(form.is_valid())
+
+        with mock.patch.object(DynamicFieldResponse.objects, "bulk_create", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                form.save()
+
+        self.assertFalse(Report.objects.exists())
+        self.assertFalse(ReportDailyRollup.objects.exists())
+        self.assertFalse(SubmissionMonth.objects.exists())
+
+    def test_deferred_rollups_refresh_each_key_once(self):
+        with mock.patch("reports.rollups.refresh_rollup", wraps=refresh_rollup) as refresh:
+            with deferred_rollups():
+                first = self.make_report(tasks={"logo_video": 1})
+                self.make_report(tasks={"logo_video": 2})
+                with deferred_rollups():
+                    self.make_report(day=self.day + datetime.timedelta(days=1))
+                self.assertEqual(refresh.call_count, 0)
+        self.assertEqual(refresh.call_count, 2)
+        self.assertEqual(ReportDailyRollup.objects.get(custom_date=self.day).report_count, 2)
+
+        first.delete()
+        self.assertEqual(ReportDailyRollup.objects.get(custom_date=self.day).report_count, 1)
+
+    def test_load_test_command_compares_paths_and_cleans_up(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = f"{tmp}/load.json"
+            call_command("run_load_test", requests=3, concurrency=1, fields=2, legacy=True, output=output, stdout=StringIO())
+            with open(output) as fh:
+                results = json.load(fh)
+
+        self.assertEqual([row["scenario"] for row in results], ["atomic", "legacy"])
+        self.assertTrue(all(row["requests"] == 3 and row["failures"] == 0 for row in results))
+        self.assertLess(results[0]["queries_per_request"], results[1]["queries_per_request"])
+        self.assertFalse(User.objects.filter(username__startswith="loadtest_").exists())
+        self.assertFalse(Report.objects.exists())
+        self.assertFalse(DynamicField.objects.exists())
+
+
+# ------------------------------
+# ✅ Merge on write
+# ------------------------------
+@override_settings(REPORTS_MERGE_ON_WRITE=True)
+class MergeOnWriteTests(ReportsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.field = DynamicField.objects.create(team="video_editor", name="camera", label="Camera", field_type="text")
+
+    def submit(self, **data):
+        form = ReportForm(
+            {"custom_date": self.day.isoformat(), "shift": "9_5_30", "report_type": "regular", **data},
+            user=self.editor,
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.save()
+
+    def test_repeat_submissions_are_merged_in_the_database(self):
+        first = self.submit(logo_video=2, camera="A7", notes="morning")
+        second = self.submit(logo_video=3, vo_video=1, camera="FX3")
+        third = self.submit(logo_video="", notes="evening")
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(second.pk, third.pk)
+        report = Report.objects.get()
+        self.assertTrue(report.merged)
+        self.assertEqual({k: v for k, v in report.tasks.items() if v}, {"logo_video": 5, "vo_video": 1})
+        self.assertEqual(report.task_total, 6)
+        self.assertEqual(report.notes, "morning\nevening")
+        self.assertEqual(list(report.dynamic_responses.values_list("value", flat=True)), ["FX3"])
+        self.assertEqual(
+            dict(TaskCount.objects.values_list("task_type__key", "count")), {"logo_video": 5, "vo_video": 1},
+        )
+
+        rollup = ReportDailyRollup.objects.get()
+        self.assertEqual(rollup.report_count, 1)
+        self.assertEqual(rollup.dynamic_values, {str(self.field.pk): "FX3"})
+        self.assertEqual(find_rollup_drift(), ([], [], []))
+
+    def test_other_shifts_and_days_stay_separate(self):
+        self.submit(logo_video=1)
+        self.submit(logo_video=1, shift="wfh")
+        self.submit(logo_video=1, custom_date=(self.day + datetime.timedelta(days=1)).isoformat())
+        self.assertEqual(Report.objects.count(), 3)
+
+    def test_command_consolidates_existing_duplicates(self):
+        first = self.make_report(tasks={"logo_video": 2}, notes="morning")
+        second = self.make_report(tasks={"logo_video": 3, "vo_video": None}, notes="evening")
+        other = self.make_report(day=self.day + datetime.timedelta(days=1), tasks={"logo_video": 1})
+        DynamicFieldResponse.objects.create(report=first, field=self.field, value="A7")
+        DynamicFieldResponse.objects.create(report=second, field=self.field, value="FX3")
+        Report.objects.update(merged=False)
+
+        out = StringIO()
+        call_command("merge_duplicate_reports", "--dry-run", stdout=out)
+        self.assertIn("1 user/date/shift keys", out.getvalue())
+        self.assertEqual(Report.objects.count(), 3)
+
+        call_command("merge_duplicate_reports", stdout=StringIO())
+
+        self.assertEqual(sorted(Report.objects.values_list("pk", flat=True)), [first.pk, other.pk])
+        self.assertFalse(Report.objects.filter(merged=False).exists())
+        first.refresh_from_db()
+        self.assertEqual(first.tasks, {"logo_video": 5, "vo_video": None})
+        self.assertEqual(first.notes, "morning\nevening")
+        self.assertEqual(list(first.dynamic_responses.values_list("value", flat=True)), ["FX3"])
+        self.assertEqual(TaskCount.objects.get(report=first).count, 5)
+        self.assertEqual(find_rollup_drift(), ([], [], []))
+
+        # Later submissions for the key are folded into the consolidated report
+        self.assertEqual(self.submit(logo_video=1).pk, first.pk)
+        self.assertEqual(Report.objects.get(pk=first.pk).tasks["logo_video"], 6)
+
+
+# ------------------------------
+# ✅ Report archiving (monthly partitions)
+# ------------------------------
+class ArchiveTests(ReportsTestCase):
+    def setUp(self):
+        super().setUp()
+        archives = tempfile.TemporaryDirectory()
+        self.addCleanup(archives.cleanup)
+        self.enterContext(override_settings(REPORTS_ARCHIVE_DIR=archives.name))
+        self.field = DynamicField.objects.create(team="video_editor", name="camera", label="Camera", field_type="text")
+        self.month = self.day.replace(day=1)
+
+    def snapshot(self):
+        return (
+            list(Report.objects.order_by("pk").values()),
+            list(DynamicFieldResponse.objects.order_by("pk").values()),
+            list(TaskCount.objects.order_by("pk").values()),
+            list(ReportDailyRollup.objects.order_by("pk").values()),
+        )
+
+    def test_archive_and_rehydrate_round_trip(self):
+        report = self.make_report(tasks={"logo_video": 2}, notes="a")
+        DynamicFieldResponse.objects.create(report=report, field=self.field, value="A7")
+        self.make_report(user=self.staff, shift="wfh", tasks={"client_visit_details": "Visited"})
+        kept = self.make_report(day=self.month + datetime.timedelta(days=40), tasks={"logo_video": 1})
+        before = self.snapshot()
+
+        archived = archive_month(self.day)
+        self.assertEqual((archived.month, archived.report_count, archived.is_archived), (self.month, 2, True))
+        self.assertEqual(list(Report.objects.values_list("pk", flat=True)), [kept.pk])
+        self.assertFalse(DynamicFieldResponse.objects.exists())
+        self.assertEqual(ReportDailyRollup.objects.count(), 1)
+        self.assertFalse(RollupTombstone.objects.exists())
+
+        self.assertEqual(rehydrate_month(self.day), 2)
+        self.assertEqual(self.snapshot(), before)
+        self.assertFalse(ArchivedMonth.objects.get().is_archived)
+        self.assertEqual(rehydrate_month(self.day), 0)
+
+    def test_reports_filed_after_archiving_are_merged_on_rehydrate(self):
+        self.make_report(tasks={"logo_video": 2}, merged=True)
+        archive_month(self.day)
+        self.make_report(tasks={"logo_video": 3}, merged=True)
+
+        archive_month(self.day)
+        self.assertEqual(ArchivedMonth.objects.get().report_count, 2)
+        rehydrate_month(self.day)
+
+        self.assertEqual(sorted(Report.objects.values_list("merged", flat=True)), [False, True])
+        self.assertEqual(ReportDailyRollup.objects.get().tasks, {"logo_video": 5})
+        self.assertEqual(find_rollup_drift(), ([], [], []))
+
+    def test_commands_and_views_rehydrate_on_demand(self):
+        self.make_report(tasks={"logo_video": 2})
+        call_command("maintain_report_partitions", "--archive-after", "1", stdout=StringIO())
+        self.assertEqual(ArchivedMonth.objects.get().month, self.month)
+        self.assertFalse(Report.objects.exists())
+
+        out = StringIO()
+        call_command("rehydrate_reports", "--list", stdout=out)
+        self.assertIn(f"{self.month:%Y-%m} reports=1", out.getvalue())
+
+        self.client.force_login(self.staff)
+        overview = reverse("admin_reports_overview")
+        response = self.client.get(overview, {"date": self.day.isoformat(), "include_archived": "1"})
+        self.assertEqual(response.context["reports"], [])
+        self.assertEqual([a.month for a in response.context["archived"]], [self.month])
+        self.assertTrue(ArchivedMonth.objects.get().rehydrated_at is None)
+
+        load = reverse("rehydrate_archived_reports")
+        self.assertEqual(self.client.get(load).status_code, 405)
+        # Open or too long ranges load nothing
+        self.client.post(load, {"start_date": self.day.isoformat()})
+        self.client.post(load, {"start_date": "2000-01-01", "end_date": self.day.isoformat()})
+        self.assertFalse(Report.objects.exists())
+
+        response = self.client.post(load, {"start_date": self.day.isoformat(), "end_date": self.day.isoformat()})
+        self.assertRedirects(response, f"{overview}?date={self.day.isoformat()}")
+        response = self.client.get(overview, {"date": self.day.isoformat()})
+        self.assertEqual(len(response.context["reports"]), 1)
+        self.assertEqual(response.context["archived"], [])
+
+        archive_month(self.day)
+        params = {"format": "csv", "start_date": self.month.isoformat(), "end_date": self.day.isoformat(), "include_archived": "1"}
+        self.assertEqual(self.client.get(reverse("export_reports_excel"), params).status_code, 400)
+        self.assertFalse(Report.objects.exists())
+        with self.assertRaises(ValueError):
+            rehydrate_range(None, self.day)
+
+    def test_partitioning_needs_postgres_and_custom_date_defaults_to_submission_date(self):
+        report = Report.objects.create(user=self.editor, shift="wfh", tasks={})
+        self.assertEqual(report.custom_date, report.date)
+        if connection.vendor != "postgresql":
+            with self.assertRaises(CommandError):
+                call_command("partition_reports", stdout=StringIO())
+
+
+# ------------------------------
+# ✅ Partitioning DDL (Postgres only)
+# ------------------------------
+@skipUnless(connection.vendor == "postgresql", "Partitioning needs Postgres; run with a postgres:// DATABASE_URL.")
+class PartitionTests(ReportsTestCase):
+    def setUp(self):
+        super().setUp()
+        archives = tempfile.TemporaryDirectory()
+        self.addCleanup(archives.cleanup)
+        self.enterContext(override_settings(REPORTS_ARCHIVE_DIR=archives.name))
+        self.month = self.day.replace(day=1)
+        field = DynamicField.objects.create(team="video_editor", name="camera", label="Camera", field_type="text")
+        self.first = self.make_report(tasks={"logo_video": 2}, notes="a")
+        DynamicFieldResponse.objects.create(report=self.first, field=field, value="A7")
+        self.make_report(day=self.day + datetime.timedelta(days=40), tasks={"logo_video": 1})
+        # The table is renamed in the test's transaction, which Postgres
+        # refuses while deferred foreign key checks are pending
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+    def test_conversion_keeps_rows_and_mirrors_writes_made_while_copying(self):
+        late = []
+
+        def write_between_chunks(seconds):
+            if not late:
+                late.append(self.make_report(user=self.staff, tasks={"logo_video": 4}))
+                Report.objects.filter(pk=self.first.pk).update(notes="edited")
+
+        with mock.patch("reports.partitions.time.sleep", side_effect=write_between_chunks):
+            convert_to_partitioned(chunk_size=1, months_ahead=1, pause=0.01, log=lambda message: None)
+        self.assertTrue(is_partitioned())
+        self.assertIn(self.month, partition_months())
+        self.assertEqual(Report.objects.count(), 3)
+        self.assertEqual(Report.objects.get(pk=self.first.pk).notes, "edited")
+        self.assertEqual(self.first.dynamic_responses.get().value, "A7")
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {UNPARTITIONED_TABLE}")
+            self.assertEqual(cursor.fetchone()[0], 3)
+            cursor.execute(f"SELECT COUNT(*) FROM {partition_name(self.month)}")
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+        # Ids carry on after the copied ones, and the aggregate views read the new table
+        self.assertGreater(self.make_report(day=self.day + datetime.timedelta(days=1)).pk, late[0].pk)
+        refresh_aggregates()
+        self.assertEqual(UserAggregate.objects.get(user=self.editor).report_count, 3)
+
+    def test_partitions_are_created_detached_and_restored(self):
+        convert_to_partitioned(months_ahead=1, log=lambda message: None)
+
+        # A month past the created partitions lands in the default one until it gets its own
+        future = add_months(max(partition_months()), 2)
+        self.make_report(day=future)
+        create_partition(future)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {partition_name(future)}")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        archive_month(self.day)
+        self.assertNotIn(self.month, partition_months())
+        self.assertEqual(rehydrate_month(self.day), 1)
+        self.assertIn(self.month, partition_months())
+        self.assertEqual(self.first.dynamic_responses.get().value, "A7")
+
+
+# ------------------------------
+# ✅ Bulk report import
+# ------------------------------
+class ImportTests(ReportsTestCase):
+    CSV = (
+        "username,date,shift,report_type,Logo Video,vo_video,Camera,notes\n"
+        "editor,2024-05-01,9:00 AM – 5:30 PM,,2,1,A7,first\n"
+        "editor,2024-05-01,9_5_30,regular,3,,,\n"
+        "ghost,2024-05-02,,,1,,,\n"
+        "editor,05/03/2024,,,1,,,\n"
+        "editor,2024-05-04,,,-1,,,\n"
+        "boss,2024-05-04,,,1,,,\n"
+        "\n"
+        "editor,2024-05-06,,leave,,,,sick\n"
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.camera = DynamicField.objects.create(team="video_editor", name="camera", label="Camera", field_type="text")
+
+    def run_import(self, content=CSV, name="reports.csv", **kwargs):
+        return import_reports(BytesIO(content.encode()), name, **kwargs)
+
+    def test_valid_rows_are_imported_and_bad_rows_reported(self):
+        result = self.run_import(chunk_size=2)
+
+        self.assertEqual((result.rows, result.created), (7, 3))
+        self.assertEqual([line for line, _ in result.errors], [4, 5, 6, 7])
+        self.assertIn("Unknown user 'ghost'", result.errors[0][1])
+        self.assertIn("not a task of the marketing team", result.errors[3][1])
+
+        reports = Report.objects.filter(user=self.editor).order_by("pk")
+        first = reports[0]
+        self.assertEqual(first.tasks["logo_video"], 2)
+        self.assertEqual(first.task_total, 3)
+        self.assertFalse(first.is_late_submission)
+        self.assertEqual(list(first.dynamic_responses.values_list("field_id", "value")), [(self.camera.pk, "A7")])
+        self.assertEqual(reports[2].report_type, "leave")
+
+        # Derived data is rebuilt for the imported users
+        rollup = ReportDailyRollup.objects.get(user=self.editor, custom_date=datetime.date(2024, 5, 1))
+        self.assertEqual((rollup.report_count, rollup.tasks["logo_video"]), (2, 5))
+        self.assertEqual(TaskCount.objects.filter(report__user=self.editor).count(), 3)
+        self.assertEqual(find_rollup_drift(), ([], [], []))
+        self.assertEqual(UserAggregate.objects.get(user=self.editor).report_count, 3)
+
+    def test_dry_run_writes_nothing(self):
+        result = self.run_import(dry_run=True)
+        self.assertEqual((result.rows, result.created, len(result.errors)), (7, 0, 4))
+        self.assertFalse(Report.objects.exists())
+
+    def test_xlsx_with_native_dates(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(["Username", "Date", "Logo Video"])
+        sheet.append(["editor", datetime.datetime(2024, 5, 1), 4])
+        buffer = BytesIO()
+        workbook.save(buffer)
+        buffer.seek(0)
+
+        result = import_reports(buffer, "reports.xlsx")
+        self.assertEqual((result.created, result.errors), (1, []))
+        self.assertEqual(Report.objects.get().custom_date, datetime.date(2024, 5, 1))
+
+    def test_unknown_columns_reject_the_file(self):
+        with self.assertRaisesMessage(ImportFormatError, "Unknown column(s): mystery"):
+            self.run_import("username,date,mystery\neditor,2024-05-01,1\n")
+        with self.assertRaises(ImportFormatError):
+            self.run_import(name="reports.txt")
+
+    def test_rows_for_existing_keys_are_rejected(self):
+        self.run_import()
+        # Uploading the same file again would double every count
+        result = self.run_import("username,date,Logo Video\neditor,2024-05-01,9\neditor,2024-05-02,1\neditor,2024-05-02,2\n")
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.errors, [(2, "A report for this user, date and shift already exists.")])
+        rollup = ReportDailyRollup.objects.get(user=self.editor, custom_date=datetime.date(2024, 5, 1))
+        self.assertEqual(rollup.tasks["logo_video"], 5)
+        self.assertEqual(ReportDailyRollup.objects.get(user=self.editor, custom_date=datetime.date(2024, 5, 2)).report_count, 2)
+
+    def test_upload_page_queues_a_background_import(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+        upload = SimpleUploadedFile("reports.csv", self.CSV.encode(), content_type="text/csv")
+        self.client.force_login(self.editor)
+        self.assertEqual(self.client.post(reverse("import_reports_upload"), {"file": upload}).status_code, 302)
+        self.assertFalse(ImportJob.objects.exists())
+
+        self.client.force_login(self.staff)
+        upload.seek(0)
+        response = self.client.post(reverse("import_reports_upload"), {"file": upload})
+        self.assertRedirects(response, reverse("import_reports_upload"))
+        self.assertFalse(Report.objects.exists())
+
+        call_command("run_import_worker", "--once", stdout=StringIO())
+        job = ImportJob.objects.get()
+        self.assertEqual((job.status, job.rows, job.created, job.rejected_count), ("done", 7, 3, 4))
+        self.assertEqual(job.user_ids, [self.editor.pk])
+        self.assertEqual(Report.objects.count(), 3)
+
+        response = self.client.get(reverse("import_reports_upload"))
+        self.assertContains(response, "Unknown user &#x27;ghost&#x27;")
+
+    @override_settings(REPORTS_IMPORT_JOB_TIMEOUT=60)
+    def test_stale_import_is_failed_and_its_users_rebuilt(self):
+        # A worker killed after committing a chunk, before the rebuild
+        self.make_report(tasks={"logo_video": 2})
+        ReportDailyRollup.objects.all().delete()
+        job = ImportJob.objects.create(
+            filename="reports.csv", status="running", user_ids=[self.editor.pk], created=1,
+            started_at=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+        )
+
+        self.assertEqual(recover_stale_imports(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(ReportDailyRollup.objects.get().report_count, 1)
+        self.assertEqual(find_rollup_drift(), ([], [], []))
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8") as fh:
+            fh.write(self.CSV)
+        out, err = StringIO(), StringIO()
+        call_command("import_reports", fh.name, stdout=out, stderr=err)
+        self.assertIn("Imported 3 of 7 rows", out.getvalue())
+        self.assertIn("Line 4: Unknown user 'ghost'", err.getvalue())
+
+    def test_bulk_rows_keep_nulls_apart_from_empty_strings(self):
+        # COPY reads a bare empty field as NULL and "" as an empty string
+        self.assertEqual(copy_csv([(1, None, "", 'say "hi"', True, 2.5)]), '1,,"","say ""hi""",t,2.5\n')
+
+        report = self.make_report()
+        RowInserter(Report).insert([{
+            "user_id": self.editor.pk, "custom_date": self.day, "date": self.day, "shift": "9_5_30",
+            "tasks": None, "notes": "", "created_at": report.created_at,
+        }])
+        copied = Report.objects.exclude(pk=report.pk).get()
+        self.assertEqual((copied.tasks, copied.notes), (None, ""))
+
+
+# ------------------------------
+# ✅ Cached notice feed
+# ------------------------------
+class NoticeFeedTests(ReportsTestCase):
+    def post_notice(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return AdminNotice.objects.create(title=title, content=f"{title} details", created_by=self.staff)
+
+    def test_pages_read_notices_without_queries(self):
+        for i in range(8):
+            self.post_notice(f"Notice {i}")
+        self.client.force_login(self.editor)
+        self.client.get(reverse("user_dashboard"))
+        self.client.get(reverse("submit_report"))
+
+        for name in ("user_dashboard", "submit_report"):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(name))
+            self.assertFalse([q for q in queries if "reports_adminnotice" in q["sql"]], name)
+
+        self.assertEqual([n.title for n in response.context["notices"]], [f"Notice {i}" for i in range(7, 2, -1)])
+        self.assertTrue(response.context["notices_cursor"])
+
+    def test_feed_follows_saves_and_deletes(self):
+        first = self.post_notice("First")
+        self.assertEqual([n.title for n in latest_notices()[0]], ["First"])
+
+        self.post_notice("Second")
+        self.assertEqual([n.title for n in latest_notices()[0]], ["Second", "First"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        notices, cursor = latest_notices()
+        self.assertEqual([n.title for n in notices], ["Second"])
+        self.assertIsNone(cursor)
+
+    def test_older_notices_page_by_cursor(self):
+        for i in range(NOTICE_FEED_SIZE + 5):
+            self.post_notice(f"Notice {i}")
+
+        newest, cursor = latest_notices()
+        self.assertEqual(len(newest), NOTICE_FEED_SIZE)
+
+        self.client.force_login(self.editor)
+        page = self.client.get(reverse("api_notices"), {"after": cursor, "limit": 3}).json()
+        self.assertEqual([n["title"] for n in page["notices"]], ["Notice 4", "Notice 3", "Notice 2"])
+        page = self.client.get(reverse("api_notices"), {"after": page["next"], "limit": 3}).json()
+        self.assertEqual([n["title"] for n in page["notices"]], ["Notice 1", "Notice 0"])
+        self.assertIsNone(page["next"])
+
+        self.assertEqual(self.client.get(reverse("api_notices"), {"after": "garbage"}).status_code, 400)
+
+    def test_limit_beyond_the_feed_reads_older_notices(self):
+        for i in range(NOTICE_FEED_SIZE + 5):
+            self.post_notice(f"Notice {i}")
+        self.client.force_login(self.editor)
+
+        page = self.client.get(reverse("api_notices"), {"limit": NOTICE_FEED_SIZE + 2}).json()
+        self.assertEqual([n["title"] for n in page["notices"]], [f"Notice {i}" for i in range(24, 2, -1)])
+        page = self.client.get(reverse("api_notices"), {"after": page["next"], "limit": 100}).json()
+        self.assertEqual([n["title"] for n in page["notices"]], ["Notice 2", "Notice 1", "Notice 0"])
+        self.assertIsNone(page["next"])
+
+        page = self.client.get(reverse("api_notices"), {"limit": 1000}).json()
+        self.assertEqual(len(page["notices"]), NOTICE_FEED_SIZE + 5)
+
+
+# ------------------------------
+# ✅ Report aggregates
+# ------------------------------
+class ReportAggregateTests(ReportsTestCase):
+    def test_refresh_recomputes_every_level(self):
+        writer = User.objects.create_user("writer", team="content_writer")
+        self.make_report(tasks={"logo_video": 2})
+        self.make_report(tasks={"logo_video": 3, "vo_video": 1})
+        self.make_report(day=self.day - datetime.timedelta(days=1), tasks={"vo_video": 4})
+        self.make_report(user=writer, tasks={"news": 5})
+
+        refresh_aggregates()
+
+        self.assertEqual(
+            list(TeamAggregate.objects.order_by("team").values_list("team", "report_count", "task_total")),
+            [("content_writer", 1, 5), ("video_editor", 3, 10)],
+        )
+        self.assertEqual(
+            list(UserAggregate.objects.order_by("user__username").values_list("user__username", "report_count", "task_total")),
+            [("editor", 3, 10), ("writer", 1, 5)],
+        )
+        self.assertEqual(
+            list(DailyAggregate.objects.filter(user=self.editor).order_by("day").values_list("day", "report_count", "task_total")),
+            [(self.day - datetime.timedelta(days=1), 1, 4), (self.day, 2, 6)],
+        )
+
+        Report.objects.filter(user=writer).delete()
+        refresh_aggregates()
+        self.assertFalse(TeamAggregate.objects.filter(team="content_writer").exists())
+
+    def test_overview_date_filter_reads_daily_totals(self):
+        self.make_report()
+        self.make_report(day=self.day - datetime.timedelta(days=1))
+        refresh_aggregates()
+        self.client.force_login(self.staff)
+
+        response = self.client.get(reverse("api_overview"), {"date": self.day.isoformat(), "team": "video_editor"})
+        self.assertEqual(response.json(), {
+            "by_user": [{"username": "editor", "total": 1}],
+            "by_team": [{"team": "video_editor", "total": 1}],
+        })
+
+    def test_watcher_refreshes_when_it_starts(self):
+        # Reports written while no watcher ran, e.g. during a deploy
+        self.make_report()
+        stop = mock.patch("reports.management.commands.refresh_report_aggregates.time.sleep", side_effect=KeyboardInterrupt)
+        with stop, self.assertRaises(KeyboardInterrupt):
+            call_command("refresh_report_aggregates", "--watch", stdout=StringIO())
+        self.assertEqual(UserAggregate.objects.get(user=self.editor).report_count, 1)
+
+
+# ------------------------------
+# ✅ JSON API with conditional GET
+# ------------------------------
+class ApiTests(ReportsTestCase):
+    def get(self, name, *args, etag=None, **params):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(reverse(name, args=args), params, **headers)
+
+    def test_overview_totals_revalidate_until_aggregates_are_refreshed(self):
+        self.make_report(tasks={"logo_video": 2})
+        self.make_report(tasks={"logo_video": 3})
+        refresh_aggregates()
+        self.client.force_login(self.staff)
+
+        response = self.get("api_overview")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["by_user"], [{"username": "editor", "total": 2}])
+        self.assertEqual(response.json()["by_team"], [{"team": "video_editor", "total": 2}])
+        self.assertIn("no-cache", response["Cache-Control"])
+        etag = response["ETag"]
+
+        # A matching ETag is answered without aggregating anything
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get("api_overview", etag=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in queries if "reports_reportdailyrollup" in q["sql"]])
+
+        # Filters are part of the ETag
+        self.assertEqual(self.get("api_overview", etag=etag, team="marketing").status_code, 200)
+
+        # Writes show up once the aggregates are refreshed
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_report(day=self.day + datetime.timedelta(days=1))
+        self.assertEqual(self.get("api_overview", etag=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("refresh_report_aggregates", stdout=StringIO())
+        response = self.get("api_overview", etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["by_user"], [{"username": "editor", "total": 3}])
+
+    def test_user_summary_is_scoped_to_the_user(self):
+        self.make_report(tasks={"logo_video": 2})
+        self.client.force_login(self.editor)
+
+        response = self.get("api_user_summary", "editor")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertEqual(self.get("api_user_summary", "editor", etag=etag).status_code, 304)
+
+        # Another user's write leaves this user's ETag alone
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_report(user=self.staff)
+        self.assertEqual(self.get("api_user_summary", "editor", etag=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_report(day=self.day + datetime.timedelta(days=1), tasks={"logo_video": 1})
+        self.assertEqual(self.get("api_user_summary", "editor", etag=etag).status_code, 200)
+
+    def test_archiving_and_rehydrating_invalidate_user_etags(self):
+        archives = tempfile.TemporaryDirectory()
+        self.addCleanup(archives.cleanup)
+        self.enterContext(override_settings(REPORTS_ARCHIVE_DIR=archives.name))
+        self.make_report(tasks={"logo_video": 2})
+        self.client.force_login(self.editor)
+        summary = self.get("api_user_summary", "editor")
+        preview = self.get("api_report_preview", self.day.isoformat())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_month(self.day)
+        response = self.get("api_user_summary", "editor", etag=summary["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["task_totals"], {})
+        self.assertEqual(self.get("api_report_preview", self.day.isoformat(), etag=preview["ETag"]).status_code, 404)
+
+        etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            rehydrate_month(self.day)
+        self.assertEqual(self.get("api_user_summary", "editor", etag=etag).status_code, 200)
+
+    def test_report_preview(self):
+        field = DynamicField.objects.create(team="video_editor", name="channel", label="Channel", field_type="text")
+        report = self.make_report(tasks={"logo_video": 2}, notes="done")
+        DynamicFieldResponse.objects.create(report=report, field=field, value="Main")
+        self.client.force_login(self.editor)
+
+        response = self.get("api_report_preview", self.day.isoformat())
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["static_fields"], {"Logo Video": 2})
+        self.assertEqual(body["dynamic_fields"], {"Channel": "Main"})
+        self.assertEqual(body["notes"], "done")
+
+        self.assertEqual(self.get("api_report_preview", "2020-01-01").status_code, 404)
+
+    def test_notices_are_invalidated_on_change(self):
+        self.client.force_login(self.editor)
+        etag = self.get("api_notices")["ETag"]
+        self.assertEqual(self.get("api_notices", etag=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AdminNotice.objects.create(title="Holiday", content="Office closed", created_by=self.staff)
+        response = self.get("api_notices", etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([n["title"] for n in response.json()["notices"]], ["Holiday"])
+
+    def test_permissions(self):
+        self.assertEqual(self.get("api_notices").status_code, 401)
+        self.assertEqual(self.get("api_overview").status_code, 401)
+
+        self.client.force_login(self.editor)
+        self.assertEqual(self.get("api_overview").status_code, 403)
+        self.assertEqual(self.get("api_user_summary", "boss").status_code, 403)
+        self.assertEqual(self.get("api_report_preview", self.day.isoformat(), user="boss").status_code, 403)
+
+        self.client.force_login(self.staff)
+        self.assertEqual(self.get("api_user_summary", "editor").status_code, 200)
+        self.assertEqual(self.get("api_user_summary", "nobody").status_code, 404)
+
+
+# ------------------------------
+# ✅ Query plans for hot predicates
+# ------------------------------
+class QueryPlanTests(ReportsTestCase):
+    """
+    Fails when a hot query falls back to a full scan of a large table.
+    On Postgres sequential scans are disabled for the check, so the planner
+    only picks one when no usable index exists.
+    """
+
+    def setUp(self):
+        super().setUp()
+        users = [
+            User.objects.create_user(f"member{i}", team=team)
+            for i, (team, _) in enumerate(User.TEAM_CHOICES)
+        ]
+        shifts = [key for key, _ in Report.SHIFT_CHOICES]
+        Report.objects.bulk_create([
+            Report(
+                user=user,
+                custom_date=self.day - datetime.timedelta(days=offset),
+                shift=shifts[offset % len(shifts)],
+                tasks={"news": offset % 5},
+                task_total=offset % 5,
+            )
+            for user in users
+            for offset in range(120)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.user = users[0]
+
+    def plan(self, queryset):
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            return queryset.explain()
+
+    def assert_indexed(self, queryset, table):
+        plan = self.plan(queryset)
+        if connection.vendor == "postgresql":
+            self.assertNotIn(f"Seq Scan on {table}", plan)
+        else:
+            full_scans = [line for line in plan.splitlines() if f"SCAN {table}" in line and "USING" not in line]
+            self.assertEqual(full_scans, [], plan)
+
+    def test_hot_report_predicates_use_indexes(self):
+        reports = Report.objects.all()
+        self.assert_indexed(reports.filter(user=self.user, custom_date=self.day), "reports_report")
+        self.assert_indexed(reports.filter(custom_date__range=[self.day - datetime.timedelta(days=7), self.day]), "reports_report")
+        self.assert_indexed(reports.filter(custom_date=self.day, shift="wfh"), "reports_report")
+        self.assert_indexed(reports.filter(effective_date=self.day), "reports_report")
+        self.assert_indexed(reports.filter(effective_date__lt=F("date")).order_by("effective_date")[:20], "reports_report")
+        self.assert_indexed(reports.order_by("-task_total")[:20], "reports_report")
+
+    def test_overview_page_uses_rollup_index(self):
+        self.assert_indexed(
+            ReportDailyRollup.objects.filter(custom_date__lt=self.day).order_by("-custom_date", "-user_id", "-shift")[:50],
+            "reports_reportdailyrollup",
+        )
+
+
+# ------------------------------
+# ✅ Pooled Postgres connections
+# ------------------------------
+class PooledBackendTests(ReportsTestCase):
+    def wrapper(self, alias="pooled", **settings_dict):
+        settings_dict = {
+            "ENGINE": "reports.pooled_postgresql", "NAME": "reports", "USER": "", "PASSWORD": "", "HOST": "", "PORT": "",
+            "OPTIONS": {"pool": {"min_size": 1, "max_size": 4}}, "CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": True,
+            "AUTOCOMMIT": True, "ATOMIC_REQUESTS": False, "TIME_ZONE": None, "TEST": {},
+            **settings_dict,
+        }
+        return load_backend("reports.pooled_postgresql").DatabaseWrapper(settings_dict, alias)
+
+    def test_pool_settings(self):
+        params = self.wrapper().get_connection_params()
+        self.assertEqual(params["dbname"], "reports")
+        self.assertNotIn("pool", params)
+
+        with self.assertRaises(ImproperlyConfigured):
+            self.wrapper(CONN_MAX_AGE=600)
+        # Without pool options, and for Django's own maintenance connections, it connects directly
+        self.assertIsNone(self.wrapper(OPTIONS={}).pool)
+        self.assertIsNone(self.wrapper(alias=NO_DB_ALIAS).pool)
+
+    def test_load_test_needs_postgres(self):
+        with self.assertRaisesMessage(CommandError, "needs Postgres"):
+            call_command("run_pool_load_test", user="boss", stdout=StringIO())
+
+
+# ------------------------------
+# ✅ Worker import budget
+# ------------------------------
+class ImportBudgetTests(SimpleTestCase):
+    """
+    Fails when what a worker imports before its first request grows. The
+    module count is stable from run to run; the time budget only catches
+    gross regressions on a slow machine. Raise them deliberately when a
+    dependency has to be loaded up front.
+    """
+    HEAVY_MODULES = {"numpy", "openpyxl", "pandas"}
+    MAX_MODULES = 720
+    MAX_IMPORT_MS = 1500
+
+    def test_app_import_stays_within_budget(self):
+        modules, total = import_times()
+
+        self.assertEqual(self.HEAVY_MODULES & modules.keys(), set())
+        self.assertLessEqual(len(modules), self.MAX_MODULES)
+        self.assertLess(total, self.MAX_IMPORT_MS)
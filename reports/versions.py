@@ -0,0 +1,35 @@
+"""
+Version tokens for conditional responses and shared-cache entries.
+
+Each namespace has a random token in the shared cache under
+``reports:<namespace>:version``. Writers replace the token when the data
+behind the namespace changes, so a reader can tell whether anything
+changed with one cache lookup instead of re-running its queries. A token
+lost to cache eviction is simply re-created, which only costs a miss.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = "reports:{namespace}:version"
+
+
+def get_version(namespace):
+    key = VERSION_KEY.format(namespace=namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*namespaces):
+    """
+    Replace the tokens once the current transaction commits, so a reader
+    can never pair a new token with data that is not yet visible.
+    """
+    def bump():
+        cache.set_many({VERSION_KEY.format(namespace=ns): uuid.uuid4().hex for ns in namespaces}, None)
+
+    transaction.on_commit(bump)
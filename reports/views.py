@@ -1,25 +1,75 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Count
-from django.http import HttpResponse
-from django.core.exceptions import ValidationError
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.contrib import messages
-from collections import defaultdict
-import pandas as pd
-import json
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_POST
 
 from django.contrib.auth.forms import SetPasswordForm
+from .changes import decode_since
+from .decorators import async_login_required, async_staff_member_required
 from .forms import ReportForm
-from .models import Report, User, AdminNotice, DynamicField, DynamicFieldResponse
+from .models import Report, User, ReportDailyRollup, ExportJob, ImportJob, SubmissionMonth
+from .schema import field_labels
+from .exports import EXPORT_FORMATS, XLSX_CONTENT_TYPE, asgi_streaming, export_response, filtered_rollups
+from .export_jobs import clean_filters, request_export
+from .import_jobs import queue_import
+from .metrics import render_metrics
+from .notices import latest_notices
+from .pagination import keyset_page
+from .partitions import archived_months, rehydrate_range
+from .replicas import read_from_primary, use_replica
 
 
 import datetime
 
+OVERVIEW_PAGE_SIZE = 50
+DASHBOARD_NOTICES = 3
+SUBMIT_NOTICES = 5
+
+
+def _format_tasks(tasks):
+    return {k.replace("_", " ").title(): v for k, v in tasks.items()}
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+def _archived_for_date(request):
+    """
+    The archived month holding the overview's ``date`` filter, if any, so
+    the page can offer to load it back.
+    """
+    try:
+        day = parse_date(request.GET.get("date") or "")
+    except ValueError:
+        day = None
+    return list(archived_months(day, day)) if day else []
+
 
 # ----------------------------------------------------
 # 🏠 USER DASHBOARD (Main Landing Page)
 # ----------------------------------------------------
+def _render_dashboard(request, today, has_submitted_today, total_reports, recent_notices):
+    context = {
+        "has_submitted_today": has_submitted_today,
+        "total_reports": total_reports,
+        "recent_notices": recent_notices,
+        "today": today,
+    }
+    return render(request, "reports/user_dashboard.html", context)
+
+
 @login_required
 def user_dashboard(request):
     """
@@ -34,16 +84,27 @@ def user_dashboard(request):
     # Fetch user's report history count
     total_reports = Report.objects.filter(user=user).count()
     
-    # Recent Notices
-    recent_notices = AdminNotice.objects.all().order_by("-created_at")[:3]
+    # Recent Notices (cached feed, no query in the steady state)
+    recent_notices, _ = latest_notices(DASHBOARD_NOTICES)
     
-    context = {
-        "has_submitted_today": has_submitted_today,
-        "total_reports": total_reports,
-        "recent_notices": recent_notices,
-        "today": today,
-    }
-    return render(request, "reports/user_dashboard.html", context)
+    return _render_dashboard(request, today, has_submitted_today, total_reports, recent_notices)
+
+
+@async_login_required
+async def user_dashboard_async(request):
+    """
+    user_dashboard for SERVER_MODE=asgi (see media_reporting/urls.py).
+    """
+    user = request.user
+    today = datetime.date.today()
+
+    # Today's status, history count and recent notices are independent
+    has_submitted_today, total_reports, (recent_notices, _) = await asyncio.gather(
+        Report.objects.filter(user=user, custom_date=today).aexists(),
+        Report.objects.filter(user=user).acount(),
+        sync_to_async(latest_notices)(DASHBOARD_NOTICES),
+    )
+    return _render_dashboard(request, today, has_submitted_today, total_reports, recent_notices)
 
 
 # ----------------------------------------------------
@@ -58,19 +119,8 @@ def submit_report(request):
 
         if form.is_valid():
             try:
-                report = form.save()
-
-                # Save dynamic fields for user’s team
-                dynamic_fields = DynamicField.objects.filter(team=user.team)
-                for field in dynamic_fields:
-                    value = request.POST.get(field.name)
-                    if value:
-                        DynamicFieldResponse.objects.create(
-                            report=report,
-                            field=field,
-                            value=value,
-                        )
-
+                # The report and its dynamic field answers, in one transaction
+                form.save()
                 messages.success(request, "Report submitted successfully!")
                 return redirect("submit_report")
 
@@ -83,27 +133,72 @@ def submit_report(request):
     else:
         form = ReportForm(user=user)
 
-    # Fetch dynamic fields for template
-    dynamic_fields = DynamicField.objects.filter(team=user.team)
-
-    # Calendar highlight
-    reports = Report.objects.filter(user=user)
-    submission_data = [
-        {"date": r.custom_date.strftime("%Y-%m-%d"), "type": r.report_type}
-        for r in reports if r.custom_date
-    ]
-
+    # The calendar fetches its months from submission_calendar as it is navigated;
+    # older notices are fetched from the notices API on demand
+    notices, notices_cursor = latest_notices(SUBMIT_NOTICES)
     context = {
         "form": form,
-        "dynamic_fields": dynamic_fields,
-        "notices": AdminNotice.objects.all().order_by("-created_at"),
-        "submission_data": json.dumps(submission_data),
+        "dynamic_fields": form.dynamic_fields,
+        "notices": notices,
+        "notices_cursor": notices_cursor,
         "weekly_off": user.weekly_off,
     }
 
     return render(request, "reports/submit_report.html", context)
 
 
+# ----------------------------------------------------
+# 📅 SUBMISSION CALENDAR (one month per request)
+# ----------------------------------------------------
+def _calendar_month(request, year, month):
+    """
+    The SubmissionMonth values for the requested month. Staff may pass
+    ``?user=<username>``; everyone else only sees their own calendar.
+    """
+    username = request.GET.get("user")
+    if username and username != request.user.username:
+        if not request.user.is_staff:
+            raise PermissionDenied
+        user = get_object_or_404(User, username=username)
+    else:
+        user = request.user
+
+    try:
+        first = datetime.date(year, month, 1)
+    except ValueError:
+        raise Http404("Invalid month.")
+
+    masks = (
+        SubmissionMonth.objects
+        .filter(user=user, month=first)
+        .values_list("submitted_days", "leave_days")
+        .first()
+    )
+    return user, first, masks or (0, 0)
+
+
+def _calendar_etag(request, year, month):
+    user, first, (submitted, leave) = _calendar_month(request, year, month)
+    return f"{user.pk}-{first:%Y%m}-{submitted}-{leave}"
+
+
+@login_required
+@condition(etag_func=_calendar_etag)
+def submission_calendar(request, year, month):
+    """
+    Submitted and leave days of one month as bitmasks (bit n-1 = day n).
+    Clients revalidate with the ETag, so unchanged months cost a 304.
+    """
+    user, first, (submitted, leave) = _calendar_month(request, year, month)
+    response = JsonResponse({
+        "month": f"{first:%Y-%m}",
+        "submitted": submitted,
+        "leave": leave,
+    })
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 # ----------------------------------------------------
 # 👁 USER REPORT PREVIEW (Fix applied)
 # ----------------------------------------------------
@@ -124,17 +219,8 @@ def user_report_preview(request, date):
         messages.error(request, f"No report found for {date}.")
         return redirect("submit_report")
 
-    # STATIC FIELDS (from Report.tasks JSON)
-    static_fields = {
-        k.replace("_", " ").title(): v
-        for k, v in (report.tasks or {}).items()
-    }
-
-    # DYNAMIC FIELDS (from DynamicFieldResponse)
-    dynamic_fields = {
-        resp.field.label: resp.value
-        for resp in report.dynamic_responses.all()
-    }
+    # Static fields from Report.tasks, dynamic ones labelled from the schema registry
+    static_fields, dynamic_fields = report.preview_fields(field_labels())
 
     return render(
         request,
@@ -151,229 +237,349 @@ def user_report_preview(request, date):
 # ----------------------------------------------------
 # 🧭 ADMIN REPORT OVERVIEW
 # ----------------------------------------------------
-@staff_member_required
-def admin_reports_overview(request):
+def _overview_filters(request):
     team_filter = request.GET.get("team")
     user_filter = request.GET.get("user")
     date_filter = request.GET.get("date")
 
-    reports = Report.objects.select_related("user").prefetch_related("dynamic_responses")
+    rollups = ReportDailyRollup.objects.all()
 
     # Filters
     if team_filter:
-        reports = reports.filter(user__team=team_filter)
+        rollups = rollups.filter(user__team=team_filter)
     if user_filter:
-        reports = reports.filter(user__username=user_filter)
+        rollups = rollups.filter(user__username=user_filter)
     if date_filter:
-        reports = reports.filter(custom_date=date_filter)
-
-    combined = {}
-
-    # Combine by (user, date, shift)
-    for r in reports:
-        key = (r.user.id, r.custom_date, r.shift)
-
-        if key not in combined:
-            combined[key] = {
-                "user": r.user,
-                "team": r.user.team,
-                "shift": r.get_shift_display(),
-                "custom_date": r.custom_date,
-                "tasks": defaultdict(int),
-                "notes": [],
-                "created_at": r.created_at,
-                "is_late_submission": r.is_late_submission,
-                "report_type": r.report_type,
-            }
-
-        # Static fields
-        for k, v in (r.tasks or {}).items():
-            try:
-                combined[key]["tasks"][k] += int(v)
-            except:
-                combined[key]["tasks"][k] = v
-
-        # Dynamic fields
-        for resp in r.dynamic_responses.all():
-            combined[key]["tasks"][resp.field.label] = resp.value
-
-        if r.notes:
-            combined[key]["notes"].append(r.notes)
+        rollups = rollups.filter(custom_date=date_filter)
 
-    # Format for frontend
-    for key in combined:
-        formatted = {}
-        for k, v in combined[key]["tasks"].items():
-            formatted[k.replace("_", " ").title()] = v
-        combined[key]["tasks"] = formatted
+    return rollups
 
-    reports_by_user = list(reports.values("user__username").annotate(total=Count("id")))
 
+def _overview_rows(rollups, cursor=None):
+    """
+    One keyset page of overview rows, plus the cursor for the next page.
+    """
+    page, next_cursor = keyset_page(rollups.select_related("user"), cursor, OVERVIEW_PAGE_SIZE)
+    labels = field_labels()
+
+    # Rows are already combined by (user, date, shift) at write time
+    rows = []
+    for r in page:
+        rows.append({
+            "user": r.user,
+            "team": r.user.team,
+            "shift": r.get_shift_display(),
+            "custom_date": r.custom_date,
+            "tasks": _format_tasks(r.combined_tasks(labels)),
+            "notes": r.notes,
+            "created_at": r.created_at,
+            "is_late_submission": r.is_late_submission,
+            "report_type": r.report_type,
+        })
+    return rows, next_cursor
+
+
+def _render_overview(request, rows, next_cursor, teams, users, export_jobs, archived):
+    # Chart and team totals are fetched from the JSON API by the page
     return render(
         request,
         "reports/admin_overview.html",
         {
-            "reports": list(combined.values()),
-            "reports_by_team": reports.values("user__team").annotate(total=Count("id")),
-            "reports_by_user": reports_by_user,
-            "chart_labels": json.dumps([r["user__username"] for r in reports_by_user]),
-            "chart_data": json.dumps([r["total"] for r in reports_by_user]),
-            "teams": User.objects.values_list("team", flat=True).distinct(),
-            "users": User.objects.all(),
-            "selected_team": team_filter,
-            "selected_user": user_filter,
+            "reports": rows,
+            "next_cursor": next_cursor,
+            "teams": teams,
+            "users": users,
+            "selected_team": request.GET.get("team"),
+            "selected_user": request.GET.get("user"),
+            "export_jobs": export_jobs,
+            "archived": archived,
         },
     )
 
 
+@staff_member_required
+@use_replica
+def admin_reports_overview(request):
+    rollups = _overview_filters(request)
+    rows, next_cursor = _overview_rows(rollups)
+
+    return _render_overview(
+        request, rows, next_cursor,
+        teams=User.objects.values_list("team", flat=True).distinct(),
+        users=User.objects.all(),
+        export_jobs=ExportJob.objects.filter(requested_by=request.user)[:5],
+        archived=_archived_for_date(request),
+    )
+
+
+@async_staff_member_required
+@use_replica
+async def admin_reports_overview_async(request):
+    """
+    admin_reports_overview for SERVER_MODE=asgi: the first page of rows, the
+    filter dropdowns and the export list are fetched together.
+    """
+    (rows, next_cursor), teams, users, export_jobs, archived = await asyncio.gather(
+        sync_to_async(_overview_rows)(_overview_filters(request)),
+        _alist(User.objects.values_list("team", flat=True).distinct()),
+        _alist(User.objects.all()),
+        _alist(ExportJob.objects.filter(requested_by=request.user)[:5]),
+        sync_to_async(_archived_for_date)(request),
+    )
+    return _render_overview(request, rows, next_cursor, teams, users, export_jobs, archived)
+
+
+@staff_member_required
+@use_replica
+def admin_reports_overview_rows(request):
+    """
+    HTML fragment with the next page of overview rows (infinite scroll).
+    The cursor for the following page is returned in X-Next-Cursor.
+    """
+    try:
+        rows, next_cursor = _overview_rows(_overview_filters(request), request.GET.get("after"))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid cursor.")
+
+    response = render(request, "reports/partials/overview_rows.html", {"reports": rows})
+    response["X-Next-Cursor"] = next_cursor or ""
+    return response
+
+
 # ----------------------------------------------------
-# 📦 EXPORT TO EXCEL
+# 📦 EXPORT (Excel, CSV, JSON Lines, Parquet)
 # ----------------------------------------------------
 @staff_member_required
+@use_replica
 def export_reports_excel(request):
-    start_date = request.GET.get("start_date")
-    end_date = request.GET.get("end_date")
-    team_filter = request.GET.get("team")
-    user_filter = request.GET.get("user")
+    """
+    Filtered export in ``?format=`` xlsx (default), csv, jsonl or parquet.
+    CSV and JSON Lines are streamed while rows are read from the rollups.
+    With ``?since=`` (empty for a first sync) only the rows changed since
+    that token are exported; X-Next-Since holds the token for the next one.
+    Archived months are not exported; load them back first with
+    rehydrate_archived_reports. A workbook cannot be sent before it is
+    complete, so xlsx exports of more than REPORTS_XLSX_DOWNLOAD_MAX_ROWS
+    rows are refused with a page offering a background export job instead.
+    """
+    export_format = request.GET.get("format") or "xlsx"
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f"Unknown format; use one of: {', '.join(EXPORT_FORMATS)}.")
+
+    since = None
+    if "since" in request.GET:
+        try:
+            since = decode_since(request.GET["since"])
+        except ValueError:
+            return HttpResponseBadRequest("Invalid since token; pass the X-Next-Since of the previous export.")
+        # The watermark is read from the primary; rows the replica has not
+        # replayed yet would fall below it and never be sent
+        read_from_primary()
+
+    if "include_archived" in request.GET:
+        # Exports only read; loading months back is a POST of its own
+        return HttpResponseBadRequest(
+            "include_archived is no longer supported; load the archived months back first "
+            f"(POST start_date and end_date to {reverse('rehydrate_archived_reports')})."
+        )
+
+    if export_format == "xlsx" and since is None:
+        rows = filtered_rollups(request.GET).count()
+        if rows > settings.REPORTS_XLSX_DOWNLOAD_MAX_ROWS:
+            # Queuing the job is a write, so the page only offers it as a POST
+            csv_params = request.GET.copy()
+            csv_params["format"] = "csv"
+            return render(
+                request,
+                "reports/export_too_large.html",
+                {
+                    "rows": rows,
+                    "max_rows": settings.REPORTS_XLSX_DOWNLOAD_MAX_ROWS,
+                    "filters": clean_filters(request.GET),
+                    "csv_url": f"{reverse('export_reports_excel')}?{csv_params.urlencode()}",
+                },
+                status=400,
+            )
+    return export_response(request.GET, export_format, since=since)
 
-    reports = Report.objects.select_related("user").prefetch_related("dynamic_responses")
 
-    # Filters
-    if start_date and end_date:
-        reports = reports.filter(custom_date__range=[start_date, end_date])
-    if team_filter:
-        reports = reports.filter(user__team=team_filter)
-    if user_filter:
-        reports = reports.filter(user__username=user_filter)
+# ----------------------------------------------------
+# 🗄 ARCHIVED MONTHS
+# ----------------------------------------------------
+@staff_member_required
+@require_POST
+def rehydrate_archived_reports(request):
+    """
+    Load the archived months between ``start_date`` and ``end_date`` back
+    into the database, at most REPORTS_REHYDRATE_MAX_MONTHS of them, and
+    return to the overview.
+    """
+    try:
+        start = parse_date(request.POST.get("start_date") or "")
+        end = parse_date(request.POST.get("end_date") or "")
+    except ValueError:
+        start = end = None
+    if start is None or end is None or end < start:
+        messages.error(request, "Choose a valid date range to load archived reports for.")
+        return redirect("admin_reports_overview")
+
+    months = (end.year - start.year) * 12 + end.month - start.month + 1
+    if months > settings.REPORTS_REHYDRATE_MAX_MONTHS:
+        messages.error(
+            request,
+            f"Archived reports can be loaded for at most {settings.REPORTS_REHYDRATE_MAX_MONTHS} months at a time.",
+        )
+        return redirect("admin_reports_overview")
+
+    loaded = rehydrate_range(start, end)
+    messages.success(request, f"Loaded {loaded} archived reports back.")
+    if start == end:
+        return redirect(f"{reverse('admin_reports_overview')}?date={start.isoformat()}")
+    return redirect("admin_reports_overview")
 
-    combined = {}
 
-    for r in reports:
-        key = (r.user.id, r.custom_date, r.shift)
+# ----------------------------------------------------
+# ⏳ BACKGROUND EXPORT JOBS
+# ----------------------------------------------------
+@staff_member_required
+@require_POST
+def export_job_create(request):
+    job, reused = request_export(request.user, request.POST)
+    if reused and job.status == "done":
+        messages.success(request, "This export is already up to date and ready to download.")
+    elif reused:
+        messages.info(request, "An identical export is already being prepared.")
+    else:
+        messages.success(request, "Export queued. It will appear below when ready.")
+    return redirect("admin_reports_overview")
 
-        if key not in combined:
-            combined[key] = {
-                "username": r.user.username,
-                "team": r.user.team,
-                "custom_date": r.custom_date,
-                "shift": r.get_shift_display(),
-                "tasks": defaultdict(int),
-                "notes": [],
-            }
 
-        for k, v in (r.tasks or {}).items():
-            try:
-                combined[key]["tasks"][k] += int(v)
-            except:
-                combined[key]["tasks"][k] = v
-
-        for resp in r.dynamic_responses.all():
-            combined[key]["tasks"][resp.field.label] = resp.value
-
-        if r.notes:
-            combined[key]["notes"].append(r.notes)
-
-    # Convert to dataframe
-    export_data = []
-    for rep in combined.values():
-        row = {
-            "username": rep["username"],
-            "team": rep["team"],
-            "custom_date": rep["custom_date"],
-            "shift": rep["shift"],
-            "notes": " | ".join(rep["notes"]),
-        }
-        row.update(rep["tasks"])
-        export_data.append(row)
+@staff_member_required
+def export_job_status(request, job_id):
+    job = get_object_or_404(ExportJob, pk=job_id)
+    return JsonResponse({
+        "id": job.pk,
+        "status": job.status,
+        "rows_total": job.rows_total,
+        "rows_written": job.rows_written,
+        "progress": job.progress,
+        "error": job.error,
+        "download_url": reverse("export_job_download", args=[job.pk]) if job.status == "done" else None,
+    })
 
-    df = pd.DataFrame(export_data)
 
-    response = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+@staff_member_required
+def export_job_download(request, job_id):
+    job = get_object_or_404(ExportJob, pk=job_id, status="done")
+    if not job.file:
+        raise Http404("Export file is missing.")
+    return asgi_streaming(
+        FileResponse(job.file.open("rb"), as_attachment=True, filename="reports.xlsx", content_type=XLSX_CONTENT_TYPE)
     )
-    response["Content-Disposition"] = 'attachment; filename="reports.xlsx"'
-    df.to_excel(response, index=False)
-    return response
+
+
+# ----------------------------------------------------
+# 📈 PROMETHEUS METRICS
+# ----------------------------------------------------
+def metrics(request):
+    """
+    Request and export metrics in Prometheus text format. Open to staff
+    sessions, or to a scraper sending ``Authorization: Bearer <METRICS_TOKEN>``.
+    """
+    token = settings.METRICS_TOKEN
+    sent = request.headers.get("Authorization", "")
+    if not (token and constant_time_compare(sent, f"Bearer {token}")):
+        if not (request.user.is_active and request.user.is_staff):
+            return HttpResponseForbidden("Staff only.")
+
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
 
 
 # ----------------------------------------------------
 # 👤 ADMIN: USER DETAIL PAGE
 # ----------------------------------------------------
+def _render_user_detail(request, user, rows, next_cursor, total_submissions):
+    # Chart totals are fetched from the JSON API by the page
+    context = {
+        "target_user": user,
+        "reports": rows,
+        "next_cursor": next_cursor,
+        "total_submissions": total_submissions,
+        "weekly_off": user.weekly_off,
+    }
+
+    return render(request, "reports/user_detail.html", context)
+
+
 @staff_member_required
+@use_replica
 def user_report_detail(request, username):
     user = get_object_or_404(User, username=username)
-    reports = (
-        Report.objects.filter(user=user)
-        .prefetch_related("dynamic_responses")
-        .order_by("custom_date")
-    )
+    rollups = ReportDailyRollup.objects.filter(user=user)
 
-    combined = {}
-    task_totals = defaultdict(int)
-    daily_summary = defaultdict(int)
-    monthly_summary = defaultdict(int)
-    yearly_summary = defaultdict(int)
-
-    for r in reports:
-        date_key = r.custom_date
-        key = (date_key, r.shift)
-
-        if key not in combined:
-            combined[key] = {
-                "custom_date": date_key,
-                "shift": r.get_shift_display(),
-                "tasks": defaultdict(int),
-                "notes": [],
-                "is_late_submission": r.is_late_submission,
-                "report_type": r.report_type,
-            }
-
-        # Static fields
-        for k, v in (r.tasks or {}).items():
-            try:
-                combined[key]["tasks"][k] += int(v)
-                task_totals[k] += int(v)
-                daily_summary[date_key] += int(v)
+    # Newest page of the history table; "Show More" fetches the rest by cursor
+    rows, next_cursor = _overview_rows(rollups)
 
-                month = date_key.strftime("%b %Y")
-                yearly = date_key.year
+    return _render_user_detail(request, user, rows, next_cursor, rollups.count())
 
-                monthly_summary[month] += int(v)
-                yearly_summary[yearly] += int(v)
 
-            except:
-                continue
+@async_staff_member_required
+@use_replica
+async def user_report_detail_async(request, username):
+    """
+    user_report_detail for SERVER_MODE=asgi.
+    """
+    user = await aget_object_or_404(User, username=username)
+    rollups = ReportDailyRollup.objects.filter(user=user)
 
-        # Dynamic fields
-        for resp in r.dynamic_responses.all():
-            combined[key]["tasks"][resp.field.label] = resp.value
+    (rows, next_cursor), total_submissions = await asyncio.gather(
+        sync_to_async(_overview_rows)(rollups),
+        rollups.acount(),
+    )
+    return _render_user_detail(request, user, rows, next_cursor, total_submissions)
 
-        if r.notes:
-            combined[key]["notes"].append(r.notes)
 
-    # Format task names
-    for key in combined:
-        formatted = {
-            k.replace("_", " ").title(): v
-            for k, v in combined[key]["tasks"].items()
-        }
-        combined[key]["tasks"] = formatted
+@staff_member_required
+@use_replica
+def user_report_detail_rows(request, username):
+    """
+    HTML fragment with the next page of a user's history table.
+    The cursor for the following page is returned in X-Next-Cursor.
+    """
+    user = get_object_or_404(User, username=username)
+    try:
+        rows, next_cursor = _overview_rows(ReportDailyRollup.objects.filter(user=user), request.GET.get("after"))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid cursor.")
 
-    context = {
-        "target_user": user,
-        "reports": list(combined.values()),
-        "task_totals": json.dumps({k.replace("_", " ").title(): v for k, v in task_totals.items()}),
-        "daily_summary": json.dumps({str(k): v for k, v in sorted((k, v) for k, v in daily_summary.items() if k is not None)}),
-        "monthly_summary": json.dumps(dict(monthly_summary)),
-        "yearly_summary": json.dumps(dict(yearly_summary)),
-        "submission_data": json.dumps([
-            {"date": r["custom_date"].strftime("%Y-%m-%d"), "type": r["report_type"]}
-            for r in combined.values() if r["custom_date"]
-        ]),
-        "weekly_off": user.weekly_off,
-    }
+    response = render(request, "reports/partials/user_detail_rows.html", {"reports": rows})
+    response["X-Next-Cursor"] = next_cursor or ""
+    return response
+
+# ----------------------------------------------------
+# 📥 ADMIN: BULK IMPORT OF HISTORICAL REPORTS
+# ----------------------------------------------------
+@staff_member_required
+def import_reports_upload(request):
+    """
+    Upload a CSV or XLSX of historical reports. The file is imported in the
+    background by run_import_worker; the page lists the staff member's
+    recent imports with the rows each one rejected.
+    """
+    if request.method == "POST":
+        upload = request.FILES.get("file")
+        if upload is None:
+            messages.error(request, "Choose a CSV or XLSX file to import.")
+        else:
+            queue_import(request.user, upload, dry_run=bool(request.POST.get("dry_run")))
+            messages.success(request, "Import queued. Its progress is shown below.")
+            return redirect("import_reports_upload")
+
+    return render(request, "reports/import_reports.html", {
+        "import_jobs": ImportJob.objects.filter(requested_by=request.user)[:5],
+    })
 
-    return render(request, "reports/user_detail.html", context)
 
 # ----------------------------------------------------
 # 🔐 ADMIN: CHANGE USER PASSWORD